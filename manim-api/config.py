@@ -1,4 +1,6 @@
 from functools import lru_cache
+from typing import Literal
+
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -6,6 +8,20 @@ class Settings(BaseSettings):
     # OpenAI
     openai_api_key: str
     openai_model: str = "gpt-5.1-codex-max"
+    openai_base_url: str | None = None  # ex.: servidor falso local do benchmark
+    llm_streaming: bool = True
+    prompt_budget_optimizer_tokens: int = 4000  # parte variável (fora o prefixo estático)
+    prompt_budget_codegen_tokens: int = 8000
+    llm_cache_enabled: bool = True
+    llm_cache_path: str = ".cache/llm_cache.sqlite3"
+    llm_cache_ttl_seconds: int = 86400
+    llm_cache_memory_entries: int = 256
+    codegen_speculative: bool = False
+    codegen_fanout: int = 2  # candidatos simultâneos por onda
+    codegen_max_candidates: int = 4  # teto de chamadas por request no modo especulativo
+    dry_run_enabled: bool | None = None  # None = só com RENDER_BACKEND=pool, onde o worker já está aquecido
+    dry_run_timeout: int = 20
+    dry_run_workers: int = 1  # dry runs simultâneos; no backend pool, workers aquecidos só para eles
 
     # App
     app_name: str = "Manim Video Generator API"
@@ -13,6 +29,56 @@ class Settings(BaseSettings):
 
     # Manim
     render_timeout: int = 120
+    render_timeout_max: int = 600
+    render_cost_enabled: bool = True
+    render_cost_scale: float = 1.0  # calibra o modelo de custo para o hardware
+    render_cost_heavy_seconds: float = 60  # acima disso o render usa a faixa "heavy" do scheduler
+    render_cost_max_seconds: float = 300  # a partir disso o request é rejeitado (0 = só o teto RENDER_TIMEOUT_MAX)
+    render_cost_auto_downgrade: bool = False  # tenta tiers menores antes de rejeitar
+    render_cost_timeout_factor: float = 3.0
+    render_slots: int = 0  # 0 = derivado do número de núcleos
+    render_queue_size: int = 8
+    render_heavy_slots: int = 0  # 0 = metade dos slots
+    render_backend: Literal["subprocess", "pool"] = "subprocess"
+    render_pool_size: int = 0  # 0 = metade dos núcleos
+    render_pool_max_renders: int = 50
+    render_pool_max_rss_mb: int = 2048
+    render_segments: int = 1  # >1 divide cenas longas em renders paralelos
+    render_segment_min_animations: int = 4
+    render_log_max_chars: int = 64_000  # final da saída do Manim mantido por stream (stdout/stderr)
+    render_cache_enabled: bool = True
+    render_cache_dir: str = ".cache/renders"
+    render_cache_max_mb: int = 2048
+    render_cache_max_age_hours: int = 168
+    asset_cache_enabled: bool = True
+    asset_cache_dir: str = ".cache/assets"
+    asset_cache_max_mb: int = 512
+
+    # Entrega de vídeo
+    video_store_dir: str = ".cache/videos"
+    video_store_ttl_hours: int = 24
+    thumbnail_max_width: int = 480
+
+    # Coalescência e idempotência
+    pipeline_coalescing: bool = True
+    idempotency_ttl_seconds: int = 3600
+    idempotency_use_request_id: bool = False  # x-request-id do cliente vale como Idempotency-Key
+    idempotency_max_entries: int = 1000  # respostas guardadas para retentativas (0 = sem limite)
+
+    # Observabilidade
+    tracing_enabled: bool = True
+    trace_buffer_size: int = 256  # requisições mantidas para /debug/requests
+    progress_channels: int = 256  # canais de eventos (SSE) mantidos em memória
+    progress_history_size: int = 200  # eventos reenviados a quem assina depois do início
+    progress_heartbeat_seconds: float = 15.0
+
+    # Jobs
+    job_store_path: str = ".cache/jobs.sqlite3"
+    job_output_dir: str = ".cache/jobs"
+    job_workers: int = 2
+    job_ttl_hours: int = 0  # jobs concluídos e seus arquivos; 0 = VIDEO_STORE_TTL_HOURS
+    batch_max_items: int = 500
+    batch_concurrency: int = 0  # 0 = 2x os slots de render (geração de código sobrepõe os renders)
 
     # Server
     host: str = "0.0.0.0"
@@ -1,17 +1,59 @@
 import asyncio
-import base64
+import json
 import logging
 import subprocess
 import time
 import uuid
+from contextlib import aclosing, asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import AsyncIterator
+
 from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import Response
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, Response, StreamingResponse
 
 from config import get_settings
-from schemas import CodeResponse, HealthResponse, VideoRequest, VideoResponse
-from services.manim_executor import execute_manim
+from schemas import (
+    BatchItem,
+    BatchItemResult,
+    BatchRequest,
+    BatchSummary,
+    CodeResponse,
+    HealthResponse,
+    ImageRequest,
+    ImageResponse,
+    JobResponse,
+    JobResult,
+    MultiFormatRequest,
+    MultiFormatResponse,
+    PromoteRequest,
+    RenderQueueStatus,
+    RequestTraceResponse,
+    RequestTraceSummary,
+    TraceSpan,
+    VideoRequest,
+    VideoResponse,
+    VideoVariant,
+)
+from services.asset_cache import asset_cache
+from services.batch import BatchOutcome, batch_concurrency, run_batch
+from services.encoding import content_type_for
+from services.job_store import JOB_FAILED, JOB_SUCCEEDED, JobRecord
+from services.jobs import job_manager
+from services.manim_executor import TEXLIVE_BIN, RenderResult, StillFrame, dry_run_active, encode_video_base64
+from services.manim_worker_pool import DRY_RUN_LANE, get_worker_pool, shutdown_worker_pools
 from services.openai_service import generate_manim_code
+from services.llm_cache import llm_cache
+from services.metrics import COALESCED_TOTAL, ENCODE_SECONDS, CallbackMetric, registry, resolution_bucket
+from services.pipeline import PipelineResult, pipeline_key, run_multi_format_pipeline, run_video_pipeline
+from services.render_cache import render_cache
+from services.render_cost import RenderCostExceeded
+from services.render_progress import progress_hub
+from services.render_scheduler import RenderQueueFull, render_scheduler
+from services.single_flight import IdempotencyConflict, SingleFlight
+from services.tracing import RequestTrace, span, trace_request, trace_store
+from services.video_store import video_store
 
 logging.basicConfig(
     level=logging.INFO,
@@ -20,11 +62,30 @@ logging.basicConfig(
 logger = logging.getLogger("manim_api.app")
 
 settings = get_settings()
+idempotent_requests = SingleFlight(
+    ttl_seconds=settings.idempotency_ttl_seconds, max_entries=settings.idempotency_max_entries
+)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI):
+    if settings.render_backend == "pool":
+        extra_path = str(TEXLIVE_BIN) if TEXLIVE_BIN else None
+        await asyncio.to_thread(get_worker_pool(extra_path).warm)
+        if dry_run_active():
+            await asyncio.to_thread(get_worker_pool(extra_path, lane=DRY_RUN_LANE).warm)
+    await job_manager.start()
+    yield
+    await job_manager.stop()
+    if settings.render_backend == "pool":
+        await asyncio.to_thread(shutdown_worker_pools)
+
 
 app = FastAPI(
     title=settings.app_name,
     description="API para gerar vídeos Manim via descrições em linguagem natural",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -37,6 +98,10 @@ app.add_middleware(
 )
 
 
+# Consultas de observabilidade e streams de eventos não ocupam o buffer de traces
+_UNTRACED_PREFIXES = ("/debug/", "/metrics")
+
+
 @app.middleware("http")
 async def ensure_cors_headers(request: Request, call_next):
     request_id = request.headers.get("x-request-id") or uuid.uuid4().hex[:8]
@@ -46,8 +111,16 @@ async def ensure_cors_headers(request: Request, call_next):
 
     if request.method == "OPTIONS":
         response = Response(status_code=200, content="OK")
-    else:
+    elif request.url.path.startswith(_UNTRACED_PREFIXES) or request.url.path.endswith("/events"):
         response = await call_next(request)
+    else:
+        with trace_request(request_id, request.method, request.url.path) as trace:
+            response = await call_next(request)
+        if trace is not None:
+            trace.status_code = response.status_code
+            response.headers["Server-Timing"] = trace.server_timing()
+        # Assinantes de /requests/{id}/events recebem o fim junto com a resposta
+        progress_hub.close(request_id, status_code=response.status_code)
 
     duration_ms = (time.perf_counter() - start) * 1000
     origin = request.headers.get("origin") or "*"
@@ -69,6 +142,32 @@ async def ensure_cors_headers(request: Request, call_next):
     return response
 
 
+@app.exception_handler(RenderQueueFull)
+async def render_queue_full_handler(request: Request, exc: RenderQueueFull) -> JSONResponse:
+    return JSONResponse(
+        status_code=429,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RenderCostExceeded)
+async def render_cost_exceeded_handler(request: Request, exc: RenderCostExceeded) -> JSONResponse:
+    return JSONResponse(
+        status_code=422,
+        content={
+            "detail": str(exc),
+            "estimated_render_seconds": exc.estimated_seconds,
+            "limit_seconds": exc.limit_seconds,
+        },
+    )
+
+
+@app.exception_handler(IdempotencyConflict)
+async def idempotency_conflict_handler(request: Request, exc: IdempotencyConflict) -> JSONResponse:
+    return JSONResponse(status_code=422, content={"detail": str(exc)})
+
+
 @app.get("/", response_model=HealthResponse)
 async def health() -> HealthResponse:
     try:
@@ -89,7 +188,32 @@ async def health() -> HealthResponse:
     )
 
 
-def _resolve_dimensions(request: VideoRequest) -> tuple[int, int]:
+for _name, _documentation, _read, _kind in (
+    ("manim_api_render_slots_active", "Renders currently holding a slot", lambda: render_scheduler.stats().active, "gauge"),
+    ("manim_api_render_queue_depth", "Renders waiting for a slot", lambda: render_scheduler.stats().waiting, "gauge"),
+    ("manim_api_render_reserved", "Admitted requests still generating code", lambda: render_scheduler.stats().reserved, "gauge"),
+    ("manim_api_render_rejected_total", "Requests rejected with 429", lambda: render_scheduler.rejected, "counter"),
+    ("manim_api_render_cache_hits_total", "Render cache hits", lambda: render_cache.hits if render_cache else 0, "counter"),
+    ("manim_api_render_cache_misses_total", "Render cache misses", lambda: render_cache.misses if render_cache else 0, "counter"),
+    ("manim_api_asset_cache_hits_total", "Shared Tex/Text asset cache hits", lambda: asset_cache.hits if asset_cache else 0, "counter"),
+    ("manim_api_asset_cache_misses_total", "Shared Tex/Text asset cache misses", lambda: asset_cache.misses if asset_cache else 0, "counter"),
+    ("manim_api_llm_cache_hits_total", "LLM cache hits", lambda: llm_cache.hits if llm_cache else 0, "counter"),
+    ("manim_api_llm_cache_misses_total", "LLM cache misses", lambda: llm_cache.misses if llm_cache else 0, "counter"),
+):
+    registry.register(CallbackMetric(_name, _documentation, _read, kind=_kind))
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    return PlainTextResponse(registry.expose(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/render/status", response_model=RenderQueueStatus)
+async def render_status() -> RenderQueueStatus:
+    return RenderQueueStatus(**asdict(render_scheduler.stats()))
+
+
+def _resolve_dimensions(request: VideoRequest | ImageRequest) -> tuple[int, int]:
     width = request.width or 1920
     height = request.height or 1080
     return width, height
@@ -99,6 +223,109 @@ def _request_id(http_request: Request) -> str:
     return getattr(http_request.state, "request_id", None) or uuid.uuid4().hex[:8]
 
 
+def _idempotency_key(http_request: Request) -> str | None:
+    key = http_request.headers.get("idempotency-key")
+    if key is None and settings.idempotency_use_request_id:
+        key = http_request.headers.get("x-request-id")
+    return f"{http_request.url.path}:{key}" if key else None
+
+
+async def _run_idempotent_pipeline(
+    http_request: Request,
+    request_id: str,
+    description: str,
+    width: int,
+    height: int,
+    **options,
+) -> PipelineResult:
+    """Retentativas com a mesma chave reaproveitam a execução em andamento ou o resultado bem-sucedido."""
+
+    def pipeline():
+        return run_video_pipeline(
+            description=description,
+            width=width,
+            height=height,
+            request_id=request_id,
+            **options,
+        )
+
+    key = _idempotency_key(http_request)
+    if key is None:
+        return await pipeline()
+    result, shared = await idempotent_requests.run(
+        key,
+        pipeline,
+        fingerprint=pipeline_key(description, width, height, **options),
+        remember=lambda outcome: outcome.success,
+    )
+    if shared:
+        COALESCED_TOTAL.inc(kind="idempotency")
+        logger.info("[%s] Served from idempotent execution (key=%s)", request_id, key)
+    return result
+
+
+def _video_options(payload: VideoRequest) -> dict:
+    return {"quality": payload.quality, "encoding": payload.encoding, "thumbnail": payload.thumbnail}
+
+
+def _encoding_headers(render_result: RenderResult) -> dict[str, str]:
+    headers = {}
+    if render_result.encoding:
+        headers["X-Encoding-Profile"] = render_result.encoding
+        headers["X-Encode-Seconds"] = f"{render_result.transcode_seconds:.3f}"
+    if render_result.thumbnail_id:
+        headers["X-Thumbnail-URL"] = f"/videos/{render_result.thumbnail_id}"
+    return headers
+
+
+async def _video_fields(
+    render_result: RenderResult,
+    scene_name: str,
+    delivery: str,
+    width: int,
+    height: int,
+    request_id: str,
+) -> dict:
+    """Campos de VideoResponse para um render concluído (ou falho), conforme o modo de entrega."""
+    if not render_result.success:
+        logger.error(
+            "[%s] Render failed: %s",
+            request_id,
+            render_result.error,
+        )
+        if render_result.stderr:
+            logger.error("[%s] Render stderr: %s", request_id, render_result.stderr.strip())
+        if render_result.stdout:
+            logger.error("[%s] Render stdout: %s", request_id, render_result.stdout.strip())
+        return {"success": False, "error": render_result.error, "render_logs": render_result.stderr}
+
+    logger.info("[%s] Render completed successfully (delivery=%s)", request_id, delivery)
+    fields = {
+        "success": True,
+        "video_size_bytes": render_result.video_size,
+        "scene_name": scene_name,
+        "content_type": content_type_for(render_result.video_path),
+        "encoding": render_result.encoding,
+        "encode_seconds": round(render_result.transcode_seconds, 3) if render_result.encoding else None,
+    }
+    if render_result.thumbnail_id:
+        fields["thumbnail_url"] = f"/videos/{render_result.thumbnail_id}"
+    if delivery == "reference":
+        fields["video_url"] = f"/videos/{render_result.video_id}"
+        return fields
+    if render_result.thumbnail_path:
+        fields["thumbnail_base64"] = await asyncio.to_thread(encode_video_base64, render_result.thumbnail_path)
+    encode_start = time.perf_counter()
+    with span("base64", bytes=render_result.video_size):
+        fields["video_base64"] = await asyncio.to_thread(encode_video_base64, render_result.video_path)
+    ENCODE_SECONDS.observe(
+        time.perf_counter() - encode_start,
+        resolution=resolution_bucket(width, height),
+        stage="base64",
+    )
+    return fields
+
+
 @app.post("/generate-code", response_model=CodeResponse)
 async def generate_code(payload: VideoRequest, http_request: Request) -> CodeResponse:
     request_id = _request_id(http_request)
@@ -129,12 +356,10 @@ async def generate_video(payload: VideoRequest, http_request: Request) -> VideoR
         width,
         height,
     )
-    code_result = await generate_manim_code(
-        description=payload.description,
-        width=width,
-        height=height,
-        request_id=request_id,
+    result = await _run_idempotent_pipeline(
+        http_request, request_id, payload.description, width, height, **_video_options(payload)
     )
+    code_result = result.code_result
     if not code_result.is_valid:
         logger.warning(
             "[%s] Code generation failed: %s",
@@ -146,48 +371,14 @@ async def generate_video(payload: VideoRequest, http_request: Request) -> VideoR
             error=f"Code generation failed: {code_result.validation_message}",
         )
 
-    logger.info(
-        "[%s] Code generated successfully (scene=%s), starting render",
-        request_id,
-        code_result.scene_name,
-    )
-
-    render_result = await asyncio.to_thread(
-        execute_manim,
-        code_result.code,
-        code_result.scene_name,
-        width,
-        height,
-        settings.render_timeout,
-        request_id,
-    )
-
-    if not render_result.success:
-        logger.error(
-            "[%s] Render failed: %s",
-            request_id,
-            render_result.error,
-        )
-        if render_result.stderr:
-            logger.error("[%s] Render stderr: %s", request_id, render_result.stderr.strip())
-        if render_result.stdout:
-            logger.error("[%s] Render stdout: %s", request_id, render_result.stdout.strip())
-        return VideoResponse(
-            success=False,
-            error=render_result.error,
-            render_logs=render_result.stderr,
-        )
-
-    logger.info("[%s] Render completed successfully", request_id)
-    return VideoResponse(
-        success=True,
-        video_base64=render_result.video_base64,
-        scene_name=code_result.scene_name,
+    fields = await _video_fields(
+        result.render_result, code_result.scene_name, payload.delivery, width, height, request_id
     )
+    return VideoResponse(**fields)
 
 
 @app.post("/generate-video-file")
-async def generate_video_file(payload: VideoRequest, http_request: Request) -> Response:
+async def generate_video_file(payload: VideoRequest, http_request: Request) -> FileResponse:
     request_id = _request_id(http_request)
     width, height = _resolve_dimensions(payload)
     logger.info(
@@ -196,12 +387,10 @@ async def generate_video_file(payload: VideoRequest, http_request: Request) -> R
         width,
         height,
     )
-    code_result = await generate_manim_code(
-        description=payload.description,
-        width=width,
-        height=height,
-        request_id=request_id,
+    result = await _run_idempotent_pipeline(
+        http_request, request_id, payload.description, width, height, **_video_options(payload)
     )
+    code_result = result.code_result
     if not code_result.is_valid:
         logger.warning(
             "[%s] Code generation failed for /generate-video-file: %s",
@@ -213,16 +402,7 @@ async def generate_video_file(payload: VideoRequest, http_request: Request) -> R
             detail=f"Code generation failed: {code_result.validation_message}",
         )
 
-    render_result = await asyncio.to_thread(
-        execute_manim,
-        code_result.code,
-        code_result.scene_name,
-        width,
-        height,
-        settings.render_timeout,
-        request_id,
-    )
-
+    render_result = result.render_result
     if not render_result.success:
         logger.error(
             "[%s] Render failed for /generate-video-file: %s",
@@ -239,16 +419,423 @@ async def generate_video_file(payload: VideoRequest, http_request: Request) -> R
         )
 
     logger.info("[%s] /generate-video-file render completed", request_id)
-    video_bytes = base64.b64decode(render_result.video_base64)
-    return Response(
-        content=video_bytes,
-        media_type="video/mp4",
-        headers={
-            "Content-Disposition": f'attachment; filename="{code_result.scene_name}.mp4"',
+    video_path = Path(render_result.video_path)
+    return FileResponse(
+        video_path,
+        media_type=content_type_for(video_path),
+        filename=f"{code_result.scene_name}{video_path.suffix}",
+        headers=_encoding_headers(render_result),
+    )
+
+
+def _orientation(width: int, height: int) -> str:
+    return "landscape" if width > height else "portrait" if height > width else "square"
+
+
+@app.post("/generate-video-formats", response_model=MultiFormatResponse)
+async def generate_video_formats(payload: MultiFormatRequest, http_request: Request) -> MultiFormatResponse:
+    """Um único código, com layout adaptado ao quadro, renderizado em várias resoluções em paralelo."""
+    request_id = _request_id(http_request)
+    targets = list(dict.fromkeys((target.width, target.height) for target in payload.targets))
+    logger.info(
+        "[%s] /generate-video-formats request received (targets=%s)",
+        request_id,
+        ", ".join(f"{width}x{height}" for width, height in targets),
+    )
+
+    def pipeline():
+        return run_multi_format_pipeline(
+            description=payload.description,
+            targets=targets,
+            request_id=request_id,
+            quality=payload.quality,
+            encoding=payload.encoding,
+            thumbnail=payload.thumbnail,
+        )
+
+    key = _idempotency_key(http_request)
+    if key is None:
+        result = await pipeline()
+    else:
+        result, shared = await idempotent_requests.run(
+            key,
+            pipeline,
+            fingerprint=payload.model_dump_json(),
+            remember=lambda outcome: outcome.success,
+        )
+        if shared:
+            COALESCED_TOTAL.inc(kind="idempotency")
+            logger.info("[%s] Served from idempotent execution (key=%s)", request_id, key)
+
+    code_result = result.code_result
+    if not code_result.is_valid:
+        logger.warning("[%s] Code generation failed: %s", request_id, code_result.validation_message)
+        return MultiFormatResponse(
+            success=False,
+            error=f"Code generation failed: {code_result.validation_message}",
+        )
+
+    variants = []
+    for (width, height), variant in zip(targets, result.variants):
+        fields = await _video_fields(
+            variant.render_result, code_result.scene_name, payload.delivery, width, height, request_id
+        )
+        variants.append(
+            VideoVariant(
+                **fields,
+                width=width,
+                height=height,
+                orientation=_orientation(width, height),
+                quality=variant.quality,
+            )
+        )
+    failed = [f"{variant.width}x{variant.height}" for variant in variants if not variant.success]
+    return MultiFormatResponse(
+        success=not failed,
+        scene_name=code_result.scene_name,
+        code=code_result.code,
+        error=f"Render failed for {', '.join(failed)}" if failed else None,
+        variants=variants,
+    )
+
+
+async def _batch_line(outcome: BatchOutcome, item: BatchItem) -> str:
+    """Uma linha NDJSON com o resultado do item, no formato de /generate-video mais os dados do lote."""
+    details = {
+        "index": outcome.index,
+        "id": item.id,
+        "request_id": outcome.request_id,
+        "seconds": round(outcome.seconds, 3),
+    }
+    result = outcome.result
+    if result is None:
+        line = BatchItemResult(success=False, error=outcome.error, **details)
+    elif not result.code_result.is_valid:
+        message = result.code_result.validation_message
+        logger.warning("[%s] Code generation failed: %s", outcome.request_id, message)
+        line = BatchItemResult(success=False, error=f"Code generation failed: {message}", **details)
+    else:
+        width, height = _resolve_dimensions(item)
+        fields = await _video_fields(
+            result.render_result, result.code_result.scene_name, item.delivery, width, height, outcome.request_id
+        )
+        line = BatchItemResult(**fields, quality=result.quality, **details)
+    return line.model_dump_json(exclude_none=True) + "\n"
+
+
+@app.post("/batch")
+async def generate_batch(payload: BatchRequest, http_request: Request) -> StreamingResponse:
+    """Gera vários vídeos numa só conexão; cada resultado sai como uma linha NDJSON assim que fica pronto."""
+    request_id = _request_id(http_request)
+    if len(payload.items) > settings.batch_max_items:
+        raise HTTPException(
+            status_code=413,
+            detail=f"Batch has {len(payload.items)} items; the limit is {settings.batch_max_items}",
+        )
+    concurrency = batch_concurrency(payload.concurrency)
+    logger.info(
+        "[%s] /batch request received (items=%d, concurrency=%d)",
+        request_id,
+        len(payload.items),
+        concurrency,
+    )
+    items = []
+    for item in payload.items:
+        width, height = _resolve_dimensions(item)
+        items.append({"description": item.description, "width": width, "height": height, **_video_options(item)})
+
+    async def stream() -> AsyncIterator[str]:
+        started = time.perf_counter()
+        succeeded = 0
+        # aclosing: se o cliente desconectar, o fechamento chega a run_batch, que cancela os pendentes
+        async with aclosing(run_batch(items, request_id, concurrency)) as outcomes:
+            async for outcome in outcomes:
+                line = await _batch_line(outcome, payload.items[outcome.index])
+                succeeded += outcome.result is not None and outcome.result.success
+                yield line
+        seconds = time.perf_counter() - started
+        logger.info("[%s] /batch completed (succeeded=%d/%d, %.2fs)", request_id, succeeded, len(items), seconds)
+        summary = BatchSummary(
+            total=len(items),
+            succeeded=succeeded,
+            failed=len(items) - succeeded,
+            concurrency=concurrency,
+            seconds=round(seconds, 3),
+        )
+        yield summary.model_dump_json() + "\n"
+
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"Cache-Control": "no-cache", "X-Batch-Concurrency": str(concurrency)},
+    )
+
+
+@app.post("/generate-image", response_model=ImageResponse)
+async def generate_image(payload: ImageRequest, http_request: Request) -> ImageResponse:
+    """Renderiza só um quadro da cena (o último ou o de `time`), sem codificar vídeo."""
+    request_id = _request_id(http_request)
+    width, height = _resolve_dimensions(payload)
+    logger.info(
+        "[%s] /generate-image request received (resolution=%dx%d, time=%s, format=%s)",
+        request_id,
+        width,
+        height,
+        payload.time,
+        payload.format,
+    )
+    result = await _run_idempotent_pipeline(
+        http_request,
+        request_id,
+        payload.description,
+        width,
+        height,
+        quality="final",
+        still=StillFrame(at_time=payload.time, image_format=payload.format),
+    )
+    code_result = result.code_result
+    if not code_result.is_valid:
+        logger.warning("[%s] Code generation failed: %s", request_id, code_result.validation_message)
+        return ImageResponse(success=False, error=f"Code generation failed: {code_result.validation_message}")
+
+    render_result = result.render_result
+    if not render_result.success:
+        logger.error("[%s] Still render failed: %s", request_id, render_result.error)
+        if render_result.stderr:
+            logger.error("[%s] Render stderr: %s", request_id, render_result.stderr.strip())
+        return ImageResponse(success=False, error=render_result.error, render_logs=render_result.stderr)
+
+    logger.info("[%s] Still render completed successfully (delivery=%s)", request_id, payload.delivery)
+    fields = {
+        "image_size_bytes": render_result.video_size,
+        "content_type": content_type_for(render_result.video_path),
+        "frame_time": payload.time,
+        "scene_name": code_result.scene_name,
+    }
+    if payload.delivery == "reference":
+        return ImageResponse(success=True, image_url=f"/videos/{render_result.video_id}", **fields)
+    with span("base64", bytes=render_result.video_size):
+        image_base64 = await asyncio.to_thread(encode_video_base64, render_result.video_path)
+    return ImageResponse(success=True, image_base64=image_base64, **fields)
+
+
+@app.get("/videos/{video_id}")
+async def get_video(video_id: str) -> FileResponse:
+    """Vídeos, imagens e miniaturas guardados no video store."""
+    video_path = video_store.path(video_id)
+    if video_path is None:
+        raise HTTPException(status_code=404, detail="Video not found or expired")
+    return FileResponse(video_path, media_type=content_type_for(video_path), filename=video_path.name)
+
+
+def _trace_summary(trace: RequestTrace) -> RequestTraceSummary:
+    return RequestTraceSummary(
+        request_id=trace.request_id,
+        method=trace.method,
+        path=trace.path,
+        started_at=trace.started_at,
+        duration=trace.duration,
+        status_code=trace.status_code,
+    )
+
+
+@app.get("/debug/requests", response_model=list[RequestTraceSummary])
+async def list_request_traces(limit: int = 50) -> list[RequestTraceSummary]:
+    return [_trace_summary(trace) for trace in trace_store.recent(max(1, min(limit, trace_store.max_entries)))]
+
+
+@app.get("/debug/requests/{request_id}", response_model=RequestTraceResponse)
+async def get_request_trace(request_id: str) -> RequestTraceResponse:
+    trace = trace_store.get(request_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found or evicted")
+    return RequestTraceResponse(
+        **_trace_summary(trace).model_dump(),
+        spans=[TraceSpan(**asdict(item)) for item in sorted(trace.spans, key=lambda item: item.start)],
+    )
+
+
+def _job_response(record: JobRecord) -> JobResponse:
+    result = None
+    if record.result:
+        result = JobResult(**record.result)
+        if record.video_path:
+            result.video_url = f"/jobs/{record.id}/video"
+        if job_manager.thumbnail_path(record) is not None:
+            result.thumbnail_url = f"/jobs/{record.id}/thumbnail"
+    return JobResponse(
+        id=record.id,
+        status=record.status,
+        stage=record.stage,
+        quality=record.request.get("quality", "final"),
+        encoding=record.request.get("encoding"),
+        promoted_from=record.request.get("promoted_from"),
+        created_at=record.created_at,
+        updated_at=record.updated_at,
+        timings=record.timings,
+        result=result,
+    )
+
+
+@app.post("/jobs", response_model=JobResponse, status_code=202)
+async def create_job(payload: VideoRequest, http_request: Request, response: Response) -> JobResponse:
+    request_id = _request_id(http_request)
+    width, height = _resolve_dimensions(payload)
+    record, created = await job_manager.submit(
+        {
+            "description": payload.description,
+            "width": width,
+            "height": height,
+            "quality": payload.quality,
+            "encoding": payload.encoding,
+            "thumbnail": payload.thumbnail,
+        },
+        idempotency_key=_idempotency_key(http_request),
+    )
+    if not created:
+        COALESCED_TOTAL.inc(kind="idempotency")
+        response.status_code = 200
+        logger.info("[%s] /jobs returned existing job %s for idempotency key", request_id, record.id)
+        return _job_response(record)
+    logger.info(
+        "[%s] /jobs accepted job %s (resolution=%dx%d, quality=%s)",
+        request_id,
+        record.id,
+        width,
+        height,
+        payload.quality,
+    )
+    return _job_response(record)
+
+
+@app.post("/jobs/{job_id}/promote", response_model=JobResponse, status_code=202)
+async def promote_job(
+    job_id: str,
+    http_request: Request,
+    response: Response,
+    payload: PromoteRequest | None = None,
+) -> JobResponse:
+    request_id = _request_id(http_request)
+    source = await job_manager.store.aget(job_id)
+    if source is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if not source.result.get("code"):
+        raise HTTPException(status_code=409, detail="Job has no generated code to promote yet")
+    quality = payload.quality if payload else "final"
+    record, created = await job_manager.submit(
+        {
+            "description": source.request["description"],
+            "width": source.request["width"],
+            "height": source.request["height"],
+            "quality": quality,
+            "encoding": source.request.get("encoding"),
+            "thumbnail": source.request.get("thumbnail"),
+            "code": source.result["code"],
+            "scene_name": source.result["scene_name"],
+            "promoted_from": source.id,
         },
+        idempotency_key=_idempotency_key(http_request),
+    )
+    if not created:
+        COALESCED_TOTAL.inc(kind="idempotency")
+        response.status_code = 200
+        return _job_response(record)
+    logger.info("[%s] Job %s promoted to %s as job %s", request_id, job_id, quality, record.id)
+    return _job_response(record)
+
+
+@app.get("/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str) -> JobResponse:
+    record = await job_manager.store.aget(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_response(record)
+
+
+def _sse(event: dict) -> str:
+    return f"id: {event['id']}\nevent: {event['event']}\ndata: {json.dumps(event)}\n\n"
+
+
+async def _event_stream(channel: str, http_request: Request) -> AsyncIterator[str]:
+    """Reenvia o histórico do canal (após Last-Event-ID) e segue com eventos novos até `end`."""
+    last_event_id = http_request.headers.get("last-event-id", "")
+    history, queue = progress_hub.subscribe(channel, int(last_event_id) if last_event_id.isdigit() else 0)
+    try:
+        for event in history:
+            yield _sse(event)
+            if event["event"] == "end":
+                return
+        while True:
+            try:
+                event = await asyncio.wait_for(queue.get(), timeout=settings.progress_heartbeat_seconds)
+            except asyncio.TimeoutError:
+                if await http_request.is_disconnected():
+                    return
+                # Comentário SSE: mantém proxies e clientes sem timeout de conexão ociosa
+                yield ": keep-alive\n\n"
+                continue
+            yield _sse(event)
+            if event["event"] == "end":
+                return
+    finally:
+        progress_hub.unsubscribe(channel, queue)
+
+
+def _event_response(stream: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(
+        stream,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
 
 
+@app.get("/jobs/{job_id}/events")
+async def get_job_events(job_id: str, http_request: Request) -> StreamingResponse:
+    record = await job_manager.store.aget(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    if record.status in (JOB_SUCCEEDED, JOB_FAILED) and not http_request.headers.get("last-event-id"):
+        # Job já terminado (ou de antes de um reinício): só o desfecho
+        async def finished() -> AsyncIterator[str]:
+            yield _sse({"id": 0, "time": record.updated_at, "event": "end", "status": record.status})
+
+        return _event_response(finished())
+    return _event_response(_event_stream(job_id, http_request))
+
+
+@app.get("/requests/{request_id}/events")
+async def get_request_events(request_id: str, http_request: Request) -> StreamingResponse:
+    """Progresso de uma chamada síncrona: o cliente envia o mesmo x-request-id no POST."""
+    return _event_response(_event_stream(request_id, http_request))
+
+
+@app.get("/jobs/{job_id}/video")
+async def get_job_video(job_id: str) -> FileResponse:
+    record = await job_manager.store.aget(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    video_path = job_manager.video_path(record)
+    if video_path is None:
+        raise HTTPException(status_code=404, detail="Job video not available")
+    scene_name = record.result.get("scene_name") or record.id
+    return FileResponse(
+        video_path,
+        media_type=content_type_for(video_path),
+        filename=f"{scene_name}{video_path.suffix}",
+    )
+
+
+@app.get("/jobs/{job_id}/thumbnail")
+async def get_job_thumbnail(job_id: str) -> FileResponse:
+    record = await job_manager.store.aget(job_id)
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    thumbnail_path = job_manager.thumbnail_path(record)
+    if thumbnail_path is None:
+        raise HTTPException(status_code=404, detail="Job thumbnail not available")
+    return FileResponse(thumbnail_path, media_type=content_type_for(thumbnail_path), filename=thumbnail_path.name)
+
+
 if __name__ == "__main__":
     import uvicorn
 
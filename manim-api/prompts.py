@@ -1,3 +1,5 @@
+from services.token_budget import count_tokens, truncate_to_tokens
+
 RESOURCE_CONTEXT = """
 - FastAPI backend exposed via /generate-code, /generate-video e /generate-video-file.
 - Executor Manim CE 0.19.0 com PyAV (ffmpeg embutido) e suporte a MathTex/LaTeX completo.
@@ -345,29 +347,55 @@ FEW_SHOT_EXAMPLES = [
 ]
 
 
-def build_prompt_optimizer_messages(user_prompt: str, video_spec: str | None = None) -> list:
+# Prefixos montados uma única vez: são idênticos byte a byte em toda chamada, o que permite ao
+# cache de prompt do provedor reaproveitá-los. Todo conteúdo variável vai na última mensagem.
+PROMPT_OPTIMIZER_PREFIX = ({"role": "system", "content": PROMPT_OPTIMIZER_SYSTEM_PROMPT},)
+
+CODE_GENERATION_PREFIX = (
+    {"role": "system", "content": MANIM_SYSTEM_PROMPT + "\n\n# AVAILABLE RESOURCES\n" + RESOURCE_CONTEXT},
+    *(
+        message
+        for example in FEW_SHOT_EXAMPLES
+        for message in (
+            {"role": "user", "content": example["user"]},
+            {"role": "assistant", "content": example["assistant"]},
+        )
+    ),
+)
+
+
+def build_prompt_optimizer_messages(
+    user_prompt: str,
+    video_spec: str | None = None,
+    max_variable_tokens: int | None = None,
+) -> list:
+    if max_variable_tokens is not None:
+        spec_tokens = count_tokens(video_spec or "")
+        user_prompt = truncate_to_tokens(user_prompt, max_variable_tokens - spec_tokens)
     content = user_prompt if not video_spec else f"{user_prompt}\n\n{video_spec}"
-    return [
-        {"role": "system", "content": PROMPT_OPTIMIZER_SYSTEM_PROMPT},
-        {"role": "user", "content": content},
-    ]
+    return [*PROMPT_OPTIMIZER_PREFIX, {"role": "user", "content": content}]
 
 
 def build_code_generation_messages(
     improved_prompt: str,
     resource_notes: str | None = None,
     video_spec: str | None = None,
+    max_variable_tokens: int | None = None,
 ) -> list:
-    enriched_system = MANIM_SYSTEM_PROMPT + "\n\n# AVAILABLE RESOURCES\n" + RESOURCE_CONTEXT
+    resource_notes = resource_notes or ""
+    if max_variable_tokens is not None:
+        # As notas do otimizador são as primeiras a serem cortadas; especificação do vídeo nunca.
+        # O pedido perde o início: o final traz o feedback de erro da tentativa anterior
+        spec_tokens = count_tokens(video_spec or "")
+        improved_prompt = truncate_to_tokens(improved_prompt, max_variable_tokens - spec_tokens, keep_end=True)
+        resource_notes = truncate_to_tokens(
+            resource_notes,
+            max_variable_tokens - spec_tokens - count_tokens(improved_prompt),
+        )
+
+    sections = [improved_prompt]
     if resource_notes:
-        enriched_system += "\n\n# PROMPT OPTIMIZER NOTES\n" + resource_notes
-
-    messages = [{"role": "system", "content": enriched_system}]
-
-    for example in FEW_SHOT_EXAMPLES:
-        messages.append({"role": "user", "content": example["user"]})
-        messages.append({"role": "assistant", "content": example["assistant"]})
-
-    user_payload = improved_prompt if not video_spec else f"{improved_prompt}\n\n{video_spec}"
-    messages.append({"role": "user", "content": user_payload})
-    return messages
+        sections.append("# PROMPT OPTIMIZER NOTES\n" + resource_notes)
+    if video_spec:
+        sections.append(video_spec)
+    return [*CODE_GENERATION_PREFIX, {"role": "user", "content": "\n\n".join(sections)}]
@@ -1,7 +1,11 @@
-from typing import Optional
+from typing import Any, Literal, Optional
 from pydantic import BaseModel, Field
 
 
+EncodingProfileName = Literal["fast-preview", "balanced", "archival", "web-small", "webm", "gif"]
+ImageFormat = Literal["png", "webp"]
+
+
 class VideoRequest(BaseModel):
     description: str = Field(
         ...,
@@ -21,6 +25,65 @@ class VideoRequest(BaseModel):
         le=3840,
         description="(Opcional) Altura do vídeo em pixels; padrão 1080",
     )
+    quality: Literal["draft", "standard", "final"] = Field(
+        default="final",
+        description="(Opcional) `draft` renderiza em 50% da resolução a 15 fps, `standard` em 75% a 30 fps, `final` na resolução pedida a 60 fps",
+    )
+    delivery: Literal["inline", "reference"] = Field(
+        default="inline",
+        description="(Opcional) `inline` devolve video_base64 no JSON; `reference` devolve video_url para download",
+    )
+    encoding: Optional[EncodingProfileName] = Field(
+        default=None,
+        description="(Opcional) Perfil de codificação; sem perfil, entrega o MP4 padrão do Manim",
+    )
+    thumbnail: Optional[ImageFormat] = Field(
+        default=None,
+        description="(Opcional) Gera também uma miniatura (último quadro) nesse formato",
+    )
+
+
+class ImageRequest(BaseModel):
+    description: str = Field(
+        ...,
+        min_length=10,
+        max_length=2000,
+        description="Descrição em linguagem natural da cena desejada",
+    )
+    width: int | None = Field(
+        default=None,
+        ge=320,
+        le=3840,
+        description="(Opcional) Largura da imagem em pixels; padrão 1920",
+    )
+    height: int | None = Field(
+        default=None,
+        ge=320,
+        le=3840,
+        description="(Opcional) Altura da imagem em pixels; padrão 1080",
+    )
+    time: Optional[float] = Field(
+        default=None,
+        ge=0,
+        le=600,
+        description="(Opcional) Instante da animação, em segundos; sem ele, o último quadro",
+    )
+    format: ImageFormat = Field(default="png", description="(Opcional) Formato da imagem")
+    delivery: Literal["inline", "reference"] = Field(
+        default="inline",
+        description="(Opcional) `inline` devolve image_base64 no JSON; `reference` devolve image_url para download",
+    )
+
+
+class RenderCost(BaseModel):
+    animation_seconds: float
+    play_calls: int
+    tex_objects: int
+    text_objects: int
+    updaters: int
+    three_d: bool
+    complexity: float
+    estimated_render_seconds: float = Field(..., description="Estimativa na resolução pedida, qualidade final")
 
 
 class CodeResponse(BaseModel):
@@ -28,18 +91,185 @@ class CodeResponse(BaseModel):
     scene_name: str
     is_valid: bool
     validation_message: str
+    estimated_cost: Optional[RenderCost] = None
 
 
 class VideoResponse(BaseModel):
     success: bool
     video_base64: Optional[str] = None
+    video_url: Optional[str] = None
+    video_size_bytes: Optional[int] = None
     content_type: str = "video/mp4"
+    encoding: Optional[str] = None
+    encode_seconds: Optional[float] = Field(default=None, description="Tempo da recodificação pelo perfil escolhido")
+    thumbnail_url: Optional[str] = None
+    thumbnail_base64: Optional[str] = None
     scene_name: Optional[str] = None
     error: Optional[str] = None
     render_logs: Optional[str] = None
 
 
+class VideoTarget(BaseModel):
+    width: int = Field(..., ge=320, le=3840)
+    height: int = Field(..., ge=320, le=3840)
+
+
+def _default_targets() -> list[VideoTarget]:
+    return [
+        VideoTarget(width=1920, height=1080),
+        VideoTarget(width=1080, height=1920),
+        VideoTarget(width=1080, height=1080),
+    ]
+
+
+class MultiFormatRequest(BaseModel):
+    description: str = Field(
+        ...,
+        min_length=10,
+        max_length=2000,
+        description="Descrição em linguagem natural do vídeo desejado",
+    )
+    targets: list[VideoTarget] = Field(
+        default_factory=_default_targets,
+        min_length=1,
+        max_length=6,
+        description="(Opcional) Resoluções a renderizar com o mesmo código; padrão paisagem, retrato e quadrado",
+    )
+    quality: Literal["draft", "standard", "final"] = "final"
+    delivery: Literal["inline", "reference"] = Field(
+        default="reference",
+        description="(Opcional) `reference` (padrão) devolve video_url por formato; `inline` embute os vídeos em base64",
+    )
+    encoding: Optional[EncodingProfileName] = None
+    thumbnail: Optional[ImageFormat] = None
+
+
+class VideoVariant(VideoResponse):
+    width: int
+    height: int
+    orientation: Literal["landscape", "portrait", "square"]
+    quality: Optional[str] = Field(default=None, description="Tier efetivo (pode ser menor que o pedido)")
+
+
+class MultiFormatResponse(BaseModel):
+    success: bool = Field(..., description="Verdadeiro só se todos os formatos renderizaram")
+    scene_name: Optional[str] = None
+    code: Optional[str] = None
+    error: Optional[str] = None
+    variants: list[VideoVariant] = Field(default_factory=list)
+
+
+class BatchItem(VideoRequest):
+    id: Optional[str] = Field(
+        default=None,
+        max_length=200,
+        description="(Opcional) Identificador do cliente, devolvido na linha de resultado do item",
+    )
+
+
+class BatchRequest(BaseModel):
+    items: list[BatchItem] = Field(..., min_length=1, description="Vídeos a gerar; o teto vem de BATCH_MAX_ITEMS")
+    concurrency: Optional[int] = Field(
+        default=None,
+        ge=1,
+        description="(Opcional) Itens em andamento ao mesmo tempo; limitado pelo padrão do servidor",
+    )
+
+
+class BatchItemResult(VideoResponse):
+    type: Literal["result"] = "result"
+    index: int = Field(..., description="Posição do item no lote (os resultados chegam fora de ordem)")
+    id: Optional[str] = None
+    request_id: str = Field(..., description="Id do item em /debug/requests e /requests/{id}/events")
+    quality: Optional[str] = Field(default=None, description="Tier efetivo (pode ser menor que o pedido)")
+    seconds: float = Field(..., description="Duração do item, sem a espera por vaga no lote")
+
+
+class BatchSummary(BaseModel):
+    type: Literal["summary"] = "summary"
+    total: int
+    succeeded: int
+    failed: int
+    concurrency: int
+    seconds: float
+
+
+class ImageResponse(BaseModel):
+    success: bool
+    image_base64: Optional[str] = None
+    image_url: Optional[str] = None
+    image_size_bytes: Optional[int] = None
+    content_type: str = "image/png"
+    frame_time: Optional[float] = Field(default=None, description="Instante pedido; ausente para o último quadro")
+    scene_name: Optional[str] = None
+    error: Optional[str] = None
+    render_logs: Optional[str] = None
+
+
+class PromoteRequest(BaseModel):
+    quality: Literal["draft", "standard", "final"] = "final"
+
+
+class JobResult(BaseModel):
+    success: bool
+    scene_name: Optional[str] = None
+    code: Optional[str] = None
+    video_url: Optional[str] = None
+    thumbnail_url: Optional[str] = None
+    error: Optional[str] = None
+    render_logs: Optional[str] = None
+
+
+class JobResponse(BaseModel):
+    id: str
+    status: str
+    stage: str
+    quality: str = "final"
+    encoding: Optional[str] = None
+    promoted_from: Optional[str] = None
+    created_at: float
+    updated_at: float
+    timings: dict[str, float] = Field(default_factory=dict)
+    result: Optional[JobResult] = None
+
+
+class RenderQueueStatus(BaseModel):
+    slots: int
+    active: int
+    heavy_slots: int
+    heavy_active: int
+    waiting: int
+    reserved: int = Field(..., description="Admitidas, ainda gerando código antes de pedir o slot")
+    max_queue: int
+    cpu_count: int
+    admitted: int
+    rejected: int
+    avg_wait_seconds: float
+    last_wait_seconds: float
+    avg_render_seconds: float
+
+
 class HealthResponse(BaseModel):
     status: str
     manim_version: str
     openai_model: str
+
+
+class TraceSpan(BaseModel):
+    name: str
+    start: float = Field(..., description="Segundos desde o início da requisição")
+    duration: float
+    attributes: dict[str, Any] = Field(default_factory=dict)
+
+
+class RequestTraceSummary(BaseModel):
+    request_id: str
+    method: str
+    path: str
+    started_at: float
+    duration: Optional[float] = Field(default=None, description="Ausente enquanto a requisição está em andamento")
+    status_code: Optional[int] = None
+
+
+class RequestTraceResponse(RequestTraceSummary):
+    spans: list[TraceSpan] = Field(default_factory=list)
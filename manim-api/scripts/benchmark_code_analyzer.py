@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Microbenchmark do analisador de código: passada única vs. o fluxo antigo de várias passadas."""
+from __future__ import annotations
+
+import ast
+import re
+import sys
+import timeit
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services.code_analyzer import COLOR_FALLBACKS, DANGEROUS_FUNCTIONS, DANGEROUS_IMPORTS, analyze_code  # noqa: E402
+
+REPEAT = 5
+NUMBER = 200
+
+SAMPLE = '''from manim import *
+
+
+class FourierSeries(Scene):
+    def construct(self):
+        axes = Axes(x_range=[-4, 4], y_range=[-2, 2]).add_coordinates()
+        title = Text("Série de Fourier", color=CYAN).to_edge(UP)
+        title.add_background_rectangle(fill_opacity=0.6)
+        self.play(Write(title), Create(axes), run_time=2)
+        previous = None
+        for n in range(1, 8, 2):
+            graph = axes.plot(lambda x, n=n: np.sin(n * x) / n, color=BLUE)
+            label = MathTex(rf"\\\\frac{{\\\\sin({n}x)}}{{{n}}}").next_to(graph, RIGHT)
+            if previous is None:
+                self.play(Create(graph), FadeIn(label), run_time=1.5)
+            else:
+                self.play(ReplacementTransform(previous, graph), FadeIn(label), run_time=1)
+            previous = graph
+            self.wait(0.5)
+        arrow = Arrow(LEFT, RIGHT).add_tip(tip_style={"stroke_width": 2})
+        self.play(GrowArrow(arrow))
+        self.wait()
+'''
+
+
+def legacy(code: str) -> tuple[str, bool]:
+    """Réplica do fluxo anterior: regex + parse/transform/unparse + novo parse/walk + buscas por substring."""
+    re.search(r"class\s+(\w+)\s*\(\s*(?:Scene|ThreeDScene|MovingCameraScene)\s*\)", code)
+
+    class Sanitizer(ast.NodeTransformer):
+        def visit_Call(self, node):
+            self.generic_visit(node)
+            return node
+
+        def visit_Name(self, node):
+            if node.id in COLOR_FALLBACKS:
+                node.id = COLOR_FALLBACKS[node.id]
+            return node
+
+    tree = Sanitizer().visit(ast.parse(code))
+    code = ast.unparse(ast.fix_missing_locations(tree))
+    tree = ast.parse(code)
+    ok = "from manim import" in code and "(Scene)" in code and "def construct(self)" in code
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            ok = ok and all(alias.name.split(".")[0] not in DANGEROUS_IMPORTS for alias in node.names)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            ok = ok and node.func.id not in DANGEROUS_FUNCTIONS
+    return code, ok
+
+
+def main() -> int:
+    for name, func in (("legacy (multi-pass)", legacy), ("analyze_code", analyze_code)):
+        timings = timeit.repeat(lambda: func(SAMPLE), repeat=REPEAT, number=NUMBER)
+        best = min(timings) / NUMBER * 1e6
+        print(f"{name:<22} {best:8.1f} µs/call (best of {REPEAT}x{NUMBER})")
+
+    report = analyze_code(SAMPLE)
+    print(
+        f"scene={report.scene_name} valid={report.validation()[0]} rewrites={len(report.rewrites)} "
+        f"plays={report.play_calls} estimated_duration={report.estimated_duration_seconds:.1f}s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,12 @@
+# Círculo que vira quadrado e some, cena mínima de referência
+from manim import *
+
+
+class ShapesBenchmark(Scene):
+    def construct(self):
+        circle = Circle(color=BLUE).scale(1.5)
+        square = Square(color=TEAL).scale(1.5)
+        self.play(Create(circle))
+        self.play(Transform(circle, square), run_time=1.5)
+        self.play(FadeOut(circle))
+        self.wait(0.5)
@@ -0,0 +1,15 @@
+# Título, equações LaTeX e texto em sequência, exercitando Tex/Text e o cache de assets
+from manim import *
+
+
+class TextTexBenchmark(Scene):
+    def construct(self):
+        title = Text("Identidade de Euler", color=YELLOW).to_edge(UP)
+        equation = MathTex(r"e^{i\pi} + 1 = 0").scale(1.5)
+        expansion = MathTex(r"e^{ix} = \cos x + i \sin x").next_to(equation, DOWN, buff=0.8)
+        caption = Text("Cinco constantes em uma linha", font_size=28).to_edge(DOWN)
+        self.play(Write(title))
+        self.play(Write(equation), run_time=2)
+        self.play(FadeIn(expansion, shift=UP))
+        self.play(Write(caption))
+        self.wait(1)
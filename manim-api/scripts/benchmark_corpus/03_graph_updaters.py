@@ -0,0 +1,21 @@
+# Eixos com gráficos em laço e um ponto preso a um ValueTracker via updater
+from manim import *
+
+
+class GraphUpdatersBenchmark(Scene):
+    def construct(self):
+        axes = Axes(x_range=[-4, 4], y_range=[-2, 2], x_length=10, y_length=5)
+        self.play(Create(axes), run_time=1.5)
+        previous = None
+        for n in range(1, 6, 2):
+            graph = axes.plot(lambda x, n=n: np.sin(n * x) / n, color=BLUE)
+            if previous is None:
+                self.play(Create(graph))
+            else:
+                self.play(ReplacementTransform(previous, graph))
+            previous = graph
+        tracker = ValueTracker(-4)
+        dot = always_redraw(lambda: Dot(axes.c2p(tracker.get_value(), np.sin(tracker.get_value())), color=RED))
+        self.add(dot)
+        self.play(tracker.animate.set_value(4), run_time=3)
+        self.wait(0.5)
@@ -0,0 +1,21 @@
+# Superfície 3D com rotação de câmera, o caso mais pesado do corpus
+from manim import *
+
+
+class SurfaceBenchmark(ThreeDScene):
+    def construct(self):
+        axes = ThreeDAxes()
+        surface = Surface(
+            lambda u, v: axes.c2p(u, v, np.sin(u) * np.cos(v)),
+            u_range=[-PI, PI],
+            v_range=[-PI, PI],
+            resolution=(24, 24),
+        )
+        surface.set_style(fill_opacity=0.8)
+        surface.set_fill_by_checkerboard(BLUE_D, TEAL_D)
+        self.set_camera_orientation(phi=65 * DEGREES, theta=-45 * DEGREES)
+        self.play(Create(axes))
+        self.play(Create(surface), run_time=2)
+        self.begin_ambient_camera_rotation(rate=0.4)
+        self.wait(3)
+        self.stop_ambient_camera_rotation()
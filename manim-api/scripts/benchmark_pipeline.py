@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+"""Benchmark offline do pipeline: LLM falso local + corpus fixo de cenas, tempos por etapa em JSON.
+
+Exemplo:
+    python scripts/benchmark_pipeline.py --output bench.json
+    python scripts/benchmark_pipeline.py --baseline bench.json   # sai com código 1 se houver regressão
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import sys
+import time
+from pathlib import Path
+from typing import Any
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_openai_server import DEFAULT_CORPUS, FakeOpenAIServer, load_corpus  # noqa: E402
+
+# Ordem de exibição; etapas ausentes numa execução (ex.: transcode sem perfil) são omitidas
+STAGES = (
+    "optimizer",
+    "code_llm",
+    "validation",
+    "dry_run",
+    "code_generation",
+    "render_queue",
+    "render",
+    "concat",
+    "transcode",
+    "base64",
+    "serialization",
+    "total",
+)
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--scenes", nargs="*", help="Subconjunto do corpus (nomes dos arquivos sem .py)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1, help="Execuções descartadas antes de medir")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--quality", choices=("draft", "standard", "final"), default="draft")
+    parser.add_argument("--encoding", default=None, help="Perfil de codificação aplicado após o render")
+    parser.add_argument("--latency-ms", type=float, default=50.0, help="Latência simulada do LLM até o primeiro byte")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Ritmo do stream falso (0 = sem limite)")
+    parser.add_argument("--output", type=Path, help="Grava o JSON aqui (padrão: stdout)")
+    parser.add_argument("--baseline", type=Path, help="JSON de uma execução anterior para comparação")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Aumento relativo tolerado da mediana")
+    parser.add_argument("--min-delta", type=float, default=0.05, help="Diferença absoluta mínima (s) para acusar")
+    return parser.parse_args()
+
+
+def _configure_environment(base_url: str) -> None:
+    """Precisa rodar antes de importar `config`: as configurações são lidas uma única vez."""
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+    # Caches que pulariam etapas inteiras deixariam as medições sem sentido
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["RENDER_CACHE_ENABLED"] = "false"
+    os.environ["RENDER_COST_MAX_SECONDS"] = "0"
+
+
+def _summarize(samples: list[float]) -> dict[str, float]:
+    return {
+        "median": round(statistics.median(samples), 4),
+        "min": round(min(samples), 4),
+        "max": round(max(samples), 4),
+    }
+
+
+async def _run_scene(name: str, code: str, args: argparse.Namespace, repeat: int) -> dict[str, Any]:
+    from schemas import VideoResponse
+    from services.manim_executor import encode_video_base64
+    from services.pipeline import run_video_pipeline
+
+    description = f"{code.splitlines()[0].lstrip('# ').strip()} [bench:{name}]"
+    samples: dict[str, list[float]] = {}
+    failures: list[str] = []
+    sizes: list[int] = []
+    for index in range(repeat):
+        result = await run_video_pipeline(
+            description=description,
+            width=args.width,
+            height=args.height,
+            request_id=f"bench-{name}-{index}",
+            reject_when_full=False,
+            quality=args.quality,
+            encoding=args.encoding,
+        )
+        timings = dict(result.timings)
+        if not result.success:
+            failures.append(
+                result.code_result.validation_message
+                if not result.code_result.is_valid
+                else result.render_result.error or "render failed"
+            )
+            continue
+
+        render_result = result.render_result
+        if render_result.encode_seconds:
+            timings["concat"] = render_result.encode_seconds
+        started = time.perf_counter()
+        video_base64 = encode_video_base64(render_result.video_path)
+        timings["base64"] = time.perf_counter() - started
+        started = time.perf_counter()
+        VideoResponse(
+            success=True,
+            video_base64=video_base64,
+            video_size_bytes=render_result.video_size,
+            scene_name=result.code_result.scene_name,
+        ).model_dump_json()
+        timings["serialization"] = time.perf_counter() - started
+        sizes.append(render_result.video_size or 0)
+        for stage, seconds in timings.items():
+            samples.setdefault(stage, []).append(seconds)
+
+    return {
+        "runs": repeat,
+        "failures": failures,
+        "video_size_bytes": max(sizes) if sizes else None,
+        "stages": {stage: _summarize(samples[stage]) for stage in STAGES if stage in samples},
+    }
+
+
+async def _run_corpus(corpus: dict[str, str], args: argparse.Namespace) -> dict[str, Any]:
+    # Um único event loop: o cliente HTTP do SDK não pode ser reaproveitado entre loops
+    if args.warmup:
+        # Primeiras chamadas pagam imports, conexões e caches do processo; não entram no relatório
+        name, code = next(iter(corpus.items()))
+        await _run_scene(name, code, args, args.warmup)
+    scenes = {}
+    for name, code in corpus.items():
+        print(f"Benchmarking {name}...", file=sys.stderr)
+        scenes[name] = await _run_scene(name, code, args, args.repeat)
+    return scenes
+
+
+def _compare(current: dict, baseline: dict, tolerance: float, min_delta: float) -> list[dict[str, Any]]:
+    regressions = []
+    for name, scene in current["scenes"].items():
+        previous = baseline.get("scenes", {}).get(name)
+        if previous is None:
+            continue
+        for stage, summary in scene["stages"].items():
+            before = previous.get("stages", {}).get(stage)
+            if before is None:
+                continue
+            delta = summary["median"] - before["median"]
+            ratio = summary["median"] / before["median"] if before["median"] else float("inf")
+            if delta > min_delta and ratio > 1 + tolerance:
+                regressions.append(
+                    {
+                        "scene": name,
+                        "stage": stage,
+                        "baseline": before["median"],
+                        "current": summary["median"],
+                        "ratio": round(ratio, 2),
+                    }
+                )
+    return regressions
+
+
+def _print_table(report: dict) -> None:
+    for name, scene in report["scenes"].items():
+        print(f"\n{name} (failures={len(scene['failures'])}, size={scene['video_size_bytes']})", file=sys.stderr)
+        for stage, summary in scene["stages"].items():
+            print(
+                f"  {stage:<16} median={summary['median']:8.3f}s  min={summary['min']:8.3f}s  max={summary['max']:8.3f}s",
+                file=sys.stderr,
+            )
+    for regression in report.get("regressions", []):
+        print(
+            f"REGRESSION {regression['scene']}/{regression['stage']}: "
+            f"{regression['baseline']:.3f}s → {regression['current']:.3f}s ({regression['ratio']}x)",
+            file=sys.stderr,
+        )
+
+
+def main() -> int:
+    args = _parse_args()
+    corpus = load_corpus(args.corpus)
+    if args.scenes:
+        corpus = {name: code for name, code in corpus.items() if name in args.scenes}
+
+    server = FakeOpenAIServer(corpus, args.latency_ms, args.tokens_per_second).start()
+    _configure_environment(server.base_url)
+    from config import get_settings
+
+    settings = get_settings()
+    report: dict[str, Any] = {
+        "meta": {
+            "created_at": time.time(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "render_backend": settings.render_backend,
+            "resolution": f"{args.width}x{args.height}",
+            "quality": args.quality,
+            "encoding": args.encoding,
+            "repeat": args.repeat,
+            "warmup": args.warmup,
+            "fake_llm": {"latency_ms": args.latency_ms, "tokens_per_second": args.tokens_per_second},
+        },
+        "scenes": {},
+    }
+    try:
+        report["scenes"] = asyncio.run(_run_corpus(corpus, args))
+    finally:
+        server.stop()
+
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text())
+        report["baseline"] = str(args.baseline)
+        report["regressions"] = _compare(report, baseline, args.tolerance, args.min_delta)
+
+    _print_table(report)
+    output = json.dumps(report, indent=2)
+    if args.output:
+        args.output.write_text(output + "\n")
+    else:
+        print(output)
+    failed = any(scene["failures"] for scene in report["scenes"].values())
+    return 1 if failed or report.get("regressions") else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
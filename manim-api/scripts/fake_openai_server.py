@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""Servidor local que imita a Responses API da OpenAI com respostas fixas e latência configurável.
+
+Usado pelo benchmark offline (`OPENAI_BASE_URL=http://127.0.0.1:<porta>/v1`). O otimizador recebe
+um JSON que ecoa a descrição; a geração de código recebe a cena do corpus cujo marcador
+`[bench:<nome>]` aparece nas mensagens (ou a primeira cena do corpus).
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import re
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+
+DEFAULT_CORPUS = Path(__file__).resolve().parent / "benchmark_corpus"
+SCENE_MARKER = re.compile(r"\[bench:([\w-]+)\]")
+CHARS_PER_TOKEN = 4
+
+
+def load_corpus(corpus_dir: Path) -> dict[str, str]:
+    return {path.stem: path.read_text() for path in sorted(corpus_dir.glob("*.py"))}
+
+
+def _messages(payload: dict) -> list[dict]:
+    messages = payload.get("input") or []
+    return [{"role": "user", "content": messages}] if isinstance(messages, str) else messages
+
+
+def _response_object(model: str, text: str, input_chars: int) -> dict[str, Any]:
+    input_tokens = input_chars // CHARS_PER_TOKEN
+    output_tokens = len(text) // CHARS_PER_TOKEN
+    return {
+        "id": f"resp_{uuid.uuid4().hex}",
+        "object": "response",
+        "created_at": int(time.time()),
+        "model": model,
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg_0",
+                "role": "assistant",
+                "status": "completed",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+class FakeOpenAIServer:
+    """Responde `POST /v1/responses` (com e sem `stream`) a partir do corpus em memória."""
+
+    def __init__(
+        self,
+        corpus: dict[str, str],
+        latency_ms: float = 0.0,
+        tokens_per_second: float = 0.0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        if not corpus:
+            raise ValueError("Benchmark corpus is empty")
+        self.corpus = corpus
+        self.latency_ms = latency_ms
+        self.tokens_per_second = tokens_per_second
+        self.requests = 0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._thread: threading.Thread | None = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reply_for(self, payload: dict) -> str:
+        messages = _messages(payload)
+        if messages and '"improved_prompt"' in str(messages[0].get("content", "")):
+            return json.dumps(
+                {"improved_prompt": messages[-1]["content"], "resource_plan": "- Use apenas objetos básicos do Manim."}
+            )
+        match = SCENE_MARKER.search(str(messages[-1].get("content", ""))) if messages else None
+        scene = self.corpus.get(match.group(1)) if match else None
+        return f"```python\n{scene or next(iter(self.corpus.values()))}```"
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # HTTP/1.0: a conexão fecha ao fim do stream, como o SDK espera para SSE sem tamanho
+            protocol_version = "HTTP/1.0"
+
+            def log_message(self, format: str, *args: Any) -> None:
+                return
+
+            def do_POST(self) -> None:
+                if not self.path.rstrip("/").endswith("/responses"):
+                    self.send_error(404)
+                    return
+                body = self.rfile.read(int(self.headers.get("content-length") or 0))
+                payload = json.loads(body or b"{}")
+                server.requests += 1
+                text = server.reply_for(payload)
+                response = _response_object(payload.get("model", "fake"), text, len(body))
+                time.sleep(server.latency_ms / 1000)
+                if payload.get("stream"):
+                    self._stream(text, response)
+                else:
+                    data = json.dumps(response).encode("utf-8")
+                    self.send_response(200)
+                    self.send_header("content-type", "application/json")
+                    self.send_header("content-length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+
+            def _event(self, event: dict) -> None:
+                self.wfile.write(f"event: {event['type']}\ndata: {json.dumps(event)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+
+            def _stream(self, text: str, response: dict) -> None:
+                self.send_response(200)
+                self.send_header("content-type", "text/event-stream")
+                self.end_headers()
+                sequence = 0
+                try:
+                    for line in text.splitlines(keepends=True):
+                        if server.tokens_per_second:
+                            time.sleep(len(line) / CHARS_PER_TOKEN / server.tokens_per_second)
+                        self._event(
+                            {
+                                "type": "response.output_text.delta",
+                                "item_id": "msg_0",
+                                "output_index": 0,
+                                "content_index": 0,
+                                "delta": line,
+                                "logprobs": [],
+                                "sequence_number": sequence,
+                            }
+                        )
+                        sequence += 1
+                    self._event({"type": "response.completed", "response": response, "sequence_number": sequence})
+                except (BrokenPipeError, ConnectionResetError):
+                    # O cliente encerra o stream assim que a cerca de código fecha
+                    return
+
+        return Handler
+
+    def start(self) -> "FakeOpenAIServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="fake-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def serve_forever(self) -> None:
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--corpus", type=Path, default=DEFAULT_CORPUS)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Atraso antes do primeiro byte")
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="Ritmo do stream (0 = sem limite)")
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(load_corpus(args.corpus), args.latency_ms, args.tokens_per_second, args.host, args.port)
+    print(f"Fake OpenAI Responses API on {server.base_url} ({len(server.corpus)} scenes)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,19 +1,35 @@
 #!/usr/bin/env python3
-"""Dispara múltiplos requests paralelos contra /generate-video local."""
+"""Gerador de carga assíncrono para a API: chegadas Poisson (malha aberta) ou concorrência fixa.
+
+Exemplos:
+    # 0.2 req/s em média, 60 s de rampa e 300 s de soak, 70% drafts 720p e 30% final 1080p
+    python scripts/parallel_request_test.py --rate 0.2 --ramp 60 --soak 300 \\
+        --profile generate-video:1280x720:draft:7 --profile generate-video:1920x1080:final:3 \\
+        --json load.json --csv load.csv
+
+    # 4 clientes fechados (cada um só envia o próximo após a resposta)
+    python scripts/parallel_request_test.py --concurrency 4 --soak 120 --profile jobs:1920x1080:draft:1
+"""
 from __future__ import annotations
 
-import concurrent.futures
+import argparse
+import asyncio
+import csv
 import json
+import math
+import random
 import sys
 import time
-import urllib.error
-import urllib.request
-from typing import Any, Dict
+from collections import Counter
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+import httpx
 
-BASE_URL = "http://127.0.0.1:8000/generate-video"
-DEFAULT_WIDTH = 1920
-DEFAULT_HEIGHT = 1080
-TIMEOUT = 300
+DEFAULT_BASE_URL = "http://127.0.0.1:8000"
+TIMEOUT = 600
+JOB_POLL_INTERVAL = 1.0
 
 PROMPTS = [
     "Close dos eixos cartesianos com setas positivas em azul/teal",
@@ -23,88 +39,332 @@ PROMPTS = [
     "Visual 3Blue1Brown de eixos com labels e setas teal indicando positivo",
 ]
 
+ENDPOINTS = {"generate-video", "generate-video-file", "generate-code", "jobs"}
 
-def _send_request(index: int, description: str) -> Dict[str, Any]:
-    payload = {
-        "description": f"{description} [req {index}]",
-        "width": DEFAULT_WIDTH,
-        "height": DEFAULT_HEIGHT,
-    }
-    data = json.dumps(payload).encode("utf-8")
-    req = urllib.request.Request(
-        BASE_URL,
-        data=data,
-        headers={
-            "Content-Type": "application/json",
-            "Accept": "application/json",
-        },
-        method="POST",
-    )
-    start = time.perf_counter()
-    try:
-        with urllib.request.urlopen(req, timeout=TIMEOUT) as resp:
-            body = resp.read().decode("utf-8")
-            status = resp.getcode()
-    except urllib.error.HTTPError as exc:
-        body = exc.read().decode("utf-8", errors="replace")
-        status = exc.code
-    except Exception as exc:  # Transport-level failure
-        duration = time.perf_counter() - start
-        return {
-            "id": index,
-            "status": None,
-            "duration": duration,
-            "success": False,
-            "error": str(exc),
+
+@dataclass(frozen=True)
+class Profile:
+    endpoint: str
+    width: int
+    height: int
+    quality: str
+    weight: float
+
+    @property
+    def label(self) -> str:
+        return f"{self.endpoint}:{self.width}x{self.height}:{self.quality}"
+
+
+@dataclass
+class RequestRecord:
+    id: int
+    phase: str
+    profile: str
+    started_at: float
+    latency: Optional[float] = None
+    status: Optional[int] = None
+    outcome: str = "pending"
+    server_timing: dict[str, float] = field(default_factory=dict)
+
+
+def parse_profile(spec: str) -> Profile:
+    """`endpoint:LARGURAxALTURA:qualidade:peso`; só o endpoint é obrigatório."""
+    parts = spec.split(":")
+    endpoint = parts[0]
+    if endpoint not in ENDPOINTS:
+        raise argparse.ArgumentTypeError(f"unknown endpoint {endpoint!r} (expected one of {sorted(ENDPOINTS)})")
+    width, height = (int(value) for value in (parts[1] if len(parts) > 1 else "1920x1080").split("x"))
+    quality = parts[2] if len(parts) > 2 else "draft"
+    weight = float(parts[3]) if len(parts) > 3 else 1.0
+    return Profile(endpoint, width, height, quality, weight)
+
+
+def parse_server_timing(header: str | None) -> dict[str, float]:
+    """Converte `nome;dur=12.3, outro;dur=4` em segundos por etapa."""
+    timings: dict[str, float] = {}
+    for entry in (header or "").split(","):
+        name, _, params = entry.strip().partition(";")
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if name and key == "dur":
+                try:
+                    timings[name] = float(value) / 1000
+                except ValueError:
+                    continue
+    return timings
+
+
+def percentile(values: list[float], fraction: float) -> Optional[float]:
+    """Interpolação linear entre as amostras ordenadas (mesma definição do numpy)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * fraction
+    lower, upper = math.floor(position), math.ceil(position)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+class LoadGenerator:
+    def __init__(self, args: argparse.Namespace, client: httpx.AsyncClient):
+        self.args = args
+        self.client = client
+        self.profiles: list[Profile] = args.profile
+        self.random = random.Random(args.seed)
+        self.records: list[RequestRecord] = []
+        self.in_flight = 0
+        self.started = 0.0
+
+    def _payload(self, record: RequestRecord, profile: Profile) -> dict[str, Any]:
+        description = PROMPTS[record.id % len(PROMPTS)]
+        if self.args.unique:
+            # Evita que caches de LLM/render e a coalescência transformem a carga em hits
+            description = f"{description} [req {record.id}]"
+        payload = {
+            "description": description,
+            "width": profile.width,
+            "height": profile.height,
+            "quality": profile.quality,
         }
+        if profile.endpoint == "generate-video":
+            payload["delivery"] = self.args.delivery
+        return payload
+
+    def _phase(self, elapsed: float) -> str:
+        return "ramp" if elapsed < self.args.ramp else "soak"
+
+    async def _poll_job(self, job_id: str) -> httpx.Response:
+        while True:
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+            response = await self.client.get(f"/jobs/{job_id}")
+            if response.status_code != 200 or response.json()["status"] in ("succeeded", "failed"):
+                return response
+
+    async def _send(self, record: RequestRecord, profile: Profile) -> None:
+        self.in_flight += 1
+        start = time.perf_counter()
+        try:
+            endpoint = "/jobs" if profile.endpoint == "jobs" else f"/{profile.endpoint}"
+            response = await self.client.post(endpoint, json=self._payload(record, profile))
+            record.server_timing = parse_server_timing(response.headers.get("server-timing"))
+            if profile.endpoint == "jobs" and response.status_code in (200, 202):
+                response = await self._poll_job(response.json()["id"])
+                body = response.json()
+                record.server_timing = {
+                    name: float(value)
+                    for name, value in (body.get("timings") or {}).items()
+                    if not name.startswith("estimated_")  # previsão, não tempo gasto
+                }
+                success = body.get("status") == "succeeded"
+            elif "json" in response.headers.get("content-type", "") and response.status_code == 200:
+                body = response.json()
+                success = body.get("success", body.get("is_valid", True)) is not False
+            else:
+                success = response.status_code == 200
+            record.status = response.status_code
+            if response.status_code >= 400:
+                record.outcome = f"http_{response.status_code}"
+            else:
+                record.outcome = "ok" if success else "backend_error"
+        except httpx.TimeoutException:
+            record.outcome = "timeout"
+        except httpx.HTTPError as exc:
+            record.outcome = f"transport_{type(exc).__name__}"
+        finally:
+            record.latency = time.perf_counter() - start
+            self.in_flight -= 1
+
+    def _new_record(self, now: float) -> tuple[RequestRecord, Profile]:
+        profile = self.random.choices(self.profiles, weights=[p.weight for p in self.profiles])[0]
+        elapsed = now - self.started
+        record = RequestRecord(len(self.records), self._phase(elapsed), profile.label, round(elapsed, 4))
+        self.records.append(record)
+        return record, profile
 
-    duration = time.perf_counter() - start
-    try:
-        data = json.loads(body)
-    except json.JSONDecodeError:
-        data = {"raw": body}
+    async def run_open_loop(self) -> None:
+        """Chegadas Poisson independentes das respostas; a taxa cresce linearmente durante a rampa.
 
+        A rampa usa thinning: candidatos na taxa alvo são aceitos com probabilidade `t / rampa`.
+        """
+        duration = self.args.ramp + self.args.soak
+        tasks: list[asyncio.Task] = []
+        elapsed = 0.0
+        while True:
+            elapsed += self.random.expovariate(self.args.rate)
+            if elapsed >= duration:
+                break
+            if elapsed < self.args.ramp and self.random.random() > elapsed / self.args.ramp:
+                continue
+            await asyncio.sleep(max(0.0, self.started + elapsed - time.perf_counter()))
+            record, profile = self._new_record(time.perf_counter())
+            if self.in_flight >= self.args.max_in_flight:
+                # Protege o próprio gerador; em malha aberta a requisição conta como perdida
+                record.outcome, record.latency = "client_overload", 0.0
+                continue
+            tasks.append(asyncio.create_task(self._send(record, profile)))
+        await asyncio.gather(*tasks)
+
+    async def run_closed_loop(self) -> None:
+        """Cada cliente envia a próxima requisição quando a anterior termina; clientes entram ao longo da rampa."""
+        deadline = self.started + self.args.ramp + self.args.soak
+
+        async def client(index: int) -> None:
+            await asyncio.sleep(self.args.ramp * index / self.args.concurrency)
+            while time.perf_counter() < deadline:
+                record, profile = self._new_record(time.perf_counter())
+                await self._send(record, profile)
+
+        await asyncio.gather(*(client(index) for index in range(self.args.concurrency)))
+
+    async def run(self) -> float:
+        self.started = time.perf_counter()
+        if self.args.concurrency:
+            await self.run_closed_loop()
+        else:
+            await self.run_open_loop()
+        return time.perf_counter() - self.started
+
+
+def _summarize(records: list[RequestRecord], window: float) -> dict[str, Any]:
+    completed = [record for record in records if record.outcome != "client_overload"]
+    ok = [record.latency for record in completed if record.outcome == "ok" and record.latency is not None]
+    latencies = [record.latency for record in completed if record.latency is not None]
+    stages: dict[str, list[float]] = {}
+    for record in completed:
+        for name, seconds in record.server_timing.items():
+            stages.setdefault(name, []).append(seconds)
     return {
-        "id": index,
-        "status": status,
-        "duration": duration,
-        "success": data.get("success"),
-        "backend_error": data.get("error"),
-        "scene_name": data.get("scene_name"),
-        "render_logs": data.get("render_logs"),
-        "raw": data.get("raw"),
+        "requests": len(records),
+        "succeeded": len(ok),
+        "success_rate": round(len(ok) / len(records), 4) if records else None,
+        "throughput_rps": round(len(ok) / window, 4) if window else None,
+        "latency_seconds": {
+            "p50": percentile(latencies, 0.5),
+            "p90": percentile(latencies, 0.9),
+            "p99": percentile(latencies, 0.99),
+            "max": max(latencies) if latencies else None,
+        },
+        "success_latency_p50": percentile(ok, 0.5),
+        "errors": dict(Counter(record.outcome for record in records if record.outcome != "ok")),
+        "server_stages": {
+            name: {"mean": sum(values) / len(values), "p50": percentile(values, 0.5), "p90": percentile(values, 0.9)}
+            for name, values in sorted(stages.items())
+        },
+    }
+
+
+def build_report(args: argparse.Namespace, records: list[RequestRecord], wall: float) -> dict[str, Any]:
+    phases = {"ramp": args.ramp, "soak": wall - args.ramp}
+    report: dict[str, Any] = {
+        "config": {
+            "base_url": args.base_url,
+            "mode": "closed" if args.concurrency else "open",
+            "rate": args.rate,
+            "concurrency": args.concurrency,
+            "ramp_seconds": args.ramp,
+            "soak_seconds": args.soak,
+            "profiles": [asdict(profile) for profile in args.profile],
+            "seed": args.seed,
+        },
+        "wall_seconds": round(wall, 3),
+        "overall": _summarize(records, wall),
+        "phases": {},
+        "profiles": {},
     }
+    for phase, window in phases.items():
+        selected = [record for record in records if record.phase == phase]
+        if selected:
+            report["phases"][phase] = _summarize(selected, max(window, 1e-9))
+    for label in sorted({record.profile for record in records}):
+        report["profiles"][label] = _summarize([record for record in records if record.profile == label], wall)
+    return report
 
 
-def main() -> int:
-    start_all = time.perf_counter()
-    with concurrent.futures.ThreadPoolExecutor(max_workers=len(PROMPTS)) as executor:
-        futures = [executor.submit(_send_request, i + 1, prompt) for i, prompt in enumerate(PROMPTS)]
-        results = [future.result() for future in futures]
+def write_csv(path: Path, records: list[RequestRecord]) -> None:
+    stage_names = sorted({name for record in records for name in record.server_timing})
+    with path.open("w", newline="") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(["id", "phase", "profile", "started_at", "latency", "status", "outcome", *stage_names])
+        for record in records:
+            writer.writerow(
+                [
+                    record.id,
+                    record.phase,
+                    record.profile,
+                    record.started_at,
+                    f"{record.latency:.4f}" if record.latency is not None else "",
+                    record.status or "",
+                    record.outcome,
+                    *(f"{record.server_timing[name]:.4f}" if name in record.server_timing else "" for name in stage_names),
+                ]
+            )
 
-    total = time.perf_counter() - start_all
-    any_failure = False
-    for result in sorted(results, key=lambda r: r["id"]):
-        print("-" * 80)
+
+def _format_seconds(value: Optional[float]) -> str:
+    return f"{value:7.2f}s" if value is not None else "      -"
+
+
+def print_summary(report: dict[str, Any]) -> None:
+    for title, summary in [("overall", report["overall"]), *report["phases"].items(), *report["profiles"].items()]:
+        latency = summary["latency_seconds"]
         print(
-            f"Request #{result['id']}: status={result.get('status')} success={result.get('success')} "
-            f"duration={result.get('duration', 0):.2f}s scene={result.get('scene_name')}"
+            f"{title:<40} n={summary['requests']:<5} ok={summary['success_rate']!s:<6} "
+            f"rps={summary['throughput_rps']!s:<8} p50={_format_seconds(latency['p50'])} "
+            f"p90={_format_seconds(latency['p90'])} p99={_format_seconds(latency['p99'])}"
         )
-        if result.get("error"):
-            print(f"  Transport error: {result['error']}")
-            any_failure = True
-        if result.get("backend_error"):
-            print(f"  Backend error: {result['backend_error']}")
-            any_failure = True
-        if result.get("render_logs"):
-            print("  Render logs snippet:")
-            print(result["render_logs"][:500])
-            any_failure = True
-        if result.get("success") is not True:
-            any_failure = True
-    print("-" * 80)
-    print(f"Total wall time for {len(PROMPTS)} requests: {total:.2f}s")
-    return 1 if any_failure else 0
+        if summary["errors"]:
+            print(f"{'':<40} errors={summary['errors']}")
+    stages = report["overall"]["server_stages"]
+    if stages:
+        print("server stages (mean / p90):")
+        for name, values in stages.items():
+            print(f"  {name:<20} {_format_seconds(values['mean'])} / {_format_seconds(values['p90'])}")
+
+
+def _parse_args(argv: list[str] | None = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=DEFAULT_BASE_URL)
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--rate", type=float, default=0.1, help="Chegadas por segundo (Poisson, malha aberta)")
+    mode.add_argument("--concurrency", type=int, default=0, help="Clientes em malha fechada")
+    parser.add_argument("--ramp", type=float, default=0.0, help="Segundos de rampa até a taxa/concorrência alvo")
+    parser.add_argument("--soak", type=float, default=60.0, help="Segundos na taxa/concorrência alvo")
+    parser.add_argument(
+        "--profile",
+        type=parse_profile,
+        action="append",
+        help="endpoint:LARGURAxALTURA:qualidade:peso (repetível); padrão generate-video:1920x1080:draft:1",
+    )
+    parser.add_argument("--delivery", choices=("inline", "reference"), default="reference")
+    parser.add_argument("--unique", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--max-in-flight", type=int, default=256)
+    parser.add_argument("--timeout", type=float, default=TIMEOUT)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument("--json", type=Path, help="Relatório agregado em JSON")
+    parser.add_argument("--csv", type=Path, help="Uma linha por requisição, com as etapas do Server-Timing")
+    args = parser.parse_args(argv)
+    args.profile = args.profile or [parse_profile("generate-video")]
+    if not args.concurrency and args.rate <= 0:
+        parser.error("--rate must be positive")
+    return args
+
+
+async def _main(args: argparse.Namespace) -> int:
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=64)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        generator = LoadGenerator(args, client)
+        wall = await generator.run()
+
+    report = build_report(args, generator.records, wall)
+    print_summary(report)
+    if args.json:
+        args.json.write_text(json.dumps(report, indent=2) + "\n")
+    if args.csv:
+        write_csv(args.csv, generator.records)
+    return 0 if report["overall"]["errors"] == {} else 1
+
+
+def main(argv: list[str] | None = None) -> int:
+    return asyncio.run(_main(_parse_args(argv)))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,194 @@
+import json
+import logging
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.asset_cache")
+
+# Injetado no script da cena. Cada render continua compilando LaTeX no seu próprio tex_dir
+# (temporário), então arquivos intermediários nunca colidem; só o SVG final é publicado no
+# cache compartilhado via arquivo temporário + os.replace, tornando a escrita atômica.
+ASSET_CACHE_PATCH = """
+def _manim_api_share_assets():
+    import hashlib
+    import json
+    import os
+    import shutil
+    import uuid
+    from pathlib import Path
+
+    try:
+        from manim import config
+        from manim.mobject.text import tex_mobject, text_mobject
+        from manim.scene.scene import Scene
+        from manim.utils import tex_file_writing
+    except ImportError:
+        return
+
+    if getattr(Scene.render, "_manim_api_assets_patched", False):
+        return
+
+    stats = {"hits": 0, "misses": 0}
+
+    def lookup(kind, key, produce):
+        root = os.environ.get("MANIM_API_ASSET_CACHE_DIR")
+        if not root:
+            return produce()
+        cached = Path(root) / kind / f"{key}.svg"
+        if cached.exists():
+            os.utime(cached)
+            stats["hits"] += 1
+            return cached
+        stats["misses"] += 1
+        produced = Path(produce())
+        tmp = cached.with_name(f".{cached.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            cached.parent.mkdir(parents=True, exist_ok=True)
+            shutil.copyfile(produced, tmp)
+            os.replace(tmp, cached)
+        except OSError:
+            tmp.unlink(missing_ok=True)
+        return produced
+
+    original_tex_to_svg = tex_file_writing.tex_to_svg_file
+
+    def tex_to_svg_file(expression, environment=None, tex_template=None):
+        template = tex_template or config["tex_template"]
+        fingerprint = repr(
+            (expression, environment, template.body, template.tex_compiler, template.output_format)
+        )
+        key = hashlib.sha256(fingerprint.encode("utf-8")).hexdigest()
+        return lookup("tex", key, lambda: original_tex_to_svg(expression, environment, tex_template))
+
+    tex_file_writing.tex_to_svg_file = tex_to_svg_file
+    tex_mobject.tex_to_svg_file = tex_to_svg_file
+
+    def wrap_text2svg(original):
+        def _text2svg(self, *args, **kwargs):
+            try:
+                key = self._text2hash(*args, **kwargs)
+            except Exception:
+                return original(self, *args, **kwargs)
+            return str(lookup("text", key, lambda: original(self, *args, **kwargs)))
+
+        return _text2svg
+
+    for text_class in (text_mobject.Text, text_mobject.MarkupText):
+        original = text_class.__dict__.get("_text2svg")
+        if original is not None:
+            text_class._text2svg = wrap_text2svg(original)
+
+    original_render = Scene.render
+
+    def render(self, *args, **kwargs):
+        stats.update(hits=0, misses=0)
+        try:
+            return original_render(self, *args, **kwargs)
+        finally:
+            stats_file = os.environ.get("MANIM_API_ASSET_STATS_FILE")
+            if stats_file:
+                Path(stats_file).write_text(json.dumps(stats))
+
+    render._manim_api_assets_patched = True
+    Scene.render = render
+
+
+_manim_api_share_assets()
+del _manim_api_share_assets
+"""
+
+STATS_FILE_NAME = "asset_stats.json"
+
+
+@dataclass
+class AssetCacheStats:
+    hits: int
+    misses: int
+    hit_rate: float
+    entries: int
+    size_bytes: int
+
+
+class AssetCache:
+    """Cache compartilhado de SVGs de Tex/Text entre renders, com despejo por tamanho."""
+
+    def __init__(self, root: Path, max_bytes: int, evict_interval_seconds: float = 60.0):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.evict_interval_seconds = evict_interval_seconds
+        self._lock = threading.Lock()
+        self._last_evict = 0.0
+        self.hits = 0
+        self.misses = 0
+
+    def env(self, work_dir: Path) -> dict[str, str]:
+        return {
+            "MANIM_API_ASSET_CACHE_DIR": str(self.root.resolve()),
+            "MANIM_API_ASSET_STATS_FILE": str(work_dir / STATS_FILE_NAME),
+        }
+
+    def record(self, work_dir: Path) -> None:
+        """Agrega os contadores escritos pelo patch e despeja entradas antigas periodicamente."""
+        stats_file = work_dir / STATS_FILE_NAME
+        try:
+            data = json.loads(stats_file.read_text())
+        except (OSError, ValueError):
+            data = {}
+        with self._lock:
+            self.hits += int(data.get("hits", 0))
+            self.misses += int(data.get("misses", 0))
+            due = time.monotonic() - self._last_evict >= self.evict_interval_seconds
+            if due:
+                self._last_evict = time.monotonic()
+        if due:
+            self.evict()
+
+    def _entries(self) -> list[tuple[Path, float, int]]:
+        entries = []
+        for path in self.root.glob("*/*.svg"):
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path, stat.st_mtime, stat.st_size))
+        return entries
+
+    def evict(self) -> int:
+        if not self.root.exists():
+            return 0
+        entries = sorted(self._entries(), key=lambda item: item[1])
+        total = sum(size for _, _, size in entries)
+        removed = 0
+        for path, _, size in entries:
+            if total <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            total -= size
+            removed += 1
+        if removed:
+            logger.info("Evicted %s Tex/Text assets from shared cache", removed)
+        return removed
+
+    def stats(self) -> AssetCacheStats:
+        entries = self._entries() if self.root.exists() else []
+        lookups = self.hits + self.misses
+        return AssetCacheStats(
+            hits=self.hits,
+            misses=self.misses,
+            hit_rate=self.hits / lookups if lookups else 0.0,
+            entries=len(entries),
+            size_bytes=sum(size for _, _, size in entries),
+        )
+
+
+asset_cache: Optional[AssetCache] = (
+    AssetCache(root=Path(settings.asset_cache_dir), max_bytes=settings.asset_cache_max_mb * 1024 * 1024)
+    if settings.asset_cache_enabled
+    else None
+)
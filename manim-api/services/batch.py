@@ -0,0 +1,76 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, AsyncIterator, Optional
+
+from config import get_settings
+from services.pipeline import PipelineResult, run_video_pipeline
+from services.render_progress import progress_hub
+from services.render_scheduler import render_scheduler
+from services.tracing import trace_request
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.batch")
+
+
+def batch_concurrency(requested: Optional[int] = None) -> int:
+    """Itens em andamento ao mesmo tempo; o pedido do cliente só pode reduzir o padrão do servidor."""
+    # Com o dobro dos slots, a geração de código de um item corre enquanto outro renderiza
+    limit = settings.batch_concurrency or 2 * render_scheduler.slots
+    return max(1, min(requested or limit, limit))
+
+
+@dataclass
+class BatchOutcome:
+    index: int
+    request_id: str
+    result: Optional[PipelineResult] = None
+    error: Optional[str] = None
+    seconds: float = 0.0
+
+
+async def run_batch(
+    items: list[dict[str, Any]],
+    request_id: str,
+    concurrency: int,
+) -> AsyncIterator[BatchOutcome]:
+    """Executa os itens com concorrência limitada e os entrega na ordem em que terminam.
+
+    Cada item é um pipeline comum (`{request_id}-{índice}`), com trace e canal de eventos próprios.
+    Se o consumidor parar de iterar (cliente desconectado), os itens não concluídos são cancelados,
+    inclusive os em andamento: o LLM é interrompido e o processo do Manim, encerrado.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run_item(index: int, item: dict[str, Any]) -> BatchOutcome:
+        item_id = f"{request_id}-{index}"
+        async with semaphore:
+            started = time.perf_counter()
+            outcome = BatchOutcome(index, item_id)
+            with trace_request(item_id, "BATCH", f"/batch/{request_id}/{index}"):
+                try:
+                    # Sem rejeição por fila cheia: o semáforo já limita quanto o lote ocupa do scheduler
+                    outcome.result = await run_video_pipeline(request_id=item_id, reject_when_full=False, **item)
+                except asyncio.CancelledError:
+                    raise
+                except Exception as exc:
+                    # RenderCostExceeded e falhas inesperadas derrubam só este item
+                    logger.warning("[%s] Batch item failed: %s", item_id, exc)
+                    outcome.error = str(exc)
+            outcome.seconds = time.perf_counter() - started
+        progress_hub.close(item_id, success=outcome.result is not None and outcome.result.success)
+        return outcome
+
+    tasks = [asyncio.create_task(run_item(index, item)) for index, item in enumerate(items)]
+    logger.info("[%s] Batch started (items=%d, concurrency=%d)", request_id, len(items), concurrency)
+    try:
+        for finished in asyncio.as_completed(tasks):
+            yield await finished
+    finally:
+        pending = [task for task in tasks if not task.done()]
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if pending:
+            logger.warning("[%s] Batch interrupted; cancelled %d unfinished items", request_id, len(pending))
@@ -0,0 +1,357 @@
+import ast
+import re
+import threading
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+DANGEROUS_IMPORTS = {
+    "os",
+    "sys",
+    "subprocess",
+    "shutil",
+    "socket",
+    "urllib",
+    "requests",
+    "pickle",
+    "ctypes",
+    "multiprocessing",
+    "pty",
+}
+
+DANGEROUS_FUNCTIONS = {"eval", "exec", "open", "__import__", "compile"}
+
+SCENE_BASES = {
+    "Scene",
+    "ThreeDScene",
+    "SpecialThreeDScene",
+    "MovingCameraScene",
+    "ZoomedScene",
+    "VectorScene",
+    "LinearTransformationScene",
+}
+THREE_D_BASES = {"ThreeDScene", "SpecialThreeDScene"}
+
+COLOR_FALLBACKS = {
+    "CYAN": "TEAL",
+    "CYAN_A": "TEAL_A",
+    "CYAN_B": "TEAL_B",
+    "CYAN_C": "TEAL_C",
+    "CYAN_D": "TEAL_D",
+    "CYAN_E": "TEAL_E",
+}
+
+# Usado quando o código nem compila: ainda assim devolvemos o nome provável da cena
+SCENE_CLASS_PATTERN = re.compile(r"class\s+(\w+)\s*\(\s*(?:Scene|ThreeDScene|MovingCameraScene)\s*\)")
+
+MISSING_MANIM_IMPORT_MESSAGE = (
+    "Missing 'from manim import' statement. Reforce no prompt que o código deve começar com "
+    "`from manim import *` (ou imports equivalentes) antes da classe da cena."
+)
+MISSING_SCENE_CLASS_MESSAGE = (
+    "Missing Scene class definition. Ajuste sua descrição para pedir explicitamente uma classe como "
+    "`class MinhaCena(Scene):` contendo o método construct com as animações desejadas."
+)
+MISSING_CONSTRUCT_MESSAGE = (
+    "Missing construct method. Solicite no prompt que a classe Scene implemente `def construct(self):` "
+    "com os passos da animação."
+)
+
+
+@dataclass
+class Violation:
+    rule: str
+    message: str
+    line: int
+
+
+@dataclass
+class Rewrite:
+    rule: str
+    description: str
+    line: int
+
+
+@dataclass
+class SceneClass:
+    name: str
+    bases: list[str]
+    line: int
+    has_construct: bool
+
+
+@dataclass
+class CodeAnalysis:
+    """Relatório estruturado de uma única análise do código gerado."""
+
+    code: str
+    syntax_error: Optional[str] = None
+    scene_classes: list[SceneClass] = field(default_factory=list)
+    has_manim_import: bool = False
+    violations: list[Violation] = field(default_factory=list)
+    rewrites: list[Rewrite] = field(default_factory=list)
+    calls: Counter = field(default_factory=Counter)
+    # Chamadas multiplicadas pelas iterações conhecidas dos laços que as envolvem
+    weighted_calls: Counter = field(default_factory=Counter)
+    play_calls: int = 0
+    wait_calls: int = 0
+    loops: int = 0
+    dynamic_loops: int = 0
+    estimated_play_seconds: float = 0.0
+    estimated_wait_seconds: float = 0.0
+
+    @property
+    def scene(self) -> Optional[SceneClass]:
+        for scene in self.scene_classes:
+            if scene.has_construct:
+                return scene
+        return self.scene_classes[0] if self.scene_classes else None
+
+    @property
+    def scene_name(self) -> Optional[str]:
+        if self.scene is not None:
+            return self.scene.name
+        if self.syntax_error:
+            match = SCENE_CLASS_PATTERN.search(self.code)
+            return match.group(1) if match else None
+        return None
+
+    @property
+    def is_three_d(self) -> bool:
+        return self.scene is not None and bool(THREE_D_BASES.intersection(self.scene.bases))
+
+    @property
+    def estimated_duration_seconds(self) -> float:
+        return self.estimated_play_seconds + self.estimated_wait_seconds
+
+    def validation(self) -> tuple[bool, str]:
+        """Mesmo contrato e mensagens de `validate_code`."""
+        if self.syntax_error:
+            return False, f"Syntax error: {self.syntax_error}"
+        if not self.has_manim_import:
+            return False, MISSING_MANIM_IMPORT_MESSAGE
+        if not self.scene_classes:
+            return False, MISSING_SCENE_CLASS_MESSAGE
+        if not any(scene.has_construct for scene in self.scene_classes):
+            return False, MISSING_CONSTRUCT_MESSAGE
+        if self.violations:
+            return False, self.violations[0].message
+        return True, "Code validated successfully"
+
+
+@dataclass
+class Rule:
+    """Regra aplicada a cada nó de um dos tipos indicados durante a travessia."""
+
+    name: str
+    node_types: tuple[type, ...]
+    check: Callable[[ast.AST, "_Analyzer"], None]
+
+
+def _call_name(node: ast.Call) -> Optional[str]:
+    if isinstance(node.func, ast.Attribute):
+        return node.func.attr
+    if isinstance(node.func, ast.Name):
+        return node.func.id
+    return None
+
+
+def _base_name(node: ast.expr) -> Optional[str]:
+    if isinstance(node, ast.Attribute):
+        return node.attr
+    if isinstance(node, ast.Name):
+        return node.id
+    return None
+
+
+def _number(node: Optional[ast.expr]) -> Optional[float]:
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) and not isinstance(node.value, bool):
+        return float(node.value)
+    return None
+
+
+def _check_import(node: ast.AST, analyzer: "_Analyzer") -> None:
+    if isinstance(node, ast.Import):
+        for alias in node.names:
+            if alias.name.split(".")[0] in DANGEROUS_IMPORTS:
+                analyzer.violate("forbidden_import", f"Forbidden import: {alias.name}", node)
+        return
+    module = node.module or ""
+    if module.split(".")[0] in DANGEROUS_IMPORTS:
+        analyzer.violate("forbidden_import", f"Forbidden import: from {node.module}", node)
+    if module.split(".")[0] == "manim":
+        analyzer.report.has_manim_import = True
+
+
+def _check_dangerous_call(node: ast.AST, analyzer: "_Analyzer") -> None:
+    if isinstance(node.func, ast.Name) and node.func.id in DANGEROUS_FUNCTIONS:
+        analyzer.violate("forbidden_function", f"Forbidden function: {node.func.id}()", node)
+
+
+def _rewrite_background_rectangle(node: ast.AST, analyzer: "_Analyzer") -> None:
+    if _call_name(node) != "add_background_rectangle":
+        return
+    for keyword in node.keywords:
+        if keyword.arg == "fill_opacity":
+            keyword.arg = "opacity"
+            analyzer.rewrite("background_rectangle_opacity", "fill_opacity → opacity", node)
+
+
+def _rewrite_add_tip(node: ast.AST, analyzer: "_Analyzer") -> None:
+    if _call_name(node) != "add_tip" or not node.keywords:
+        return
+    filtered = [keyword for keyword in node.keywords if keyword.arg != "tip_style"]
+    if len(filtered) != len(node.keywords):
+        node.keywords = filtered
+        analyzer.rewrite("add_tip_style", "removed tip_style", node)
+
+
+def _rewrite_color(node: ast.AST, analyzer: "_Analyzer") -> None:
+    replacement = COLOR_FALLBACKS.get(node.id)
+    if replacement:
+        analyzer.rewrite("color_fallback", f"{node.id} → {replacement}", node)
+        node.id = replacement
+
+
+def _collect_call_facts(node: ast.AST, analyzer: "_Analyzer") -> None:
+    name = _call_name(node)
+    if name is None:
+        return
+    report = analyzer.report
+    report.calls[name] += 1
+    report.weighted_calls[name] += analyzer.multiplier
+    if name == "play":
+        report.play_calls += 1
+        run_time = next((_number(keyword.value) for keyword in node.keywords if keyword.arg == "run_time"), None)
+        report.estimated_play_seconds += (run_time or 1.0) * analyzer.multiplier
+    elif name == "wait":
+        report.wait_calls += 1
+        duration = _number(node.args[0]) if node.args else None
+        report.estimated_wait_seconds += (duration if duration is not None else 1.0) * analyzer.multiplier
+
+
+RULES: list[Rule] = [
+    Rule("imports", (ast.Import, ast.ImportFrom), _check_import),
+    Rule("dangerous_calls", (ast.Call,), _check_dangerous_call),
+    Rule("background_rectangle_opacity", (ast.Call,), _rewrite_background_rectangle),
+    Rule("add_tip_style", (ast.Call,), _rewrite_add_tip),
+    Rule("color_fallback", (ast.Name,), _rewrite_color),
+    Rule("call_facts", (ast.Call,), _collect_call_facts),
+]
+
+
+def register_rule(rule: Rule) -> None:
+    RULES.append(rule)
+
+
+def _loop_iterations(node: ast.For | ast.While) -> Optional[int]:
+    if not isinstance(node, ast.For):
+        return None
+    iterable = node.iter
+    if isinstance(iterable, (ast.List, ast.Tuple, ast.Set)):
+        return len(iterable.elts)
+    if isinstance(iterable, ast.Call) and _call_name(iterable) == "range" and 0 < len(iterable.args) <= 3:
+        bounds = [arg.value for arg in iterable.args if isinstance(arg, ast.Constant) and type(arg.value) is int]
+        if len(bounds) == len(iterable.args) and (len(bounds) < 3 or bounds[2] != 0):
+            return len(range(*bounds))
+    return None
+
+
+class _Analyzer:
+    def __init__(self, report: CodeAnalysis, rules: list[Rule]):
+        self.report = report
+        self.multiplier = 1.0
+        self._rules_by_type: dict[type, list[Rule]] = {}
+        for rule in rules:
+            for node_type in rule.node_types:
+                self._rules_by_type.setdefault(node_type, []).append(rule)
+
+    def violate(self, rule: str, message: str, node: ast.AST) -> None:
+        self.report.violations.append(Violation(rule=rule, message=message, line=getattr(node, "lineno", 0)))
+
+    def rewrite(self, rule: str, description: str, node: ast.AST) -> None:
+        self.report.rewrites.append(Rewrite(rule=rule, description=description, line=getattr(node, "lineno", 0)))
+
+    def visit(self, node: ast.AST) -> None:
+        if isinstance(node, ast.ClassDef):
+            self._visit_class(node)
+        if isinstance(node, (ast.For, ast.While)):
+            self._visit_loop(node)
+            return
+        self._visit_children(node)
+        # Filhos antes do pai, como o NodeTransformer original: reescritas internas valem primeiro
+        for rule in self._rules_by_type.get(type(node), ()):
+            rule.check(node, self)
+
+    def _visit_children(self, node: ast.AST) -> None:
+        for child in ast.iter_child_nodes(node):
+            self.visit(child)
+
+    def _visit_loop(self, node: ast.For | ast.While) -> None:
+        self.report.loops += 1
+        iterations = _loop_iterations(node)
+        if iterations is None:
+            self.report.dynamic_loops += 1
+        previous = self.multiplier
+        self.multiplier = previous * (iterations if iterations is not None else 1)
+        for child in node.body:
+            self.visit(child)
+        self.multiplier = previous
+        for child in (node.iter, node.target) if isinstance(node, ast.For) else (node.test,):
+            self.visit(child)
+        for child in node.orelse:
+            self.visit(child)
+
+    def _visit_class(self, node: ast.ClassDef) -> None:
+        bases = [name for name in (_base_name(base) for base in node.bases) if name]
+        has_construct = any(
+            isinstance(item, (ast.FunctionDef, ast.AsyncFunctionDef)) and item.name == "construct" for item in node.body
+        )
+        self.report.scene_classes.append(SceneClass(node.name, bases, node.lineno, has_construct))
+
+
+def _keep_scene_classes(classes: list[SceneClass]) -> list[SceneClass]:
+    """Mantém só classes que herdam (direta ou indiretamente, no próprio módulo) de uma Scene do Manim."""
+    scene_names = set(SCENE_BASES)
+    changed = True
+    while changed:
+        changed = False
+        for cls in classes:
+            if cls.name not in scene_names and scene_names.intersection(cls.bases):
+                scene_names.add(cls.name)
+                changed = True
+    return [cls for cls in classes if scene_names.intersection(cls.bases)]
+
+
+# ast.parse não é seguro entre threads no CPython 3.11 ("AST constructor recursion depth mismatch", gh-106905);
+# o código é analisado tanto no loop quanto nas threads de render
+_parse_lock = threading.Lock()
+
+
+def parse_code(code: str) -> ast.Module:
+    with _parse_lock:
+        return ast.parse(code)
+
+
+def analyze_code(code: str, rules: Optional[list[Rule]] = None) -> CodeAnalysis:
+    """Faz parse uma única vez e, numa só travessia, coleta cenas, violações, reescritas e métricas."""
+    report = CodeAnalysis(code=code)
+    try:
+        tree = parse_code(code)
+    except SyntaxError as exc:
+        report.syntax_error = str(exc)
+        return report
+
+    _Analyzer(report, RULES if rules is None else rules).visit(tree)
+    report.scene_classes = _keep_scene_classes(report.scene_classes)
+    if report.rewrites:
+        ast.fix_missing_locations(tree)
+        report.code = ast.unparse(tree)
+    return report
+
+
+def scene_name_or_raise(analysis: CodeAnalysis) -> str:
+    name = analysis.scene_name
+    if name is None:
+        raise ValueError("Could not find Scene class in code")
+    return name
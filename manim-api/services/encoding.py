@@ -0,0 +1,190 @@
+import logging
+import shutil
+import subprocess
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+logger = logging.getLogger("manim_api.encoding")
+
+
+@dataclass(frozen=True)
+class EncodingProfile:
+    suffix: str
+    content_type: str
+    args: tuple[str, ...]
+
+
+_FASTSTART = ("-movflags", "+faststart")
+_H264 = ("-c:v", "libx264", "-pix_fmt", "yuv420p")
+
+# Sem perfil, o MP4 que o Manim grava é entregue como está (nenhuma recodificação extra).
+ENCODING_PROFILES = {
+    "fast-preview": EncodingProfile(
+        ".mp4", "video/mp4", (*_H264, "-preset", "ultrafast", "-crf", "28", "-c:a", "aac", *_FASTSTART)
+    ),
+    "balanced": EncodingProfile(
+        ".mp4", "video/mp4", (*_H264, "-preset", "medium", "-crf", "23", "-c:a", "aac", *_FASTSTART)
+    ),
+    "archival": EncodingProfile(
+        ".mp4", "video/mp4", (*_H264, "-preset", "slow", "-crf", "16", "-c:a", "aac", "-b:a", "192k", *_FASTSTART)
+    ),
+    # Limita a largura a 1280 px e o bitrate de pico: é o perfil para reduzir egress de renders 4K
+    "web-small": EncodingProfile(
+        ".mp4",
+        "video/mp4",
+        (
+            "-vf",
+            "scale='min(1280,iw)':-2",
+            *_H264,
+            "-preset",
+            "slow",
+            "-crf",
+            "30",
+            "-maxrate",
+            "1500k",
+            "-bufsize",
+            "3000k",
+            "-c:a",
+            "aac",
+            "-b:a",
+            "96k",
+            *_FASTSTART,
+        ),
+    ),
+    "webm": EncodingProfile(
+        ".webm",
+        "video/webm",
+        (
+            "-c:v",
+            "libvpx-vp9",
+            "-crf",
+            "33",
+            "-b:v",
+            "0",
+            "-deadline",
+            "good",
+            "-cpu-used",
+            "4",
+            "-row-mt",
+            "1",
+            "-pix_fmt",
+            "yuv420p",
+            "-c:a",
+            "libopus",
+        ),
+    ),
+    # Paleta gerada a partir do próprio vídeo: GIF menor e sem banding
+    "gif": EncodingProfile(
+        ".gif",
+        "image/gif",
+        (
+            "-vf",
+            "fps=15,scale='min(960,iw)':-2:flags=lanczos,split[a][b];"
+            "[a]palettegen=stats_mode=diff[p];[b][p]paletteuse=dither=bayer",
+            "-loop",
+            "0",
+            "-an",
+        ),
+    ),
+}
+
+# Formatos de quadro único (imagens estáticas e miniaturas)
+IMAGE_PROFILES = {
+    "png": EncodingProfile(".png", "image/png", ("-c:v", "png")),
+    "webp": EncodingProfile(".webp", "image/webp", ("-c:v", "libwebp", "-quality", "85", "-compression_level", "4")),
+}
+
+_CONTENT_TYPES = {".mp4": "video/mp4"}
+_CONTENT_TYPES.update((profile.suffix, profile.content_type) for profile in ENCODING_PROFILES.values())
+_CONTENT_TYPES.update((profile.suffix, profile.content_type) for profile in IMAGE_PROFILES.values())
+_IMAGE_SUFFIXES = {profile.suffix for profile in IMAGE_PROFILES.values()}
+
+
+def content_type_for(path: Path | str) -> str:
+    return _CONTENT_TYPES.get(Path(path).suffix.lower(), "application/octet-stream")
+
+
+@dataclass
+class TranscodeResult:
+    output_path: Optional[Path] = None
+    seconds: float = 0.0
+    error: Optional[str] = None
+    timed_out: bool = False
+
+
+def transcode(
+    source: Path,
+    profile_name: str,
+    threads: int | None,
+    timeout: int,
+    request_id: str,
+) -> TranscodeResult:
+    """Recodifica o MP4 do Manim com o perfil pedido, gravando ao lado do original."""
+    profile = ENCODING_PROFILES[profile_name]
+    if shutil.which("ffmpeg") is None:
+        return TranscodeResult(error=f"ffmpeg is required for the '{profile_name}' encoding profile")
+
+    output = source.with_name(f"{source.stem}.{profile_name}{profile.suffix}")
+    cmd = ["ffmpeg", "-y", "-loglevel", "error", "-i", str(source), *profile.args]
+    if threads:
+        cmd += ["-threads", str(threads)]
+    cmd.append(str(output))
+    logger.info("[%s] Transcoding with profile %s: %s", request_id, profile_name, " ".join(cmd))
+
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return TranscodeResult(error=f"Encoding timeout after {timeout} seconds", timed_out=True)
+    seconds = time.perf_counter() - started
+    if result.returncode != 0 or not output.exists():
+        return TranscodeResult(seconds=seconds, error=result.stderr.strip() or "ffmpeg encoding failed")
+    logger.info(
+        "[%s] Transcoded to %s in %.2fs (%s → %s bytes)",
+        request_id,
+        profile_name,
+        seconds,
+        source.stat().st_size,
+        output.stat().st_size,
+    )
+    return TranscodeResult(output_path=output, seconds=seconds)
+
+
+def extract_frame(
+    source: Path,
+    image_format: str,
+    timeout: int,
+    request_id: str,
+    at_time: float | None = None,
+    max_width: int | None = None,
+) -> TranscodeResult:
+    """Grava um único quadro: de um vídeo (o último, ou o de `at_time`) ou convertendo uma imagem."""
+    profile = IMAGE_PROFILES[image_format]
+    if shutil.which("ffmpeg") is None:
+        return TranscodeResult(error=f"ffmpeg is required for {image_format} frames")
+
+    output = source.with_name(f"{source.stem}.frame{profile.suffix}")
+    cmd = ["ffmpeg", "-y", "-loglevel", "error"]
+    if source.suffix.lower() in _IMAGE_SUFFIXES:
+        cmd += ["-i", str(source), "-frames:v", "1"]
+    elif at_time is None:
+        # Lê só o final do arquivo e sobrescreve a saída a cada quadro: sobra o último
+        cmd += ["-sseof", "-0.5", "-i", str(source), "-update", "1"]
+    else:
+        cmd += ["-ss", f"{at_time:.3f}", "-i", str(source), "-frames:v", "1"]
+    if max_width:
+        cmd += ["-vf", f"scale='min({max_width},iw)':-2"]
+    cmd += [*profile.args, str(output)]
+
+    started = time.perf_counter()
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return TranscodeResult(error=f"Frame extraction timeout after {timeout} seconds", timed_out=True)
+    seconds = time.perf_counter() - started
+    if result.returncode != 0 or not output.exists():
+        return TranscodeResult(seconds=seconds, error=result.stderr.strip() or "ffmpeg frame extraction failed")
+    logger.info("[%s] Extracted %s frame in %.2fs (%s bytes)", request_id, image_format, seconds, output.stat().st_size)
+    return TranscodeResult(output_path=output, seconds=seconds)
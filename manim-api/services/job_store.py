@@ -0,0 +1,159 @@
+import asyncio
+import json
+import sqlite3
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+_JSON_COLUMNS = ("request", "result", "timings")
+
+
+@dataclass
+class JobRecord:
+    id: str
+    status: str
+    stage: str
+    request: dict[str, Any]
+    created_at: float
+    updated_at: float
+    result: dict[str, Any] = field(default_factory=dict)
+    timings: dict[str, float] = field(default_factory=dict)
+    video_path: Optional[str] = None
+    idempotency_key: Optional[str] = None
+
+
+class JobStore:
+    """Armazena jobs em SQLite para que sobrevivam a reinícios do servidor."""
+
+    def __init__(self, db_path: Path):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT NOT NULL, stage TEXT NOT NULL, "
+            "request TEXT NOT NULL, result TEXT NOT NULL DEFAULT '{}', "
+            "timings TEXT NOT NULL DEFAULT '{}', video_path TEXT, "
+            "created_at REAL NOT NULL, updated_at REAL NOT NULL)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "idempotency_key" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN idempotency_key TEXT")
+        self._conn.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS jobs_idempotency_key ON jobs (idempotency_key) "
+            "WHERE idempotency_key IS NOT NULL"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status_updated ON jobs (status, updated_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def _row_to_record(row: sqlite3.Row) -> JobRecord:
+        data = dict(row)
+        for column in _JSON_COLUMNS:
+            data[column] = json.loads(data[column])
+        return JobRecord(**data)
+
+    def _query(self, sql: str, params: tuple = ()) -> list[JobRecord]:
+        with self._lock:
+            self._conn.row_factory = sqlite3.Row
+            rows = self._conn.execute(sql, params).fetchall()
+        return [self._row_to_record(row) for row in rows]
+
+    def create(self, request: dict[str, Any], idempotency_key: Optional[str] = None) -> tuple[JobRecord, bool]:
+        """Cria o job; com uma chave de idempotência já usada, devolve o job existente (created=False)."""
+        if idempotency_key is not None:
+            existing = self.find_by_idempotency_key(idempotency_key)
+            if existing is not None:
+                return existing, False
+        now = time.time()
+        record = JobRecord(
+            id=uuid.uuid4().hex,
+            status=JOB_QUEUED,
+            stage=JOB_QUEUED,
+            request=request,
+            created_at=now,
+            updated_at=now,
+            idempotency_key=idempotency_key,
+        )
+        with self._lock:
+            try:
+                self._conn.execute(
+                    "INSERT INTO jobs (id, status, stage, request, created_at, updated_at, idempotency_key) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                    (record.id, record.status, record.stage, json.dumps(request), now, now, idempotency_key),
+                )
+                self._conn.commit()
+            except sqlite3.IntegrityError:
+                self._conn.rollback()
+                record = None
+        if record is None:
+            # Outra requisição com a mesma chave venceu a corrida
+            return self.find_by_idempotency_key(idempotency_key), False
+        return record, True
+
+    # Versões para o event loop: consultas e commits do SQLite são bloqueantes
+    async def acreate(
+        self, request: dict[str, Any], idempotency_key: Optional[str] = None
+    ) -> tuple[JobRecord, bool]:
+        return await asyncio.to_thread(self.create, request, idempotency_key)
+
+    async def aget(self, job_id: str) -> Optional[JobRecord]:
+        return await asyncio.to_thread(self.get, job_id)
+
+    async def aupdate(self, job_id: str, **fields: Any) -> None:
+        await asyncio.to_thread(self.update, job_id, **fields)
+
+    async def aunfinished(self) -> list[JobRecord]:
+        return await asyncio.to_thread(self.unfinished)
+
+    def find_by_idempotency_key(self, idempotency_key: str) -> Optional[JobRecord]:
+        records = self._query("SELECT * FROM jobs WHERE idempotency_key = ?", (idempotency_key,))
+        return records[0] if records else None
+
+    def get(self, job_id: str) -> Optional[JobRecord]:
+        records = self._query("SELECT * FROM jobs WHERE id = ?", (job_id,))
+        return records[0] if records else None
+
+    def update(self, job_id: str, **fields: Any) -> None:
+        if not fields:
+            return
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        values = [json.dumps(value) if column in _JSON_COLUMNS else value for column, value in fields.items()]
+        with self._lock:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*values, job_id))
+            self._conn.commit()
+
+    def unfinished(self) -> list[JobRecord]:
+        return self._query(
+            "SELECT * FROM jobs WHERE status IN (?, ?) ORDER BY created_at",
+            (JOB_QUEUED, JOB_RUNNING),
+        )
+
+    def purge_finished(self, older_than: float) -> list[JobRecord]:
+        """Apaga jobs concluídos antes de `older_than` (epoch) e devolve os registros removidos.
+
+        Com a linha vai também a chave de idempotência, que fica livre para um novo job.
+        """
+        expired = self._query(
+            "SELECT * FROM jobs WHERE status IN (?, ?) AND updated_at < ?",
+            (JOB_SUCCEEDED, JOB_FAILED, older_than),
+        )
+        if expired:
+            with self._lock:
+                self._conn.executemany("DELETE FROM jobs WHERE id = ?", [(record.id,) for record in expired])
+                self._conn.commit()
+        return expired
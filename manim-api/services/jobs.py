@@ -0,0 +1,213 @@
+import asyncio
+import logging
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from config import get_settings
+from services.job_store import (
+    JOB_FAILED,
+    JOB_QUEUED,
+    JOB_RUNNING,
+    JOB_SUCCEEDED,
+    JobRecord,
+    JobStore,
+)
+from schemas import CodeResponse
+from services.pipeline import run_video_pipeline
+from services.render_progress import progress_hub
+from services.single_flight import IdempotencyConflict
+from services.tracing import trace_request
+from services.video_store import link_or_copy
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.jobs")
+
+
+class JobManager:
+    """Fila assíncrona de jobs de vídeo, executados por workers em background."""
+
+    def __init__(self, store: JobStore, output_dir: Path, workers: int, ttl_seconds: int = 0):
+        self.store = store
+        self.output_dir = output_dir
+        self.workers = workers
+        self.ttl_seconds = ttl_seconds
+        self._queue: Optional[asyncio.Queue[str]] = None
+        self._tasks: list[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._queue = asyncio.Queue()
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        # Jobs interrompidos por um reinício voltam para a fila
+        for record in await self.store.aunfinished():
+            await self.store.aupdate(record.id, status=JOB_QUEUED, stage=JOB_QUEUED)
+            self._queue.put_nowait(record.id)
+            logger.info("[%s] Re-enqueued unfinished job after restart", record.id)
+        await asyncio.to_thread(self.cleanup)
+        self._tasks = [asyncio.create_task(self._worker(index)) for index in range(self.workers)]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def submit(self, request: dict[str, Any], idempotency_key: Optional[str] = None) -> tuple[JobRecord, bool]:
+        """Enfileira o job e retorna (registro, criado). Chaves repetidas devolvem o job original."""
+        if self._queue is None:
+            raise RuntimeError("Job manager is not running")
+        record, created = await self.store.acreate(request, idempotency_key)
+        if not created:
+            if record.request != request:
+                raise IdempotencyConflict(f"Key {idempotency_key!r} was already used with a different request")
+            logger.info("[%s] Idempotency key matched existing job", record.id)
+            return record, False
+        self._queue.put_nowait(record.id)
+        progress_hub.publish(record.id, {"event": "stage", "stage": JOB_QUEUED})
+        logger.info("[%s] Job enqueued (queue_size=%s)", record.id, self._queue.qsize())
+        return record, True
+
+    def video_path(self, record: JobRecord) -> Optional[Path]:
+        if not record.video_path:
+            return None
+        path = Path(record.video_path)
+        return path if path.exists() else None
+
+    def thumbnail_path(self, record: JobRecord) -> Optional[Path]:
+        for candidate in self.output_dir.glob(f"{record.id}.thumbnail.*"):
+            return candidate
+        return None
+
+    def cleanup(self) -> int:
+        """Remove jobs concluídos há mais de `ttl_seconds` e seus arquivos, como o video store faz com vídeos."""
+        if not self.ttl_seconds:
+            return 0
+        expired = self.store.purge_finished(time.time() - self.ttl_seconds)
+        for record in expired:
+            # Vídeo ({id}.mp4 etc.) e miniatura ({id}.thumbnail.*)
+            for path in self.output_dir.glob(f"{record.id}.*"):
+                path.unlink(missing_ok=True)
+        if expired:
+            logger.info("Removed %s expired jobs from store", len(expired))
+        return len(expired)
+
+    async def _worker(self, index: int) -> None:
+        assert self._queue is not None
+        while True:
+            job_id = await self._queue.get()
+            try:
+                # O trace do job fica em /debug/requests/{job_id}, como o de uma requisição
+                with trace_request(job_id, "JOB", f"/jobs/{job_id}"):
+                    await self._run(job_id)
+            except asyncio.CancelledError:
+                raise
+            except Exception as exc:
+                logger.exception("[%s] Job worker %s crashed", job_id, index)
+                await self.store.aupdate(
+                    job_id,
+                    status=JOB_FAILED,
+                    stage=JOB_FAILED,
+                    result={"success": False, "error": str(exc)},
+                )
+            finally:
+                self._queue.task_done()
+            # Fora do finally: job cancelado no desligamento volta à fila e o canal continua aberto
+            record = await self.store.aget(job_id)
+            if record is not None and record.status == JOB_SUCCEEDED:
+                progress_hub.close(job_id, status=record.status, video_url=f"/jobs/{job_id}/video")
+            else:
+                progress_hub.close(job_id, status=record.status if record else JOB_FAILED)
+            # A cada job concluído, como o video store a cada vídeo salvo
+            await asyncio.to_thread(self.cleanup)
+
+    async def _run(self, job_id: str) -> None:
+        record = await self.store.aget(job_id)
+        if record is None:
+            return
+        request = record.request
+        await self.store.aupdate(job_id, status=JOB_RUNNING)
+
+        async def on_stage(stage: str) -> None:
+            await self.store.aupdate(job_id, stage=stage)
+
+        code_result = None
+        if request.get("code"):
+            code_result = CodeResponse(
+                code=request["code"],
+                scene_name=request["scene_name"],
+                is_valid=True,
+                validation_message="Reused from promoted job",
+            )
+        result = await run_video_pipeline(
+            description=request["description"],
+            width=request["width"],
+            height=request["height"],
+            request_id=job_id,
+            on_stage=on_stage,
+            reject_when_full=False,
+            quality=request.get("quality", "final"),
+            code_result=code_result,
+            encoding=request.get("encoding"),
+            thumbnail=request.get("thumbnail"),
+        )
+        code_result = result.code_result
+        render_result = result.render_result
+
+        if not code_result.is_valid:
+            await self.store.aupdate(
+                job_id,
+                status=JOB_FAILED,
+                stage=JOB_FAILED,
+                timings=result.timings,
+                result={
+                    "success": False,
+                    "error": f"Code generation failed: {code_result.validation_message}",
+                },
+            )
+            return
+
+        if not result.success:
+            await self.store.aupdate(
+                job_id,
+                status=JOB_FAILED,
+                stage=JOB_FAILED,
+                timings=result.timings,
+                result={
+                    "success": False,
+                    "scene_name": code_result.scene_name,
+                    "code": code_result.code,
+                    "error": render_result.error,
+                    "render_logs": render_result.stderr,
+                },
+            )
+            return
+
+        rendered = Path(render_result.video_path)
+        # Cópia entre sistemas de arquivos pode levar segundos: fora do event loop, como o SQLite
+        video_path = await asyncio.to_thread(link_or_copy, rendered, self.output_dir / f"{job_id}{rendered.suffix}")
+        if render_result.thumbnail_path:
+            thumbnail = Path(render_result.thumbnail_path)
+            await asyncio.to_thread(
+                link_or_copy, thumbnail, self.output_dir / f"{job_id}.thumbnail{thumbnail.suffix}"
+            )
+        await self.store.aupdate(
+            job_id,
+            status=JOB_SUCCEEDED,
+            stage="done",
+            timings=result.timings,
+            video_path=str(video_path),
+            result={
+                "success": True,
+                "scene_name": code_result.scene_name,
+                "code": code_result.code,
+            },
+        )
+        logger.info("[%s] Job completed (scene=%s)", job_id, code_result.scene_name)
+
+
+job_manager = JobManager(
+    store=JobStore(Path(settings.job_store_path)),
+    output_dir=Path(settings.job_output_dir),
+    workers=settings.job_workers,
+    ttl_seconds=(settings.job_ttl_hours or settings.video_store_ttl_hours) * 3600,
+)
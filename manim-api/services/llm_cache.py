@@ -0,0 +1,118 @@
+import asyncio
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Any, Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.llm_cache")
+
+
+def normalize_description(description: str) -> str:
+    return " ".join(description.split())
+
+
+class LLMCache:
+    """Cache exato de respostas do LLM: LRU em memória com camada SQLite e TTL."""
+
+    def __init__(self, db_path: Path, ttl_seconds: int, memory_entries: int = 256):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.memory_entries = memory_entries
+        self._memory: OrderedDict[str, tuple[float, dict]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def make_key(namespace: str, description: str, video_spec: str, model: str, prompt_version: str = "") -> str:
+        """`prompt_version` identifica os textos fixos do prompt: editá-los invalida as entradas antigas."""
+        payload = json.dumps(
+            [namespace, normalize_description(description), video_spec, model, prompt_version],
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            self.db_path.parent.mkdir(parents=True, exist_ok=True)
+            self._conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS llm_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _remember(self, key: str, created_at: float, value: dict) -> None:
+        self._memory[key] = (created_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[dict]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                try:
+                    row = self._connection().execute(
+                        "SELECT value, created_at FROM llm_cache WHERE key = ?", (key,)
+                    ).fetchone()
+                except sqlite3.Error as exc:
+                    logger.warning("LLM cache lookup failed: %s", exc)
+                    row = None
+                if row is not None:
+                    entry = (row[1], json.loads(row[0]))
+                    self._remember(key, *entry)
+            else:
+                self._memory.move_to_end(key)
+
+            if entry is None or now - entry[0] > self.ttl_seconds:
+                if entry is not None:
+                    self._memory.pop(key, None)
+                self.misses += 1
+                return None
+            self.hits += 1
+            return entry[1]
+
+    async def aget(self, key: str) -> Optional[dict]:
+        """`get` fora do event loop: a consulta ao SQLite é bloqueante."""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, value: dict[str, Any]) -> None:
+        await asyncio.to_thread(self.set, key, value)
+
+    def set(self, key: str, value: dict[str, Any]) -> None:
+        now = time.time()
+        with self._lock:
+            self._remember(key, now, value)
+            try:
+                conn = self._connection()
+                conn.execute(
+                    "INSERT OR REPLACE INTO llm_cache (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, json.dumps(value, ensure_ascii=False), now),
+                )
+                conn.execute("DELETE FROM llm_cache WHERE created_at < ?", (now - self.ttl_seconds,))
+                conn.commit()
+            except sqlite3.Error as exc:
+                logger.warning("LLM cache write failed: %s", exc)
+
+
+llm_cache: Optional[LLMCache] = (
+    LLMCache(
+        db_path=Path(settings.llm_cache_path),
+        ttl_seconds=settings.llm_cache_ttl_seconds,
+        memory_entries=settings.llm_cache_memory_entries,
+    )
+    if settings.llm_cache_enabled
+    else None
+)
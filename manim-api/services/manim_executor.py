@@ -1,13 +1,23 @@
 import base64
+import json
 import logging
 import os
-import subprocess
 import tempfile
+import threading
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
 from config import get_settings
+from services.asset_cache import ASSET_CACHE_PATCH, asset_cache
+from services.encoding import ENCODING_PROFILES, IMAGE_PROFILES, extract_frame, transcode
+from services.manim_worker_pool import DRY_RUN_LANE, get_worker_pool
+from services.render_cache import render_cache
+from services.render_progress import render_progress_reporter, run_streaming
+from services.segmented_render import SKIP_ALL_ANIMATIONS, render_segmented
+from services.tracing import record_span, span
+from services.video_store import link_or_copy, video_store
 
 settings = get_settings()
 logger = logging.getLogger("manim_api.manim_executor")
@@ -33,15 +43,200 @@ if not hasattr(BackgroundRectangle, "tex_string"):
     BackgroundRectangle.tex_string = ""
 """
 
+ENCODER_THREADS_PATCH = """
+def _manim_api_limit_encoder_threads():
+    import os
+    from manim.scene.scene_file_writer import SceneFileWriter
+
+    original = getattr(SceneFileWriter, "open_partial_movie_stream", None)
+    if original is None or getattr(original, "_manim_api_patched", False):
+        return
+
+    def open_partial_movie_stream(self, *args, **kwargs):
+        original(self, *args, **kwargs)
+        # Lida a cada chamada: no pool o patch sobrevive entre tarefas com limites diferentes
+        threads = int(os.environ.get("MANIM_API_ENCODER_THREADS") or 0)
+        stream = getattr(self, "video_stream", None)
+        if threads and stream is not None:
+            stream.thread_count = threads
+
+    open_partial_movie_stream._manim_api_patched = True
+    SceneFileWriter.open_partial_movie_stream = open_partial_movie_stream
+
+
+_manim_api_limit_encoder_threads()
+del _manim_api_limit_encoder_threads
+"""
+
+# Fases medidas dentro do próprio processo do Manim; cada processo (render, segmento ou contagem)
+# acrescenta uma linha JSON em MANIM_API_PHASES_FILE. `tex` pode se sobrepor a `play` quando o
+# LaTeX é compilado durante uma animação (always_redraw, por exemplo).
+PHASE_TIMING_PATCH = """
+def _manim_api_time_phases():
+    import functools
+    import json
+    import os
+    import time
+
+    try:
+        from manim import config
+        from manim.mobject.text import tex_mobject
+        from manim.scene.scene import Scene
+        from manim.scene.scene_file_writer import SceneFileWriter
+    except ImportError:
+        return
+
+    if getattr(Scene.play, "_manim_api_phases_patched", False):
+        return
+
+    phases = {}
+
+    def timed(label, original):
+        @functools.wraps(original)
+        def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return original(*args, **kwargs)
+            finally:
+                entry = phases.setdefault(label, [0.0, 0])
+                entry[0] += time.perf_counter() - started
+                entry[1] += 1
+
+        wrapper._manim_api_phases_patched = True
+        return wrapper
+
+    Scene.play = timed("play", Scene.play)
+    SceneFileWriter.finish = timed("finalize", SceneFileWriter.finish)
+    tex_mobject.tex_to_svg_file = timed("tex", tex_mobject.tex_to_svg_file)
+
+    original_render = Scene.render
+
+    # wraps copia os marcadores dos outros patches de Scene.render, que assim não reaplicam no pool
+    @functools.wraps(original_render)
+    def render(self, *args, **kwargs):
+        phases.clear()
+        started = time.perf_counter()
+        try:
+            return original_render(self, *args, **kwargs)
+        finally:
+            target = os.environ.get("MANIM_API_PHASES_FILE")
+            if target:
+                report = {
+                    "scene": time.perf_counter() - started,
+                    "dry_run": bool(config.dry_run),
+                    "phases": phases,
+                }
+                with open(target, "a") as handle:
+                    handle.write(json.dumps(report) + "\\n")
+
+    Scene.render = render
+
+
+_manim_api_time_phases()
+del _manim_api_time_phases
+"""
+PHASES_FILE_NAME = "manim_phases.jsonl"
+
+# Para a cena no instante MANIM_API_FRAME_AT (segundos de animação) para que `-s` salve esse
+# quadro em vez do último. A variável é lida a cada chamada: no pool o patch sobrevive entre tarefas.
+FRAME_AT_PATCH = """
+def _manim_api_stop_at_frame():
+    import functools
+    import os
+
+    try:
+        from manim.scene.scene import Scene
+        from manim.utils.exceptions import EndSceneEarlyException
+    except ImportError:
+        return
+
+    # O marcador de play sobrevive aos wrappers de PHASE_TIMING_PATCH (functools.wraps copia __dict__)
+    if getattr(Scene.play, "_manim_api_frame_patched", False) or getattr(
+        Scene.update_to_time, "_manim_api_frame_patched", False
+    ):
+        return
+
+    original_play = Scene.play
+    original_update = Scene.update_to_time
+
+    def target():
+        value = os.environ.get("MANIM_API_FRAME_AT")
+        return float(value) if value else None
+
+    # wraps preserva os marcadores de patches já aplicados a play, que assim não reaplicam no pool
+    @functools.wraps(original_play)
+    def play(self, *args, **kwargs):
+        limit = target()
+        if limit is None:
+            return original_play(self, *args, **kwargs)
+        start = getattr(self, "_manim_api_clock", 0.0)
+        self._manim_api_play_start = start
+        result = original_play(self, *args, **kwargs)
+        # wait() também passa por play; animações congeladas não chamam update_to_time
+        self._manim_api_clock = start + (getattr(self, "duration", 0.0) or 0.0)
+        if self._manim_api_clock >= limit:
+            raise EndSceneEarlyException()
+        return result
+
+    @functools.wraps(original_update)
+    def update_to_time(self, t):
+        limit = target()
+        start = getattr(self, "_manim_api_play_start", None)
+        if limit is not None and start is not None and start + t >= limit:
+            # Interrompe antes de animation.finish(), que levaria a animação ao estado final
+            original_update(self, max(0.0, limit - start))
+            raise EndSceneEarlyException()
+        return original_update(self, t)
+
+    play._manim_api_frame_patched = True
+    update_to_time._manim_api_frame_patched = True
+    Scene.play = play
+    Scene.update_to_time = update_to_time
+
+
+_manim_api_stop_at_frame()
+del _manim_api_stop_at_frame
+"""
+# Faixa dos dry runs, separada dos slots de render; as threads esperam nela no máximo o timeout do dry run
+_dry_run_lane = threading.BoundedSemaphore(max(1, settings.dry_run_workers))
+
+# Quadros únicos dispensam fps alto: o instante pedido é aplicado exatamente, não arredondado ao quadro
+STILL_FPS = 15
+
 
 @dataclass
 class RenderResult:
     success: bool
     video_path: Optional[str] = None
-    video_base64: Optional[str] = None
+    video_id: Optional[str] = None
+    video_size: Optional[int] = None
     stdout: str = ""
     stderr: str = ""
     error: Optional[str] = None
+    cached: bool = False
+    timed_out: bool = False
+    encode_seconds: float = 0.0
+    transcode_seconds: float = 0.0
+    encoding: Optional[str] = None
+    thumbnail_path: Optional[str] = None
+    thumbnail_id: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class StillFrame:
+    """Quadro único pedido: o último da cena ou, com `at_time`, o estado da cena nesse instante."""
+
+    at_time: Optional[float] = None
+    image_format: str = "png"
+
+
+@dataclass
+class DryRunResult:
+    ok: bool
+    error: Optional[str] = None
+    # Falha de infraestrutura (timeout, Manim ausente, worker morto): não condena o código
+    inconclusive: bool = False
+    seconds: float = 0.0
 
 
 def find_video(media_dir: Path, scene_name: str) -> Optional[Path]:
@@ -58,14 +253,227 @@ def find_video(media_dir: Path, scene_name: str) -> Optional[Path]:
     return candidates[0] if candidates else None
 
 
-def _build_env() -> dict:
+def find_image(media_dir: Path, scene_name: str) -> Optional[Path]:
+    """Encontra o PNG salvo pelo `-s` (media/images/<módulo>/<Cena>.png)."""
+    candidates = sorted(media_dir.rglob("*.png"), key=lambda path: path.stat().st_mtime, reverse=True)
+    for png in candidates:
+        if scene_name in png.stem:
+            return png
+    return candidates[0] if candidates else None
+
+
+def encode_video_base64(video_path: str) -> str:
+    """Codifica o vídeo em base64 apenas quando o cliente pede entrega inline."""
+    return base64.b64encode(Path(video_path).read_bytes()).decode("utf-8")
+
+
+def _build_env(threads: int | None = None, extra: Optional[dict[str, str]] = None) -> dict:
     env = os.environ.copy()
+    env.update(extra or {})
     if TEXLIVE_BIN and TEXLIVE_BIN.exists():
         current_path = env.get("PATH", "")
         env["PATH"] = f"{TEXLIVE_BIN}:{current_path}" if current_path else str(TEXLIVE_BIN)
+    if threads:
+        env["MANIM_API_ENCODER_THREADS"] = str(threads)
+        for name in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+            env[name] = str(threads)
     return env
 
 
+def _script_patches(work_dir: Path, frame_at: Optional[float] = None) -> tuple[list[str], dict[str, str]]:
+    patches = [BACKGROUND_RECTANGLE_PATCH, ENCODER_THREADS_PATCH]
+    # Sempre definida: um worker do pool que já aplicou o patch não pode herdar o instante de outra tarefa
+    extra_env: dict[str, str] = {"MANIM_API_FRAME_AT": "" if frame_at is None else str(frame_at)}
+    if asset_cache is not None:
+        patches.append(ASSET_CACHE_PATCH)
+        extra_env.update(asset_cache.env(work_dir))
+    if frame_at is not None:
+        patches.append(FRAME_AT_PATCH)
+    if settings.tracing_enabled:
+        # Por último: envolve as funções já substituídas pelos patches anteriores
+        patches.append(PHASE_TIMING_PATCH)
+        extra_env["MANIM_API_PHASES_FILE"] = str(work_dir / PHASES_FILE_NAME)
+    return patches, extra_env
+
+
+def _record_manim_phases(work_dir: Path, started: float, wall_seconds: float) -> None:
+    """Converte as fases gravadas pelo patch em spans `manim.*` (somas por processo, não intervalos)."""
+    phases_file = work_dir / PHASES_FILE_NAME
+    try:
+        lines = phases_file.read_text().splitlines()
+    except OSError:
+        return
+    reports = []
+    for line in lines:
+        try:
+            reports.append(json.loads(line))
+        except ValueError:
+            continue
+    renders = [report for report in reports if not report.get("dry_run")]
+    for report in reports:
+        if report.get("dry_run"):
+            record_span("manim.count_pass", report["scene"], started)
+    for index, report in enumerate(renders):
+        record_span("manim.scene", report["scene"], started, process=index)
+        for name, (seconds, calls) in report["phases"].items():
+            record_span(f"manim.{name}", seconds, started, process=index, calls=calls)
+    if len(reports) == 1 and renders:
+        # Processo único: o que sobra do tempo de parede é subir o Python e importar o Manim
+        record_span("manim.startup", max(0.0, wall_seconds - renders[0]["scene"]), started)
+
+
+def _traceback_tail(output: str, limit: int = 2000) -> str:
+    marker = output.rfind("Traceback")
+    tail = output[marker:] if marker != -1 else output
+    return tail.strip()[-limit:]
+
+
+def _render_with_cli(
+    script_path: Path,
+    media_dir: Path,
+    scene_name: str,
+    width: int,
+    height: int,
+    fps: int,
+    timeout: int,
+    threads: int | None,
+    rid: str,
+    extra_env: Optional[dict[str, str]] = None,
+    save_last_frame: bool = False,
+) -> RenderResult:
+    cmd = [
+        "manim",
+        "render",
+        *(["-s"] if save_last_frame else []),
+        "-r",
+        f"{width},{height}",
+        "--fps",
+        str(fps),
+        "--media_dir",
+        str(media_dir),
+        "--disable_caching",
+        str(script_path),
+        scene_name,
+    ]
+    logger.info("[%s] Executing command: %s", rid, " ".join(cmd))
+
+    try:
+        result = run_streaming(
+            cmd,
+            timeout,
+            cwd=str(script_path.parent),
+            env=_build_env(threads, extra_env),
+            on_line=render_progress_reporter(),
+        )
+    except Exception as exc:
+        logger.exception("[%s] Subprocess execution error", rid)
+        return RenderResult(success=False, error=f"Subprocess error: {exc}")
+
+    if result.timed_out:
+        logger.error("[%s] Render timeout after %s seconds", rid, timeout)
+        return RenderResult(
+            success=False,
+            error=f"Render timeout after {timeout} seconds",
+            stdout=result.stdout,
+            stderr=result.stderr,
+            timed_out=True,
+        )
+    if result.returncode != 0:
+        logger.error("[%s] Manim CLI exited with code %s", rid, result.returncode)
+        return RenderResult(
+            success=False,
+            error="Manim render failed",
+            stdout=result.stdout,
+            stderr=result.stderr,
+        )
+    return RenderResult(success=True, stdout=result.stdout, stderr=result.stderr)
+
+
+def _render_with_pool(
+    script_path: Path,
+    media_dir: Path,
+    scene_name: str,
+    width: int,
+    height: int,
+    fps: int,
+    timeout: int,
+    threads: int | None,
+    rid: str,
+    extra_env: Optional[dict[str, str]] = None,
+    save_last_frame: bool = False,
+) -> RenderResult:
+    logger.info("[%s] Rendering in warm Manim worker", rid)
+    pool = get_worker_pool(str(TEXLIVE_BIN) if TEXLIVE_BIN else None)
+    outcome = pool.render(
+        {
+            "script_path": str(script_path),
+            "media_dir": str(media_dir),
+            "scene_name": scene_name,
+            "width": width,
+            "height": height,
+            "fps": fps,
+            "threads": threads,
+            "env": extra_env or {},
+            "save_last_frame": save_last_frame,
+        },
+        timeout,
+    )
+    if outcome.timed_out:
+        logger.error("[%s] Render timeout after %s seconds", rid, timeout)
+        return RenderResult(success=False, error=outcome.error, stdout=outcome.output, timed_out=True)
+    if outcome.unavailable:
+        logger.error("[%s] %s", rid, outcome.error)
+        return RenderResult(success=False, error=outcome.error)
+    if not outcome.ok:
+        logger.error("[%s] Manim worker render failed", rid)
+        return RenderResult(
+            success=False,
+            error="Manim render failed",
+            stdout=outcome.output,
+            stderr=outcome.error or "",
+        )
+    return RenderResult(success=True, stdout=outcome.output)
+
+
+def _render_cache_key(code: str, scene_name: str, width: int, height: int, fps: int, encoding: str | None) -> str:
+    return render_cache.make_key(code, scene_name, width, height, fps, BACKGROUND_RECTANGLE_PATCH, encoding or "")
+
+
+def cached_render(
+    code: str,
+    scene_name: str,
+    width: int,
+    height: int,
+    fps: int = 60,
+    encoding: str | None = None,
+    request_id: str | None = None,
+) -> Optional[RenderResult]:
+    """Vídeo já renderizado com os mesmos parâmetros, sem renderizar nada em caso de falta."""
+    if render_cache is None:
+        return None
+    cache_key = _render_cache_key(code, scene_name, width, height, fps, encoding)
+    cached_path = render_cache.get(cache_key, ENCODING_PROFILES[encoding].suffix if encoding else ".mp4")
+    if cached_path is None:
+        return None
+    logger.info(
+        "[%s] Render cache hit (scene=%s, key=%s, hits=%s, misses=%s)",
+        request_id or "no-request-id",
+        scene_name,
+        cache_key[:12],
+        render_cache.hits,
+        render_cache.misses,
+    )
+    video_id, stored_path = video_store.save(cached_path)
+    return RenderResult(
+        success=True,
+        video_path=str(stored_path),
+        video_id=video_id,
+        video_size=stored_path.stat().st_size,
+        cached=True,
+        encoding=encoding,
+    )
+
+
 def execute_manim(
     code: str,
     scene_name: str,
@@ -73,84 +481,368 @@ def execute_manim(
     height: int = 1080,
     timeout: int = 120,
     request_id: str | None = None,
+    fps: int = 60,
+    threads: int | None = None,
+    encoding: str | None = None,
+    segments: int | None = None,
+    check_cache: bool = True,
 ) -> RenderResult:
+    """Renderiza a cena; com `encoding`, o MP4 do Manim passa por um perfil de recodificação do ffmpeg.
+
+    `segments` limita o render segmentado (o pipeline passa quantos slots do scheduler obteve);
+    sem ele vale `RENDER_SEGMENTS`. `check_cache=False` quando quem chama já consultou o cache.
+    """
     rid = request_id or "no-request-id"
+    if check_cache:
+        cached = cached_render(code, scene_name, width, height, fps, encoding, request_id)
+        if cached is not None:
+            return cached
+    cache_key = None if render_cache is None else _render_cache_key(code, scene_name, width, height, fps, encoding)
+
     logger.info(
-        "[%s] Starting Manim render (scene=%s, resolution=%dx%d, timeout=%ss)",
+        "[%s] Starting Manim render (scene=%s, resolution=%dx%d, fps=%s, threads=%s, timeout=%ss, encoding=%s)",
         rid,
         scene_name,
         width,
         height,
+        fps,
+        threads or "auto",
         timeout,
+        encoding or "manim",
     )
     with tempfile.TemporaryDirectory(prefix="manim_") as tmpdir:
         work_dir = Path(tmpdir)
         script_path = work_dir / "scene.py"
         media_dir = work_dir / "media"
-        script_path.write_text(f"{BACKGROUND_RECTANGLE_PATCH}\n\n{code}")
+        patches, extra_env = _script_patches(work_dir)
+        script_path.write_text("\n".join(patches) + f"\n\n{code}")
         logger.debug("[%s] Scene script written to %s", rid, script_path)
 
-        cmd = [
-            "manim",
-            "render",
-            "-r",
-            f"{width},{height}",
-            "--fps",
-            "60",
-            "--media_dir",
-            str(media_dir),
-            "--disable_caching",
-            str(script_path),
-            scene_name,
-        ]
-        logger.info("[%s] Executing command: %s", rid, " ".join(cmd))
-
-        try:
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=timeout,
-                cwd=str(work_dir),
-                env=_build_env(),
+        outcome = None
+        video_path = None
+        process_started = time.perf_counter()
+        max_segments = settings.render_segments if segments is None else segments
+        if max_segments > 1 and settings.render_backend == "subprocess":
+            segmented = render_segmented(
+                script_path,
+                scene_name,
+                width,
+                height,
+                fps,
+                timeout,
+                threads,
+                lambda segment_threads: _build_env(segment_threads, extra_env),
+                find_video,
+                rid,
+                max_segments=max_segments,
             )
-        except subprocess.TimeoutExpired as exc:
-            logger.error("[%s] Render timeout after %s seconds", rid, timeout)
-            return RenderResult(
-                success=False,
-                error=f"Render timeout after {timeout} seconds",
-                stdout=exc.stdout or "",
-                stderr=exc.stderr or "",
+            if segmented is not None:
+                outcome = RenderResult(
+                    success=segmented.success,
+                    error=segmented.error,
+                    stdout=segmented.stdout,
+                    stderr=segmented.stderr,
+                    timed_out=segmented.timed_out,
+                    encode_seconds=segmented.encode_seconds,
+                )
+                video_path = segmented.video_path
+        if outcome is None and settings.render_backend == "pool":
+            outcome = _render_with_pool(
+                script_path, media_dir, scene_name, width, height, fps, timeout, threads, rid, extra_env
             )
-        except Exception as exc:
-            logger.exception("[%s] Subprocess execution error", rid)
-            return RenderResult(success=False, error=f"Subprocess error: {exc}")
-
-        if result.returncode != 0:
-            logger.error("[%s] Manim CLI exited with code %s", rid, result.returncode)
-            return RenderResult(
-                success=False,
-                error="Manim render failed",
-                stdout=result.stdout,
-                stderr=result.stderr,
+        elif outcome is None:
+            outcome = _render_with_cli(
+                script_path, media_dir, scene_name, width, height, fps, timeout, threads, rid, extra_env
             )
+        process_seconds = time.perf_counter() - process_started
+        record_span(
+            "manim_process",
+            process_seconds,
+            process_started,
+            backend="segmented" if video_path else settings.render_backend,
+            success=outcome.success,
+        )
+        _record_manim_phases(work_dir, process_started, process_seconds)
+        if asset_cache is not None:
+            asset_cache.record(work_dir)
+        if not outcome.success:
+            return outcome
 
-        video_path = find_video(media_dir, scene_name)
+        with span("find_video"):
+            video_path = video_path or find_video(media_dir, scene_name)
         if not video_path:
             logger.error("[%s] Video file not found after render", rid)
             return RenderResult(
                 success=False,
                 error="Video file not found after render",
-                stdout=result.stdout,
-                stderr=result.stderr,
+                stdout=outcome.stdout,
+                stderr=outcome.stderr,
             )
 
-        video_b64 = base64.b64encode(video_path.read_bytes()).decode("utf-8")
-        logger.info("[%s] Render finished successfully (video=%s)", rid, video_path)
+        transcode_seconds = 0.0
+        if encoding:
+            with span("transcode", profile=encoding):
+                transcoded = transcode(Path(video_path), encoding, threads, timeout, rid)
+            if transcoded.output_path is None:
+                logger.error("[%s] Encoding with profile %s failed: %s", rid, encoding, transcoded.error)
+                return RenderResult(
+                    success=False,
+                    error=f"Encoding failed: {transcoded.error}",
+                    stdout=outcome.stdout,
+                    stderr=outcome.stderr,
+                    timed_out=transcoded.timed_out,
+                )
+            video_path, transcode_seconds = transcoded.output_path, transcoded.seconds
+
+        with span("video_store"):
+            video_id, stored_path = video_store.save(video_path, move=True)
+        logger.info("[%s] Render finished successfully (video=%s)", rid, stored_path)
+        if render_cache is not None and cache_key is not None:
+            render_cache.put(cache_key, stored_path)
         return RenderResult(
             success=True,
-            video_path=str(video_path),
-            video_base64=video_b64,
-            stdout=result.stdout,
-            stderr=result.stderr,
+            video_path=str(stored_path),
+            video_id=video_id,
+            video_size=stored_path.stat().st_size,
+            stdout=outcome.stdout,
+            stderr=outcome.stderr,
+            encode_seconds=outcome.encode_seconds,
+            transcode_seconds=transcode_seconds,
+            encoding=encoding,
         )
+
+
+def _still_cache_key(code: str, scene_name: str, width: int, height: int, still: StillFrame) -> str:
+    return render_cache.make_key(
+        code,
+        scene_name,
+        width,
+        height,
+        STILL_FPS,
+        BACKGROUND_RECTANGLE_PATCH,
+        f"still:{still.at_time}:{still.image_format}",
+    )
+
+
+def cached_still(
+    code: str,
+    scene_name: str,
+    width: int,
+    height: int,
+    request_id: str | None = None,
+    still: StillFrame = StillFrame(),
+) -> Optional[RenderResult]:
+    """Quadro já renderizado com os mesmos parâmetros, sem renderizar nada em caso de falta."""
+    if render_cache is None:
+        return None
+    cache_key = _still_cache_key(code, scene_name, width, height, still)
+    cached_path = render_cache.get(cache_key, IMAGE_PROFILES[still.image_format].suffix)
+    if cached_path is None:
+        return None
+    logger.info("[%s] Still cache hit (scene=%s, key=%s)", request_id or "no-request-id", scene_name, cache_key[:12])
+    image_id, stored_path = video_store.save(cached_path)
+    return RenderResult(
+        success=True,
+        video_path=str(stored_path),
+        video_id=image_id,
+        video_size=stored_path.stat().st_size,
+        cached=True,
+    )
+
+
+def render_still(
+    code: str,
+    scene_name: str,
+    width: int,
+    height: int,
+    timeout: int,
+    request_id: str | None = None,
+    still: StillFrame = StillFrame(),
+    check_cache: bool = True,
+) -> RenderResult:
+    """Renderiza só um quadro (`manim -s`), sem codificar vídeo; WebP é convertido do PNG pelo ffmpeg."""
+    rid = request_id or "no-request-id"
+    profile = IMAGE_PROFILES[still.image_format]
+    if check_cache:
+        cached = cached_still(code, scene_name, width, height, request_id, still)
+        if cached is not None:
+            return cached
+    cache_key = None if render_cache is None else _still_cache_key(code, scene_name, width, height, still)
+
+    logger.info(
+        "[%s] Starting still render (scene=%s, resolution=%dx%d, time=%s, format=%s)",
+        rid,
+        scene_name,
+        width,
+        height,
+        "last" if still.at_time is None else f"{still.at_time:g}s",
+        still.image_format,
+    )
+    with tempfile.TemporaryDirectory(prefix="manim_still_") as tmpdir:
+        work_dir = Path(tmpdir)
+        script_path = work_dir / "scene.py"
+        media_dir = work_dir / "media"
+        patches, extra_env = _script_patches(work_dir, still.at_time)
+        script_path.write_text("\n".join(patches) + f"\n\n{code}")
+
+        render = _render_with_pool if settings.render_backend == "pool" else _render_with_cli
+        process_started = time.perf_counter()
+        outcome = render(
+            script_path, media_dir, scene_name, width, height, STILL_FPS, timeout, None, rid, extra_env, True
+        )
+        process_seconds = time.perf_counter() - process_started
+        record_span("manim_process", process_seconds, process_started, backend=settings.render_backend, still=True)
+        _record_manim_phases(work_dir, process_started, process_seconds)
+        if asset_cache is not None:
+            asset_cache.record(work_dir)
+        if not outcome.success:
+            return outcome
+
+        image_path = find_image(media_dir, scene_name)
+        if image_path is None:
+            logger.error("[%s] Image file not found after still render", rid)
+            return RenderResult(
+                success=False,
+                error="Image file not found after render",
+                stdout=outcome.stdout,
+                stderr=outcome.stderr,
+            )
+        if image_path.suffix != profile.suffix:
+            with span("transcode", profile=still.image_format):
+                converted = extract_frame(image_path, still.image_format, timeout, rid)
+            if converted.output_path is None:
+                return RenderResult(success=False, error=f"Encoding failed: {converted.error}")
+            image_path = converted.output_path
+
+        image_id, stored_path = video_store.save(image_path, move=True)
+        logger.info("[%s] Still render finished (image=%s)", rid, stored_path)
+        if render_cache is not None and cache_key is not None:
+            render_cache.put(cache_key, stored_path)
+        return RenderResult(
+            success=True,
+            video_path=str(stored_path),
+            video_id=image_id,
+            video_size=stored_path.stat().st_size,
+            stdout=outcome.stdout,
+            stderr=outcome.stderr,
+        )
+
+
+def attach_thumbnail(render_result: RenderResult, image_format: str, timeout: int, request_id: str) -> None:
+    """Extrai o último quadro do vídeo pronto como miniatura; falhas só deixam o resultado sem miniatura."""
+    with tempfile.TemporaryDirectory(prefix="manim_thumb_") as tmpdir:
+        # Cópia por hardlink: o ffmpeg grava ao lado da origem, fora do diretório do video store
+        source = link_or_copy(Path(render_result.video_path), Path(tmpdir) / Path(render_result.video_path).name)
+        extracted = extract_frame(
+            source, image_format, timeout, request_id, max_width=settings.thumbnail_max_width
+        )
+        if extracted.output_path is None:
+            logger.warning("[%s] Thumbnail extraction failed: %s", request_id, extracted.error)
+            return
+        thumbnail_id, stored_path = video_store.save(extracted.output_path, move=True)
+    render_result.thumbnail_id = thumbnail_id
+    render_result.thumbnail_path = str(stored_path)
+
+
+def dry_run_active() -> bool:
+    """DRY_RUN_ENABLED explícito vale; sem ele, o dry run só roda no backend pool.
+
+    No subprocess cada dry run sobe um `manim` frio, segundos a mais por tentativa antes do render completo.
+    """
+    if settings.dry_run_enabled is not None:
+        return settings.dry_run_enabled
+    return settings.render_backend == "pool"
+
+
+def dry_run_manim(code: str, scene_name: str, timeout: int, request_id: str | None = None) -> DryRunResult:
+    """Executa o construct com todas as animações puladas e sem gravar frames.
+
+    Erros de runtime (NameError, kwargs inexistentes, exceções no construct) aparecem em
+    segundos, antes de o código chegar ao render completo. Dry runs correm numa faixa própria
+    de `DRY_RUN_WORKERS` vagas, fora do scheduler de render: no backend pool usam workers
+    aquecidos só deles; no subprocess cada um ainda sobe um processo `manim` (frio).
+    """
+    rid = request_id or "no-request-id"
+    started = time.perf_counter()
+    if not _dry_run_lane.acquire(timeout=timeout):
+        # Sem vaga no prazo: não condena o código, o render completo ainda valida
+        result = DryRunResult(ok=False, error=f"No dry-run slot free after {timeout} seconds", inconclusive=True)
+    else:
+        try:
+            result = _dry_run(code, scene_name, timeout)
+        finally:
+            _dry_run_lane.release()
+
+    result.seconds = time.perf_counter() - started
+    logger.info(
+        "[%s] Dry run finished in %.2fs (scene=%s, ok=%s, inconclusive=%s)",
+        rid,
+        result.seconds,
+        scene_name,
+        result.ok,
+        result.inconclusive,
+    )
+    return result
+
+
+def _dry_run(code: str, scene_name: str, timeout: int) -> DryRunResult:
+    with tempfile.TemporaryDirectory(prefix="manim_dry_") as tmpdir:
+        work_dir = Path(tmpdir)
+        script_path = work_dir / "scene.py"
+        media_dir = work_dir / "media"
+        patches, extra_env = _script_patches(work_dir)
+        script_path.write_text("\n".join(patches) + f"\n\n{code}")
+
+        if settings.render_backend == "pool":
+            pool = get_worker_pool(str(TEXLIVE_BIN) if TEXLIVE_BIN else None, lane=DRY_RUN_LANE)
+            outcome = pool.render(
+                {
+                    "script_path": str(script_path),
+                    "media_dir": str(media_dir),
+                    "scene_name": scene_name,
+                    "width": 854,
+                    "height": 480,
+                    "fps": 15,
+                    "threads": 1,
+                    "env": extra_env,
+                    "dry_run": True,
+                    "from_animation_number": int(SKIP_ALL_ANIMATIONS),
+                },
+                timeout,
+            )
+            if outcome.timed_out or outcome.crashed or outcome.unavailable:
+                result = DryRunResult(ok=False, error=outcome.error, inconclusive=True)
+            elif not outcome.ok:
+                result = DryRunResult(ok=False, error=_traceback_tail(outcome.error or outcome.output))
+            else:
+                result = DryRunResult(ok=True)
+        else:
+            cmd = [
+                "manim",
+                "render",
+                "--dry_run",
+                "-ql",
+                "-n",
+                SKIP_ALL_ANIMATIONS,
+                "--media_dir",
+                str(media_dir),
+                "--disable_caching",
+                str(script_path),
+                scene_name,
+            ]
+            try:
+                # run_streaming registra o processo: requisição cancelada mata o dry run em andamento
+                completed = run_streaming(cmd, timeout, str(work_dir), _build_env(1, extra_env))
+            except OSError as exc:
+                result = DryRunResult(ok=False, error=f"Subprocess error: {exc}", inconclusive=True)
+            else:
+                if completed.timed_out:
+                    result = DryRunResult(ok=False, error=f"Dry run timeout after {timeout} seconds", inconclusive=True)
+                elif completed.returncode != 0:
+                    result = DryRunResult(ok=False, error=_traceback_tail(f"{completed.stdout}\n{completed.stderr}"))
+                else:
+                    result = DryRunResult(ok=True)
+
+        if asset_cache is not None:
+            asset_cache.record(work_dir)
+    return result
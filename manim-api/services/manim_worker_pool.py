@@ -0,0 +1,248 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing.connection import Connection
+from typing import Any, Optional
+
+from config import get_settings
+from services.render_progress import cancellable_process
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.worker_pool")
+
+
+@dataclass
+class WorkerOutcome:
+    ok: bool
+    output: str = ""
+    error: Optional[str] = None
+    timed_out: bool = False
+    crashed: bool = False
+    # Nenhum worker livre dentro do prazo: a tarefa nem começou
+    unavailable: bool = False
+
+
+def _worker_main(conn: Connection, extra_path: Optional[str]) -> None:
+    """Loop do processo worker: importa o Manim uma única vez e renderiza cenas in-process."""
+    import contextlib
+    import io
+    import resource
+    import traceback
+    import types
+
+    if extra_path:
+        os.environ["PATH"] = f"{extra_path}:{os.environ.get('PATH', '')}"
+
+    import manim  # noqa: F401 - pré-carrega cairo/pango/numpy/PyAV
+    from manim import config, tempconfig
+
+    while True:
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+        if task is None:
+            break
+
+        buffer = io.StringIO()
+        os.environ["MANIM_API_ENCODER_THREADS"] = str(task.get("threads") or "")
+        os.environ.update(task.get("env") or {})
+        try:
+            with contextlib.redirect_stdout(buffer), contextlib.redirect_stderr(buffer):
+                width, height = task["width"], task["height"]
+                overrides = {
+                    "input_file": task["script_path"],
+                    "media_dir": task["media_dir"],
+                    "pixel_width": width,
+                    "pixel_height": height,
+                    "frame_width": config.frame_height * width / height,
+                    "frame_rate": task["fps"],
+                    "disable_caching": True,
+                }
+                if task.get("save_last_frame"):
+                    # Equivalente ao `-s` da CLI: só o último quadro, sem gravar vídeo
+                    overrides.update(save_last_frame=True, write_to_movie=False)
+                if task.get("dry_run"):
+                    # Executa o construct sem gravar frames, pulando todas as animações
+                    overrides.update(dry_run=True, from_animation_number=task["from_animation_number"])
+                with tempconfig(overrides):
+                    with open(task["script_path"], encoding="utf-8") as handle:
+                        source = handle.read()
+                    module = types.ModuleType("scene")
+                    module.__file__ = task["script_path"]
+                    exec(compile(source, task["script_path"], "exec"), module.__dict__)
+                    module.__dict__[task["scene_name"]]().render()
+            reply: dict[str, Any] = {"ok": True, "output": buffer.getvalue()}
+        except BaseException:
+            reply = {"ok": False, "output": buffer.getvalue(), "error": traceback.format_exc()}
+        # ru_maxrss vem em KB no Linux
+        reply["rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        conn.send(reply)
+
+
+class _Worker:
+    def __init__(self, context: multiprocessing.context.BaseContext, extra_path: Optional[str]):
+        self.conn, child_conn = context.Pipe()
+        self.process = context.Process(
+            target=_worker_main,
+            args=(child_conn, extra_path),
+            daemon=True,
+            name="manim-worker",
+        )
+        self.process.start()
+        child_conn.close()
+        self.renders = 0
+        self.rss_mb = 0.0
+
+    def render(self, task: dict[str, Any], timeout: int) -> dict[str, Any]:
+        self.conn.send(task)
+        if not self.conn.poll(timeout):
+            raise TimeoutError
+        reply = self.conn.recv()
+        self.renders += 1
+        self.rss_mb = reply.get("rss_mb", 0.0)
+        return reply
+
+    def stop(self) -> None:
+        try:
+            self.conn.send(None)
+        except (OSError, ValueError):
+            pass
+        self.process.join(timeout=1)
+        self.kill()
+
+    def kill(self) -> None:
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.conn.close()
+
+
+class ManimWorkerPool:
+    """Pool de processos com o Manim já importado, reciclados após N renders ou crescimento de memória."""
+
+    def __init__(self, size: int, max_renders: int, max_rss_mb: int, extra_path: Optional[str] = None):
+        self.size = size
+        self.max_renders = max_renders
+        self.max_rss_mb = max_rss_mb
+        self.extra_path = extra_path
+        self._context = multiprocessing.get_context("spawn")
+        self._idle: list[_Worker] = []
+        # Acordada quando um worker volta ao pool ou é reciclado (abrindo vaga para um novo)
+        self._available = threading.Condition()
+        self._spawned = 0
+        self.recycled = 0
+
+    def _acquire(self, timeout: Optional[float] = None) -> Optional[_Worker]:
+        """Worker ocioso, ou um novo se houver vaga; None se nada liberar em `timeout` segundos."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._available:
+            while not self._idle and self._spawned >= self.size:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._available.wait(remaining)
+            if self._idle:
+                return self._idle.pop()
+            self._spawned += 1
+            spawned = self._spawned
+        logger.info("Spawning Manim worker (%s/%s)", spawned, self.size)
+        try:
+            return _Worker(self._context, self.extra_path)
+        except BaseException:
+            with self._available:
+                self._spawned -= 1
+                self._available.notify()
+            raise
+
+    def _discard(self, worker: _Worker, reason: str) -> None:
+        logger.info("Recycling Manim worker pid=%s (%s)", worker.process.pid, reason)
+        worker.kill()
+        with self._available:
+            self._spawned -= 1
+            self.recycled += 1
+            # Quem espera pode subir o substituto
+            self._available.notify()
+
+    def _release(self, worker: _Worker) -> None:
+        if worker.renders >= self.max_renders:
+            worker.stop()
+            self._discard(worker, f"{worker.renders} renders")
+        elif self.max_rss_mb and worker.rss_mb > self.max_rss_mb:
+            worker.stop()
+            self._discard(worker, f"rss={worker.rss_mb:.0f}MB")
+        else:
+            with self._available:
+                self._idle.append(worker)
+                self._available.notify()
+
+    def render(self, task: dict[str, Any], timeout: int) -> WorkerOutcome:
+        """Espera por um worker livre no máximo `timeout` segundos e dá o mesmo prazo à tarefa."""
+        worker = self._acquire(timeout)
+        if worker is None:
+            return WorkerOutcome(ok=False, error=f"No Manim worker free after {timeout} seconds", unavailable=True)
+        try:
+            # Matar o worker (requisição cancelada) cai no caminho de crash abaixo e ele é reciclado
+            with cancellable_process(worker.process):
+                reply = worker.render(task, timeout)
+        except TimeoutError:
+            self._discard(worker, "timeout")
+            return WorkerOutcome(ok=False, error=f"Render timeout after {timeout} seconds", timed_out=True)
+        except (EOFError, OSError) as exc:
+            self._discard(worker, f"crashed: {exc}")
+            return WorkerOutcome(ok=False, error=f"Worker crashed: {exc}", crashed=True)
+        self._release(worker)
+        return WorkerOutcome(ok=reply["ok"], output=reply.get("output", ""), error=reply.get("error"))
+
+    def warm(self) -> None:
+        """Sobe todos os workers antecipadamente para que o primeiro request não pague o import do Manim."""
+        workers = []
+        while True:
+            with self._available:
+                if self._spawned >= self.size:
+                    break
+            workers.append(self._acquire())
+        for worker in workers:
+            self._release(worker)
+
+    def shutdown(self) -> None:
+        with self._available:
+            workers, self._idle = self._idle, []
+            self._spawned -= len(workers)
+        for worker in workers:
+            worker.stop()
+
+
+_worker_pools: dict[str, ManimWorkerPool] = {}
+_worker_pool_lock = threading.Lock()
+
+RENDER_LANE = "render"
+DRY_RUN_LANE = "dry_run"
+
+
+def get_worker_pool(extra_path: Optional[str] = None, lane: str = RENDER_LANE) -> ManimWorkerPool:
+    """Pool da faixa pedida; dry runs têm workers próprios para não ocupar os dos renders agendados."""
+    with _worker_pool_lock:
+        pool = _worker_pools.get(lane)
+        if pool is None:
+            if lane == DRY_RUN_LANE:
+                size = max(1, settings.dry_run_workers)
+            else:
+                size = settings.render_pool_size or max(1, (os.cpu_count() or 1) // 2)
+            pool = _worker_pools[lane] = ManimWorkerPool(
+                size=size,
+                max_renders=settings.render_pool_max_renders,
+                max_rss_mb=settings.render_pool_max_rss_mb,
+                extra_path=extra_path,
+            )
+        return pool
+
+
+def shutdown_worker_pools() -> None:
+    with _worker_pool_lock:
+        pools = list(_worker_pools.values())
+    for pool in pools:
+        pool.shutdown()
@@ -0,0 +1,185 @@
+import bisect
+import math
+import threading
+from typing import Callable, Iterable, TypeVar
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+TOKEN_BUCKETS = (250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000)
+SIZE_BUCKETS = (100e3, 500e3, 1e6, 5e6, 10e6, 25e6, 50e6, 100e6, 250e6, 500e6)
+
+
+def resolution_bucket(width: int, height: int) -> str:
+    longest = max(width, height)
+    if longest <= 854:
+        return "sd"
+    if longest <= 1280:
+        return "hd"
+    if longest <= 1920:
+        return "fhd"
+    if longest <= 2560:
+        return "qhd"
+    return "uhd"
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf"
+    return repr(float(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: dict[str, str]) -> tuple[str, ...]:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+    def _header(self) -> list[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+    def expose(self) -> list[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Iterable[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def expose(self) -> list[str]:
+        with self._lock:
+            items = sorted(self._values.items())
+        return self._header() + [
+            f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items
+        ]
+
+
+class CallbackMetric(_Metric):
+    """Métrica cujo valor é lido no momento do scrape (contadores/estado mantidos por outro serviço)."""
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], float], kind: str = "gauge"):
+        super().__init__(name, documentation)
+        self.kind = kind
+        self._read = read
+
+    def expose(self) -> list[str]:
+        return self._header() + [f"{self.name} {_format_value(self._read())}"]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Iterable[str] = (),
+        buckets: Iterable[float] = LATENCY_BUCKETS,
+    ):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+        self._series: dict[tuple[str, ...], tuple[list[int], list[float]]] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * len(self.buckets), [0.0]))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            total[0] += value
+
+    def expose(self) -> list[str]:
+        lines = self._header()
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._series.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets, counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+MetricT = TypeVar("MetricT", bound=_Metric)
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: list[_Metric] = []
+
+    def register(self, metric: MetricT) -> MetricT:
+        self._metrics.append(metric)
+        return metric
+
+    def expose(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.expose())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+PROMPT_TOKENS = registry.register(
+    Histogram(
+        "manim_api_prompt_tokens",
+        "Prompt size per LLM stage, split into static prefix and variable suffix",
+        ("stage", "part"),
+        buckets=TOKEN_BUCKETS,
+    )
+)
+OPTIMIZER_SECONDS = registry.register(
+    Histogram("manim_api_optimizer_seconds", "Prompt optimizer latency", ("resolution", "cached"))
+)
+CODEGEN_ATTEMPT_SECONDS = registry.register(
+    Histogram("manim_api_codegen_attempt_seconds", "Latency of each code generation attempt", ("resolution", "outcome"))
+)
+VALIDATION_TOTAL = registry.register(
+    Counter("manim_api_validation_total", "Code validation outcomes by reason", ("resolution", "reason"))
+)
+ATTEMPTS_PER_SUCCESS = registry.register(
+    Histogram(
+        "manim_api_attempts_per_success",
+        "Code generation attempts needed for a valid scene",
+        ("resolution",),
+        buckets=(1, 2, 3, 4, 5, 6, 8, 10),
+    )
+)
+DRY_RUN_SECONDS = registry.register(
+    Histogram("manim_api_dry_run_seconds", "Pre-render dry run latency", ("resolution", "outcome"))
+)
+RENDER_SECONDS = registry.register(
+    Histogram("manim_api_render_seconds", "Render wall time", ("resolution", "outcome", "cached"))
+)
+VIDEO_SIZE_BYTES = registry.register(
+    Histogram("manim_api_video_size_bytes", "Size of rendered videos", ("resolution",), buckets=SIZE_BUCKETS)
+)
+ENCODE_SECONDS = registry.register(
+    Histogram("manim_api_encode_seconds", "Time spent encoding/serializing video output", ("resolution", "stage"))
+)
+COALESCED_TOTAL = registry.register(
+    Counter("manim_api_coalesced_total", "Requests served by an existing execution", ("kind",))
+)
+TIMEOUTS_TOTAL = registry.register(Counter("manim_api_timeouts_total", "Timeouts by pipeline stage", ("resolution", "stage")))
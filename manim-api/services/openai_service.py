@@ -1,39 +1,51 @@
-import ast
+import asyncio
+import hashlib
 import json
 import logging
 import re
-from typing import Any, Tuple
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Tuple
 
 from openai import AsyncOpenAI
 
 from config import get_settings
 from prompts import (
+    CODE_GENERATION_PREFIX,
     DEFAULT_RESOURCE_NOTES,
+    PROMPT_OPTIMIZER_PREFIX,
     build_code_generation_messages,
     build_prompt_optimizer_messages,
 )
-from schemas import CodeResponse
+from schemas import CodeResponse, RenderCost
+from services.code_analyzer import (
+    DANGEROUS_IMPORTS,
+    SCENE_BASES,
+    CodeAnalysis,
+    analyze_code,
+    scene_name_or_raise,
+)
+from services.llm_cache import llm_cache
+from services.manim_executor import dry_run_active, dry_run_manim
+from services.metrics import (
+    ATTEMPTS_PER_SUCCESS,
+    CODEGEN_ATTEMPT_SECONDS,
+    DRY_RUN_SECONDS,
+    OPTIMIZER_SECONDS,
+    VALIDATION_TOTAL,
+    resolution_bucket,
+)
+from services.quality import QUALITY_TIERS
+from services.render_cost import estimate_render_cost
+from services.render_progress import run_render_thread
+from services.stage_timings import record_stage, timed_stage
+from services.tracing import span
+from services.token_budget import record_prompt_tokens
 
 settings = get_settings()
-client = AsyncOpenAI(api_key=settings.openai_api_key)
+client = AsyncOpenAI(api_key=settings.openai_api_key, base_url=settings.openai_base_url)
 logger = logging.getLogger("manim_api.openai")
 
-DANGEROUS_IMPORTS = {
-    "os",
-    "sys",
-    "subprocess",
-    "shutil",
-    "socket",
-    "urllib",
-    "requests",
-    "pickle",
-    "ctypes",
-    "multiprocessing",
-    "pty",
-}
-
-DANGEROUS_FUNCTIONS = {"eval", "exec", "open", "__import__", "compile"}
-
 MAX_CODE_ATTEMPTS = 3
 RETRY_SIMPLIFICATION_INSTRUCTIONS = (
     "[RETRY SIMPLIFICATION]\n"
@@ -42,15 +54,25 @@ RETRY_SIMPLIFICATION_INSTRUCTIONS = (
     "- Evite recursos complexos (ThreeDScene, câmera em movimento, LaTeX excessivo) a menos que sejam absolutamente necessários.\n"
     "- Reforce todos os requisitos obrigatórios: `from manim import *`, classe Scene, método construct, uso de self.play e self.wait final."
 )
+RUNTIME_ERROR_FEEDBACK = (
+    "\n\n[PREVIOUS ATTEMPT RUNTIME ERROR]\n"
+    "O código anterior passou na validação estática, mas falhou ao executar o construct:\n"
+    "```python\n{code}\n```\n"
+    "Erro:\n```\n{error}\n```\n"
+    "Corrija a causa do erro (nomes inexistentes, argumentos inválidos, APIs de outra versão do Manim)."
+)
+
+
+def _prompt_version(prefix: tuple[dict, ...], *templates: str) -> str:
+    """Hash dos textos fixos de uma etapa; entra na chave do cache do LLM."""
+    payload = json.dumps([list(prefix), *templates], ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
 
-COLOR_FALLBACKS = {
-    "CYAN": "TEAL",
-    "CYAN_A": "TEAL_A",
-    "CYAN_B": "TEAL_B",
-    "CYAN_C": "TEAL_C",
-    "CYAN_D": "TEAL_D",
-    "CYAN_E": "TEAL_E",
-}
+
+OPTIMIZER_PROMPT_VERSION = _prompt_version(PROMPT_OPTIMIZER_PREFIX)
+CODE_PROMPT_VERSION = _prompt_version(
+    CODE_GENERATION_PREFIX, RETRY_SIMPLIFICATION_INSTRUCTIONS, RUNTIME_ERROR_FEEDBACK
+)
 
 
 def _orientation_from_resolution(width: int, height: int) -> str:
@@ -75,6 +97,25 @@ def _build_video_spec_notes(width: int, height: int) -> Tuple[int, int, str]:
     return width, height, notes
 
 
+def _build_multi_format_spec_notes(targets: list[tuple[int, int]]) -> str:
+    """Especificação para um único código renderizado em vários formatos (layout derivado do quadro)."""
+    formats = "\n".join(
+        f"  - {width}x{height} px, {_orientation_from_resolution(width, height)}" for width, height in targets
+    )
+    return (
+        "[VIDEO SPECIFICATIONS]\n"
+        "- O MESMO código será renderizado em todas estas resoluções:\n"
+        f"{formats}\n"
+        "- Frame rate: 60 fps (render de alta qualidade)\n"
+        "- Layout parametrizado: dentro do construct, derive posições, escalas e larguras de texto de "
+        "`config.frame_width` e `config.frame_height` (ex.: `grupo.scale_to_fit_width(config.frame_width * 0.8)`, "
+        "`titulo.to_edge(UP)`); não fixe coordenadas que só cabem em uma orientação\n"
+        "- Quando a disposição precisar mudar, use `if config.frame_width >= config.frame_height:` para alternar "
+        "entre arranjo em linha e em coluna (`arrange(RIGHT)` vs `arrange(DOWN)`)\n"
+        "- Mantenha os mesmos objetos, cores, textos e sequência de animações em todos os formatos"
+    )
+
+
 def extract_code(response: str) -> str:
     """Extrai código Python de resposta markdown."""
     pattern = r"```python\s*(.*?)\s*```"
@@ -90,53 +131,31 @@ def extract_code(response: str) -> str:
 
 def get_scene_name(code: str) -> str:
     """Extrai nome da classe Scene do código."""
-    pattern = r"class\s+(\w+)\s*\(\s*(?:Scene|ThreeDScene|MovingCameraScene)\s*\)"
-    match = re.search(pattern, code)
-    if match:
-        return match.group(1)
-    raise ValueError("Could not find Scene class in code")
+    return scene_name_or_raise(analyze_code(code))
 
 
 def validate_code(code: str) -> tuple[bool, str]:
     """Valida código Manim antes de executar."""
-    try:
-        tree = ast.parse(code)
-    except SyntaxError as exc:
-        return False, f"Syntax error: {exc}"
-
-    if "from manim import" not in code:
-        return False, (
-            "Missing 'from manim import' statement. Reforce no prompt que o código deve começar com "
-            "`from manim import *` (ou imports equivalentes) antes da classe da cena."
-        )
-
-    if all(scene_base not in code for scene_base in ("(Scene)", "(ThreeDScene)", "(MovingCameraScene)")):
-        return False, (
-            "Missing Scene class definition. Ajuste sua descrição para pedir explicitamente uma classe como "
-            "`class MinhaCena(Scene):` contendo o método construct com as animações desejadas."
-        )
-
-    if "def construct(self)" not in code:
-        return False, (
-            "Missing construct method. Solicite no prompt que a classe Scene implemente `def construct(self):` "
-            "com os passos da animação."
-        )
+    return analyze_code(code).validation()
+
+
+_VALIDATION_REASONS = (
+    ("Code validated successfully", "valid"),
+    ("Syntax error", "syntax_error"),
+    ("Missing 'from manim import'", "missing_manim_import"),
+    ("Missing Scene class", "missing_scene_class"),
+    ("Missing construct", "missing_construct"),
+    ("Forbidden import", "forbidden_import"),
+    ("Forbidden function", "forbidden_function"),
+    ("Runtime error", "runtime_error"),
+)
 
-    for node in ast.walk(tree):
-        if isinstance(node, ast.Import):
-            for alias in node.names:
-                module = alias.name.split(".")[0]
-                if module in DANGEROUS_IMPORTS:
-                    return False, f"Forbidden import: {alias.name}"
-        elif isinstance(node, ast.ImportFrom):
-            module = (node.module or "").split(".")[0]
-            if module in DANGEROUS_IMPORTS:
-                return False, f"Forbidden import: from {node.module}"
-        elif isinstance(node, ast.Call):
-            if isinstance(node.func, ast.Name) and node.func.id in DANGEROUS_FUNCTIONS:
-                return False, f"Forbidden function: {node.func.id}()"
 
-    return True, "Code validated successfully"
+def _validation_reason(message: str) -> str:
+    for prefix, reason in _VALIDATION_REASONS:
+        if message.startswith(prefix):
+            return reason
+    return "other"
 
 
 def _strip_code_fence(payload: str) -> str:
@@ -186,79 +205,396 @@ def _extract_text(response: Any) -> str:
 
 
 def sanitize_code(code: str, request_id: str | None = None) -> str:
-    rid = request_id or "no-request-id"
-    try:
-        tree = ast.parse(code)
-    except SyntaxError:
-        return code
-
-    modified = False
-
-    class _Sanitizer(ast.NodeTransformer):
-        def visit_Call(self, node: ast.Call) -> Any:
-            nonlocal modified
-            self.generic_visit(node)
-
-            func_name = None
-            if isinstance(node.func, ast.Attribute):
-                func_name = node.func.attr
-            elif isinstance(node.func, ast.Name):
-                func_name = node.func.id
-
-            if func_name == "add_background_rectangle":
-                for kw in node.keywords:
-                    if kw.arg == "fill_opacity":
-                        kw.arg = "opacity"
-                        modified = True
-            if func_name == "add_tip" and node.keywords:
-                filtered = [kw for kw in node.keywords if kw.arg != "tip_style"]
-                if len(filtered) != len(node.keywords):
-                    node.keywords = filtered
-                    modified = True
-            return node
-
-        def visit_Name(self, node: ast.Name) -> Any:
-            nonlocal modified
-            replacement = COLOR_FALLBACKS.get(node.id)
-            if replacement:
-                node.id = replacement
-                modified = True
-            return node
-
-    transformer = _Sanitizer()
-    transformer.visit(tree)
-    if not modified:
-        return code
-
-    ast.fix_missing_locations(tree)
-    sanitized = ast.unparse(tree)
-    logger.info("[%s] Applied code sanitization for unsupported Manim arguments", rid)
-    return sanitized
+    analysis = analyze_code(code)
+    _log_rewrites(analysis, request_id or "no-request-id")
+    return analysis.code
+
+
+def _log_rewrites(analysis: CodeAnalysis, rid: str) -> None:
+    if analysis.rewrites:
+        logger.info(
+            "[%s] Applied code sanitization for unsupported Manim arguments: %s",
+            rid,
+            ", ".join(f"{rewrite.description} (line {rewrite.line})" for rewrite in analysis.rewrites),
+        )
 
 
 async def optimize_prompt(
     description: str,
     video_spec: str | None = None,
     request_id: str | None = None,
+    resolution: str = "unknown",
 ) -> tuple[str, str]:
     rid = request_id or "no-request-id"
+    started = time.perf_counter()
+    cache_key = None
+    if llm_cache is not None:
+        cache_key = llm_cache.make_key(
+            "optimizer", description, video_spec or "", settings.openai_model, OPTIMIZER_PROMPT_VERSION
+        )
+        cached = await llm_cache.aget(cache_key)
+        if cached is not None:
+            logger.info("[%s] Prompt optimization served from cache", rid)
+            OPTIMIZER_SECONDS.observe(time.perf_counter() - started, resolution=resolution, cached="true")
+            record_stage("optimizer", time.perf_counter() - started)
+            return cached["improved_prompt"], cached["resource_plan"]
     try:
         logger.info("[%s] Optimizing prompt", rid)
-        messages = build_prompt_optimizer_messages(description, video_spec)
-        response = await client.responses.create(
-            model=settings.openai_model,
-            input=messages,
-            reasoning={"effort": "xhigh"},
+        messages = build_prompt_optimizer_messages(
+            description, video_spec, max_variable_tokens=settings.prompt_budget_optimizer_tokens
         )
-        content = _extract_text(response)
+        record_prompt_tokens("optimizer", messages, len(PROMPT_OPTIMIZER_PREFIX), rid)
+        content = await _complete_text(messages)
         data = _safe_load_json(_strip_code_fence(content))
         improved = _ensure_str(data.get("improved_prompt"), description)
         resource_plan = _ensure_str(data.get("resource_plan"), DEFAULT_RESOURCE_NOTES)
         logger.info("[%s] Prompt optimization completed", rid)
+        if cache_key is not None and data:
+            await llm_cache.aset(
+                cache_key,
+                {"improved_prompt": improved.strip(), "resource_plan": resource_plan.strip()},
+            )
         return improved.strip(), resource_plan.strip()
     except Exception as exc:
         logger.warning("[%s] Prompt optimization failed: %s", rid, exc)
         return description, DEFAULT_RESOURCE_NOTES
+    finally:
+        OPTIMIZER_SECONDS.observe(time.perf_counter() - started, resolution=resolution, cached="false")
+        record_stage("optimizer", time.perf_counter() - started)
+
+
+class StreamAborted(ValueError):
+    """Saída parcial do modelo já viola uma regra obrigatória; o stream é interrompido."""
+
+
+# Só a cerca do bloco de código: cercas de outras linguagens (ex.: dentro de um JSON) não encerram o stream
+_FENCE_OPEN = re.compile(r"```python[ \t]*\n")
+_IMPORT_LINE = re.compile(r"^\s*(?:import|from)\s+([\w.]+)")
+_CLASS_HEADER = re.compile(r"class\s+(\w+)\s*(?:\((.*)\))?\s*:")
+_DOTTED_NAME = re.compile(r"[\w.]+")
+
+
+def _header_bases(arguments: str) -> list[str]:
+    """Bases de um cabeçalho `class X(...)` como `_base_name` as vê; argumentos nomeados ficam de fora."""
+    parts = (part.strip() for part in arguments.split(","))
+    return [part.rsplit(".", 1)[-1] for part in parts if _DOTTED_NAME.fullmatch(part)]
+
+
+def _open_triple_quote(line: str, quote: str | None) -> str | None:
+    """Delimitador de string tripla ainda aberto ao fim da linha; `quote` é o que vinha aberto antes dela."""
+    index = 0
+    while index < len(line):
+        if quote is not None:
+            if line[index] == "\\":
+                index += 2
+            elif line.startswith(quote, index):
+                index, quote = index + 3, None
+            else:
+                index += 1
+            continue
+        char = line[index]
+        if char == "#":
+            break
+        if line.startswith(('"""', "'''"), index):
+            quote = line[index : index + 3]
+            index += 3
+        elif char in "\"'":
+            # String simples: fecha na mesma linha
+            index += 1
+            while index < len(line) and line[index] != char:
+                index += 2 if line[index] == "\\" else 1
+            index += 1
+        else:
+            index += 1
+    return quote
+
+
+def check_partial_code(partial: str) -> None:
+    """Aplica as regras de validate_code que já podem ser decididas com linhas completas."""
+    has_manim_import = False
+    has_scene_class = False
+    # Como em _keep_scene_classes: cenas do Manim e classes do próprio código que herdam delas
+    scene_names = set(SCENE_BASES)
+    class_names: set[str] = set()
+    quote = None
+    for line in partial.splitlines():
+        inside_string = quote is not None
+        quote = _open_triple_quote(line, quote)
+        if inside_string:
+            # Conteúdo de Code("""...""") ou Text('''...''') não é código da cena
+            continue
+        stripped = line.strip()
+        match = _IMPORT_LINE.match(line)
+        if match:
+            module = match.group(1)
+            if module.split(".")[0] in DANGEROUS_IMPORTS:
+                raise StreamAborted(f"Forbidden import: {module} (stream aborted)")
+            has_manim_import = has_manim_import or (stripped.startswith("from ") and module.split(".")[0] == "manim")
+        elif stripped.startswith(("class ", "def ")) and not has_manim_import:
+            raise StreamAborted("Missing 'from manim import' statement before definitions (stream aborted)")
+        elif stripped.startswith("class "):
+            header = _CLASS_HEADER.match(stripped)
+            if header is None:
+                # Cabeçalho em várias linhas: as bases não cabem nesta linha, então não dá para decidir
+                has_scene_class = True
+                continue
+            bases = _header_bases(header.group(2) or "")
+            # Uma base ainda não definida no stream pode ser uma cena declarada mais adiante
+            if scene_names.intersection(bases) or any(base not in class_names for base in bases):
+                scene_names.add(header.group(1))
+                has_scene_class = True
+            class_names.add(header.group(1))
+        elif stripped.startswith("def construct") and not has_scene_class:
+            raise StreamAborted("Missing Scene class definition before construct (stream aborted)")
+
+
+async def _complete_text(
+    messages: list[dict],
+    guard: Callable[[str], None] | None = None,
+    stop_at_code_fence: bool = False,
+) -> str:
+    """Chama o modelo e devolve o texto.
+
+    Com streaming, acumula os deltas. Com `stop_at_code_fence` (tentativas de código), encerra o
+    stream assim que o bloco ```python fecha e roda `guard` sobre as linhas completas do bloco
+    para abortar saídas já condenadas; sem ele, a resposta é lida até o fim.
+    """
+    if not settings.llm_streaming:
+        response = await client.responses.create(
+            model=settings.openai_model,
+            input=messages,
+            reasoning={"effort": "xhigh"},
+        )
+        return _extract_text(response)
+
+    stream = await client.responses.create(
+        model=settings.openai_model,
+        input=messages,
+        reasoning={"effort": "xhigh"},
+        stream=True,
+    )
+    text = ""
+    try:
+        async for event in stream:
+            if event.type == "response.completed" and not text:
+                text = _extract_text(event.response)
+                continue
+            if event.type != "response.output_text.delta":
+                continue
+            text += event.delta
+            if not stop_at_code_fence:
+                continue
+            # Só há algo novo a decidir quando uma linha ou uma cerca termina
+            if "\n" not in event.delta and "`" not in event.delta:
+                continue
+            opening = _FENCE_OPEN.search(text)
+            if opening is None:
+                continue
+            closing = text.find("```", opening.end())
+            body = text[opening.end():] if closing == -1 else text[opening.end():closing]
+            if guard is not None:
+                guard(body[: body.rfind("\n") + 1] if closing == -1 else body)
+            if closing != -1:
+                return text[: closing + 3]
+    finally:
+        await stream.close()
+    return text
+
+
+@dataclass
+class _AttemptOutcome:
+    code: str
+    scene_name: str
+    is_valid: bool
+    message: str
+    analysis: CodeAnalysis | None = None
+
+
+def _attempt_prompt(optimized_prompt: str, attempt: int, previous: _AttemptOutcome | None = None) -> str:
+    if attempt == 1:
+        return optimized_prompt
+    prompt = f"{optimized_prompt}\n\n[RETRY #{attempt}]\n{RETRY_SIMPLIFICATION_INSTRUCTIONS}"
+    if previous is not None and previous.code and previous.message.startswith("Runtime error"):
+        prompt += RUNTIME_ERROR_FEEDBACK.format(code=previous.code, error=previous.message)
+    return prompt
+
+
+async def _run_code_attempt(
+    attempt: int,
+    optimized_prompt: str,
+    resource_plan: str,
+    video_spec_notes: str,
+    rid: str,
+    resolution: str,
+    previous: _AttemptOutcome | None = None,
+) -> _AttemptOutcome:
+    """Executa uma chamada de geração de código e valida o resultado (inclusive via dry run)."""
+    with span("code_attempt", attempt=attempt) as attributes:
+        outcome = await _attempt_code(
+            attempt, optimized_prompt, resource_plan, video_spec_notes, rid, resolution, previous
+        )
+        attributes.update(valid=outcome.is_valid, message=outcome.message[:200])
+        return outcome
+
+
+async def _attempt_code(
+    attempt: int,
+    optimized_prompt: str,
+    resource_plan: str,
+    video_spec_notes: str,
+    rid: str,
+    resolution: str,
+    previous: _AttemptOutcome | None,
+) -> _AttemptOutcome:
+    messages = build_code_generation_messages(
+        _attempt_prompt(optimized_prompt, attempt, previous),
+        resource_plan,
+        video_spec_notes,
+        max_variable_tokens=settings.prompt_budget_codegen_tokens,
+    )
+    record_prompt_tokens("code_generation", messages, len(CODE_GENERATION_PREFIX), rid)
+    attempt_start = time.perf_counter()
+
+    try:
+        with timed_stage("code_llm"):
+            raw_response = await _complete_text(messages, guard=check_partial_code, stop_at_code_fence=True)
+        with timed_stage("validation"):
+            analysis = analyze_code(extract_code(raw_response))
+            _log_rewrites(analysis, rid)
+        code = analysis.code
+    except StreamAborted as exc:
+        logger.warning("[%s] Attempt %s aborted mid-stream: %s", rid, attempt, exc)
+        CODEGEN_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, resolution=resolution, outcome="aborted")
+        VALIDATION_TOTAL.inc(resolution=resolution, reason=_validation_reason(str(exc)))
+        return _AttemptOutcome(code="", scene_name="", is_valid=False, message=str(exc))
+    except asyncio.CancelledError:
+        CODEGEN_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, resolution=resolution, outcome="cancelled")
+        raise
+    except Exception as exc:  # Erros durante chamada ou parsing
+        logger.warning("[%s] Attempt %s failed during LLM call/parsing: %s", rid, attempt, exc)
+        CODEGEN_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, resolution=resolution, outcome="error")
+        VALIDATION_TOTAL.inc(resolution=resolution, reason="llm_error")
+        return _AttemptOutcome(code="", scene_name="", is_valid=False, message=str(exc))
+
+    try:
+        scene_name = scene_name_or_raise(analysis)
+    except ValueError as exc:
+        logger.warning("[%s] Attempt %s missing scene name: %s", rid, attempt, exc)
+        CODEGEN_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, resolution=resolution, outcome="invalid")
+        VALIDATION_TOTAL.inc(resolution=resolution, reason="missing_scene_name")
+        return _AttemptOutcome(code=code, scene_name="", is_valid=False, message=str(exc))
+
+    is_valid, message = analysis.validation()
+    outcome = "valid" if is_valid else "invalid"
+    if is_valid and dry_run_active():
+        check = await run_render_thread(dry_run_manim, code, scene_name, settings.dry_run_timeout, rid)
+        record_stage("dry_run", check.seconds)
+        DRY_RUN_SECONDS.observe(
+            check.seconds,
+            resolution=resolution,
+            outcome="inconclusive" if check.inconclusive else "ok" if check.ok else "error",
+        )
+        if not check.ok and not check.inconclusive:
+            is_valid, message, outcome = False, f"Runtime error: {check.error}", "runtime_error"
+    CODEGEN_ATTEMPT_SECONDS.observe(time.perf_counter() - attempt_start, resolution=resolution, outcome=outcome)
+    VALIDATION_TOTAL.inc(resolution=resolution, reason=_validation_reason(message))
+    if not is_valid:
+        logger.warning(
+            "[%s] Attempt %s produced invalid code: %s",
+            rid,
+            attempt,
+            message,
+        )
+    return _AttemptOutcome(code=code, scene_name=scene_name, is_valid=is_valid, message=message, analysis=analysis)
+
+
+async def _valid_response(outcome: _AttemptOutcome, cache_key: str | None, width: int, height: int) -> CodeResponse:
+    estimated_cost = None
+    if outcome.analysis is not None:
+        estimate = estimate_render_cost(outcome.analysis, width, height, QUALITY_TIERS["final"].fps)
+        estimated_cost = RenderCost(**asdict(estimate))
+    result = CodeResponse(
+        code=outcome.code,
+        scene_name=outcome.scene_name,
+        is_valid=True,
+        validation_message=outcome.message,
+        estimated_cost=estimated_cost,
+    )
+    if cache_key is not None:
+        await llm_cache.aset(cache_key, result.model_dump())
+    return result
+
+
+def _invalid_response(outcome: _AttemptOutcome, attempts: int) -> CodeResponse:
+    return CodeResponse(
+        code=outcome.code,
+        scene_name=outcome.scene_name,
+        is_valid=False,
+        validation_message=f"{outcome.message} (after {attempts} attempts)",
+    )
+
+
+async def _generate_speculative(
+    optimized_prompt: str,
+    resource_plan: str,
+    video_spec_notes: str,
+    rid: str,
+    resolution: str,
+    cache_key: str | None,
+    width: int,
+    height: int,
+) -> CodeResponse:
+    """Dispara candidatos em paralelo (prompt normal + variantes simplificadas) e fica com o primeiro válido.
+
+    Cada onda lança até `codegen_fanout` chamadas; o total é limitado por `codegen_max_candidates`.
+    """
+    max_candidates = max(1, settings.codegen_max_candidates)
+    launched = 0
+    last = _AttemptOutcome(code="", scene_name="", is_valid=False, message="Code generation failed")
+
+    while launched < max_candidates:
+        wave = range(launched + 1, min(launched + settings.codegen_fanout, max_candidates) + 1)
+        launched = wave[-1]
+        logger.info(
+            "[%s] Speculative code generation: candidates %s-%s of %s",
+            rid,
+            wave[0],
+            wave[-1],
+            max_candidates,
+        )
+        tasks = [
+            asyncio.create_task(
+                _run_code_attempt(attempt, optimized_prompt, resource_plan, video_spec_notes, rid, resolution, last)
+            )
+            for attempt in wave
+        ]
+        try:
+            for finished in asyncio.as_completed(tasks):
+                outcome = await finished
+                if outcome.is_valid:
+                    ATTEMPTS_PER_SUCCESS.observe(launched, resolution=resolution)
+                    logger.info(
+                        "[%s] Speculative code generation succeeded after %s candidates (scene=%s)",
+                        rid,
+                        launched,
+                        outcome.scene_name,
+                    )
+                    return await _valid_response(outcome, cache_key, width, height)
+                # Prefere guardar uma falha com código a um erro de chamada
+                if outcome.code or not last.code:
+                    last = outcome
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    logger.error(
+        "[%s] Exhausted %s speculative candidates without valid code: %s",
+        rid,
+        launched,
+        last.message,
+    )
+    return _invalid_response(last, launched)
 
 
 async def generate_manim_code(
@@ -266,89 +602,67 @@ async def generate_manim_code(
     width: int | None = None,
     height: int | None = None,
     request_id: str | None = None,
+    targets: list[tuple[int, int]] | None = None,
 ) -> CodeResponse:
-    """Gera código Manim a partir de descrição em linguagem natural."""
+    """Gera código Manim a partir de descrição em linguagem natural.
+
+    Com mais de um item em `targets`, o código é pedido com layout adaptável a todas as resoluções;
+    a primeira define a estimativa de custo devolvida.
+    """
     rid = request_id or "no-request-id"
     try:
         logger.info("[%s] Starting code generation", rid)
-        width, height, video_spec_notes = _build_video_spec_notes(width, height)
-        optimized_prompt, resource_plan = await optimize_prompt(description, video_spec_notes, request_id=rid)
+        if targets and len(targets) > 1:
+            (width, height), video_spec_notes = targets[0], _build_multi_format_spec_notes(targets)
+        else:
+            width, height, video_spec_notes = _build_video_spec_notes(width, height)
+        resolution = resolution_bucket(width, height)
+        cache_key = None
+        if llm_cache is not None:
+            cache_key = llm_cache.make_key(
+                "code", description, video_spec_notes, settings.openai_model, CODE_PROMPT_VERSION
+            )
+            cached = await llm_cache.aget(cache_key)
+            if cached is not None:
+                logger.info("[%s] Code generation served from cache (scene=%s)", rid, cached.get("scene_name"))
+                return CodeResponse(**cached)
+
+        optimized_prompt, resource_plan = await optimize_prompt(
+            description,
+            video_spec_notes,
+            request_id=rid,
+            resolution=resolution,
+        )
 
-        last_code = ""
-        last_scene_name = ""
-        last_message = "Code generation failed"
+        if settings.codegen_speculative and settings.codegen_fanout > 1:
+            return await _generate_speculative(
+                optimized_prompt, resource_plan, video_spec_notes, rid, resolution, cache_key, width, height
+            )
 
+        last = _AttemptOutcome(code="", scene_name="", is_valid=False, message="Code generation failed")
         for attempt in range(1, MAX_CODE_ATTEMPTS + 1):
-            attempt_prompt = optimized_prompt
-            if attempt > 1:
-                attempt_prompt = f"{optimized_prompt}\n\n[RETRY #{attempt}]\n{RETRY_SIMPLIFICATION_INSTRUCTIONS}"
-
-            messages = build_code_generation_messages(attempt_prompt, resource_plan, video_spec_notes)
             logger.info("[%s] Code generation attempt %s/%s", rid, attempt, MAX_CODE_ATTEMPTS)
-
-            try:
-                response = await client.responses.create(
-                    model=settings.openai_model,
-                    input=messages,
-                    reasoning={"effort": "xhigh"},
-                )
-
-                raw_response = _extract_text(response)
-                code = extract_code(raw_response)
-                code = sanitize_code(code, rid)
-            except Exception as exc:  # Erros durante chamada ou parsing
-                logger.warning("[%s] Attempt %s failed during LLM call/parsing: %s", rid, attempt, exc)
-                last_code = ""
-                last_scene_name = ""
-                last_message = str(exc)
-                continue
-
-            try:
-                scene_name = get_scene_name(code)
-            except ValueError as exc:
-                logger.warning("[%s] Attempt %s missing scene name: %s", rid, attempt, exc)
-                last_code = code
-                last_scene_name = ""
-                last_message = str(exc)
-                continue
-
-            is_valid, message = validate_code(code)
-            if is_valid:
+            outcome = await _run_code_attempt(
+                attempt, optimized_prompt, resource_plan, video_spec_notes, rid, resolution, last
+            )
+            if outcome.is_valid:
+                ATTEMPTS_PER_SUCCESS.observe(attempt, resolution=resolution)
                 logger.info(
                     "[%s] Code generation succeeded on attempt %s (scene=%s)",
                     rid,
                     attempt,
-                    scene_name,
-                )
-                return CodeResponse(
-                    code=code,
-                    scene_name=scene_name,
-                    is_valid=True,
-                    validation_message=message,
+                    outcome.scene_name,
                 )
-
-            logger.warning(
-                "[%s] Attempt %s produced invalid code: %s",
-                rid,
-                attempt,
-                message,
-            )
-            last_code = code
-            last_scene_name = scene_name
-            last_message = message
+                return await _valid_response(outcome, cache_key, width, height)
+            last = outcome
 
         logger.error(
             "[%s] Exhausted %s attempts without valid code: %s",
             rid,
             MAX_CODE_ATTEMPTS,
-            last_message,
-        )
-        return CodeResponse(
-            code=last_code,
-            scene_name=last_scene_name,
-            is_valid=False,
-            validation_message=f"{last_message} (after {MAX_CODE_ATTEMPTS} attempts)",
+            last.message,
         )
+        return _invalid_response(last, MAX_CODE_ATTEMPTS)
     except Exception as exc:
         logger.exception("[%s] Unexpected error during code generation", rid)
         return CodeResponse(
@@ -0,0 +1,550 @@
+import asyncio
+import hashlib
+import json
+import logging
+import time
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass, field
+from typing import Awaitable, Callable, Optional
+
+from config import get_settings
+from schemas import CodeResponse
+from services.code_analyzer import analyze_code
+from services.llm_cache import normalize_description
+from services.manim_executor import (
+    RenderResult,
+    StillFrame,
+    attach_thumbnail,
+    cached_render,
+    cached_still,
+    execute_manim,
+    render_still,
+)
+from services.metrics import (
+    COALESCED_TOTAL,
+    ENCODE_SECONDS,
+    RENDER_SECONDS,
+    TIMEOUTS_TOTAL,
+    VIDEO_SIZE_BYTES,
+    resolution_bucket,
+)
+from services.openai_service import generate_manim_code
+from services.quality import lower_tier, resolve_render_params
+from services.render_cost import (
+    RenderCostEstimate,
+    RenderCostExceeded,
+    estimate_render_cost,
+    render_cost_limit,
+    render_timeout_for,
+)
+from services.render_progress import (
+    ProgressScope,
+    current_scope,
+    progress_hub,
+    progress_scope,
+    publish,
+    run_render_thread,
+)
+from services.render_scheduler import RenderReservation, render_scheduler
+from services.single_flight import SingleFlight
+from services.stage_timings import collect_stage_timings
+from services.tracing import record_span, span
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.pipeline")
+
+StageCallback = Callable[[str], Awaitable[None]]
+
+
+@dataclass
+class PipelineResult:
+    code_result: CodeResponse
+    render_result: Optional[RenderResult] = None
+    timings: dict[str, float] = field(default_factory=dict)
+    quality: Optional[str] = None
+
+    @property
+    def success(self) -> bool:
+        return self.render_result is not None and self.render_result.success
+
+
+@dataclass
+class MultiFormatResult:
+    code_result: CodeResponse
+    variants: list[PipelineResult] = field(default_factory=list)
+    timings: dict[str, float] = field(default_factory=dict)
+
+    @property
+    def success(self) -> bool:
+        return bool(self.variants) and all(variant.success for variant in self.variants)
+
+
+def _record_render_metrics(render_result: RenderResult, elapsed: float, width: int, height: int) -> None:
+    resolution = resolution_bucket(width, height)
+    outcome = "success" if render_result.success else "timeout" if render_result.timed_out else "failure"
+    RENDER_SECONDS.observe(elapsed, resolution=resolution, outcome=outcome, cached=str(render_result.cached).lower())
+    if render_result.timed_out:
+        TIMEOUTS_TOTAL.inc(resolution=resolution, stage="render")
+    if render_result.video_size:
+        VIDEO_SIZE_BYTES.observe(render_result.video_size, resolution=resolution)
+    if render_result.encode_seconds:
+        ENCODE_SECONDS.observe(render_result.encode_seconds, resolution=resolution, stage="concat")
+    if render_result.transcode_seconds:
+        ENCODE_SECONDS.observe(render_result.transcode_seconds, resolution=resolution, stage="transcode")
+
+
+async def _notify(on_stage: StageCallback | None, stage: str, **details) -> None:
+    # Assinantes de /events recebem a etapa mesmo sem callback (requisições síncronas)
+    publish({"event": "stage", "stage": stage, **details})
+    if on_stage is not None:
+        await on_stage(stage)
+
+
+def _plan_render(
+    code_result: CodeResponse,
+    width: int,
+    height: int,
+    quality: str,
+    request_id: str,
+) -> tuple[str, RenderCostEstimate]:
+    """Estima o custo na qualidade pedida; rebaixa o tier (se permitido) ou rejeita cenas acima do limite."""
+    analysis = analyze_code(code_result.code)
+    limit = render_cost_limit()
+    while True:
+        estimate = estimate_render_cost(analysis, *resolve_render_params(width, height, quality))
+        if estimate.estimated_render_seconds < limit:
+            return quality, estimate
+        lower = lower_tier(quality) if settings.render_cost_auto_downgrade else None
+        if lower is None:
+            logger.warning(
+                "[%s] Rejecting render: estimated %.0fs exceeds %.0fs limit",
+                request_id,
+                estimate.estimated_render_seconds,
+                limit,
+            )
+            raise RenderCostExceeded(estimate.estimated_render_seconds, limit)
+        logger.info(
+            "[%s] Estimated render %.0fs exceeds limit at %s quality, downgrading to %s",
+            request_id,
+            estimate.estimated_render_seconds,
+            quality,
+            lower,
+        )
+        quality = lower
+
+
+def _extra_segment_slots(play_calls: Optional[int]) -> int:
+    """Slots a pedir além do primeiro para o render segmentado (um por segmento adicional)."""
+    if settings.render_segments < 2 or settings.render_backend != "subprocess":
+        return 0
+    segments = settings.render_segments
+    if play_calls is not None:
+        # Cenas curtas não chegam a ser divididas: não vale segurar slots por elas
+        segments = min(segments, play_calls // max(1, settings.render_segment_min_animations))
+    return max(0, segments - 1)
+
+
+@dataclass
+class _StageFanout:
+    """Repassa as etapas da execução compartilhada para todos os chamadores agrupados."""
+
+    listeners: list[StageCallback] = field(default_factory=list)
+    current: Optional[str] = None
+    progress: ProgressScope = field(default_factory=ProgressScope)
+
+    async def __call__(self, stage: str) -> None:
+        self.current = stage
+        for listener in list(self.listeners):
+            await listener(stage)
+
+
+_pipelines = SingleFlight()
+_fanouts: dict[str, _StageFanout] = {}
+
+
+def pipeline_key(
+    description: str,
+    width: int,
+    height: int,
+    quality: str,
+    code_result: CodeResponse | None = None,
+    encoding: str | None = None,
+    still: StillFrame | None = None,
+    thumbnail: str | None = None,
+) -> str:
+    payload = {
+        "description": normalize_description(description),
+        "width": width,
+        "height": height,
+        "quality": quality,
+        "code": code_result.code if code_result is not None else None,
+        "encoding": encoding,
+        "still": asdict(still) if still is not None else None,
+        "thumbnail": thumbnail,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+async def run_video_pipeline(
+    description: str,
+    width: int,
+    height: int,
+    request_id: str,
+    on_stage: StageCallback | None = None,
+    reject_when_full: bool = True,
+    quality: str = "final",
+    code_result: CodeResponse | None = None,
+    encoding: str | None = None,
+    still: StillFrame | None = None,
+    thumbnail: str | None = None,
+) -> PipelineResult:
+    """Executa descrição → código → render, registrando o tempo de cada etapa.
+
+    Quando `code_result` é informado (promoção de um rascunho), a geração de código é pulada.
+    Com `still`, o render produz só um quadro (imagem) em vez do vídeo.
+    Chamadas simultâneas com as mesmas entradas compartilham uma única execução.
+    """
+    if not settings.pipeline_coalescing:
+        with progress_scope(ProgressScope([request_id])):
+            return await _execute_pipeline(
+                description,
+                width,
+                height,
+                request_id,
+                on_stage,
+                reject_when_full,
+                quality,
+                code_result,
+                encoding,
+                still,
+                thumbnail,
+            )
+
+    key = pipeline_key(description, width, height, quality, code_result, encoding, still, thumbnail)
+    fanout = _fanouts.setdefault(key, _StageFanout())
+    if not _pipelines.in_flight(key):
+        fanout.current = None
+    if on_stage is not None:
+        fanout.listeners.append(on_stage)
+        if fanout.current is not None:
+            await on_stage(fanout.current)
+    # Eventos de progresso da execução compartilhada vão para todos os request ids agrupados
+    fanout.progress.channels.append(request_id)
+    if fanout.current is not None:
+        progress_hub.publish(request_id, {"event": "stage", "stage": fanout.current, "coalesced": True})
+
+    async def execute() -> PipelineResult:
+        with progress_scope(fanout.progress):
+            return await _execute_pipeline(
+                description,
+                width,
+                height,
+                request_id,
+                fanout,
+                reject_when_full,
+                quality,
+                code_result,
+                encoding,
+                still,
+                thumbnail,
+            )
+
+    joined = time.perf_counter()
+    try:
+        result, shared = await _pipelines.run(key, execute)
+    finally:
+        if on_stage in fanout.listeners:
+            fanout.listeners.remove(on_stage)
+        fanout.progress.channels.remove(request_id)
+        if _fanouts.get(key) is fanout and not _pipelines.in_flight(key):
+            del _fanouts[key]
+    if shared:
+        record_span("coalesced_wait", time.perf_counter() - joined, joined, key=key[:12])
+        COALESCED_TOTAL.inc(kind="pipeline")
+        logger.info("[%s] Joined in-flight pipeline with identical inputs (key=%s)", request_id, key[:12])
+    return result
+
+
+async def _execute_pipeline(
+    description: str,
+    width: int,
+    height: int,
+    request_id: str,
+    on_stage: StageCallback | None,
+    reject_when_full: bool,
+    quality: str,
+    code_result: CodeResponse | None,
+    encoding: str | None = None,
+    still: StillFrame | None = None,
+    thumbnail: str | None = None,
+) -> PipelineResult:
+    stages = (description, width, height, request_id, on_stage, quality, code_result, encoding, still, thumbnail)
+    if not reject_when_full:
+        return await _run_stages(*stages)
+    # Falha rápido antes de gastar chamadas ao LLM se não houver capacidade de render; a vaga
+    # fica reservada durante a geração de código, até o render pedir o slot
+    with render_scheduler.reserve(request_id) as reservation:
+        return await _run_stages(*stages, reservation=reservation)
+
+
+async def _run_stages(
+    description: str,
+    width: int,
+    height: int,
+    request_id: str,
+    on_stage: StageCallback | None,
+    quality: str,
+    code_result: CodeResponse | None,
+    encoding: str | None,
+    still: StillFrame | None,
+    thumbnail: str | None,
+    reservation: RenderReservation | None = None,
+) -> PipelineResult:
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+
+    if code_result is None:
+        await _notify(on_stage, "generating_code")
+        stage_start = time.perf_counter()
+        # Otimizador, chamadas ao LLM, validação e dry run somam seus tempos em `timings`
+        with collect_stage_timings(timings), span("code_generation"):
+            code_result = await generate_manim_code(
+                description=description,
+                width=width,
+                height=height,
+                request_id=request_id,
+            )
+        timings["code_generation"] = time.perf_counter() - stage_start
+    if not code_result.is_valid:
+        timings["total"] = time.perf_counter() - started
+        return PipelineResult(code_result=code_result, timings=timings)
+
+    render_width, render_height, fps = resolve_render_params(width, height, quality)
+    # Cache antes do limite de custo e da fila: um acerto não espera renders nem é rejeitado pelo custo
+    stage_start = time.perf_counter()
+    with span("render_cache", still=still is not None) as attributes:
+        cached = await asyncio.to_thread(
+            _cached_result, code_result, render_width, render_height, fps, encoding, still, request_id
+        )
+        attributes.update(hit=cached is not None)
+    if cached is not None:
+        timings["render"] = time.perf_counter() - stage_start
+        return await _finish_render(
+            code_result,
+            cached,
+            timings,
+            started,
+            quality,
+            (render_width, render_height),
+            still,
+            thumbnail,
+            settings.render_timeout,
+            request_id,
+        )
+    requested_params = (render_width, render_height, fps)
+
+    timeout = settings.render_timeout
+    heavy = False
+    play_calls: Optional[int] = None
+    # Um quadro único custa uma fração do vídeo: não passa pelo limite de custo nem pela faixa pesada
+    if settings.render_cost_enabled and still is None:
+        quality, estimate = _plan_render(code_result, width, height, quality, request_id)
+        render_width, render_height, fps = resolve_render_params(width, height, quality)
+        timeout = render_timeout_for(estimate)
+        heavy = estimate.estimated_render_seconds > settings.render_cost_heavy_seconds
+        timings["estimated_render"] = estimate.estimated_render_seconds
+        play_calls = estimate.play_calls
+        scope = current_scope()
+        if scope is not None:
+            scope.expected_animations = estimate.play_calls or None
+    logger.info(
+        "[%s] Code generated successfully (scene=%s), starting %s render at %dx%d@%s (timeout=%ss, heavy=%s)",
+        request_id,
+        code_result.scene_name,
+        quality,
+        render_width,
+        render_height,
+        fps,
+        timeout,
+        heavy,
+    )
+    await _notify(on_stage, "waiting_for_render_slot")
+    render_slot = render_scheduler.slot(request_id, reject_when_full=False, heavy=heavy, reservation=reservation)
+    async with render_slot as slot:
+        timings["render_queue"] = slot.waited_seconds
+        record_span("render_queue", slot.waited_seconds, heavy=heavy)
+        await _notify(on_stage, "rendering", quality=quality, width=render_width, height=render_height, fps=fps)
+        stage_start = time.perf_counter()
+        with span("render", width=render_width, height=render_height, fps=fps, quality=quality) as attributes:
+            if still is not None:
+                render_result = await run_render_thread(
+                    render_still,
+                    code_result.code,
+                    code_result.scene_name,
+                    render_width,
+                    render_height,
+                    timeout,
+                    request_id,
+                    still=still,
+                    check_cache=False,
+                )
+            else:
+                # Um slot por segmento paralelo; sem slots livres o render segue em processo único
+                extra_slots = render_scheduler.extra_slots(request_id, _extra_segment_slots(play_calls), heavy)
+                async with extra_slots as extra:
+                    render_result = await run_render_thread(
+                        execute_manim,
+                        code_result.code,
+                        code_result.scene_name,
+                        render_width,
+                        render_height,
+                        timeout,
+                        request_id,
+                        fps=fps,
+                        threads=slot.threads * (1 + extra),
+                        encoding=encoding,
+                        segments=1 + extra,
+                        # Já consultado acima, salvo se o limite de custo rebaixou a qualidade
+                        check_cache=(render_width, render_height, fps) != requested_params,
+                    )
+            attributes.update(success=render_result.success, cached=render_result.cached, still=still is not None)
+        timings["render"] = time.perf_counter() - stage_start
+    return await _finish_render(
+        code_result,
+        render_result,
+        timings,
+        started,
+        quality,
+        (render_width, render_height),
+        still,
+        thumbnail,
+        timeout,
+        request_id,
+    )
+
+
+def _cached_result(
+    code_result: CodeResponse,
+    width: int,
+    height: int,
+    fps: int,
+    encoding: str | None,
+    still: StillFrame | None,
+    request_id: str,
+) -> Optional[RenderResult]:
+    if still is not None:
+        return cached_still(code_result.code, code_result.scene_name, width, height, request_id, still)
+    return cached_render(code_result.code, code_result.scene_name, width, height, fps, encoding, request_id)
+
+
+async def _finish_render(
+    code_result: CodeResponse,
+    render_result: RenderResult,
+    timings: dict[str, float],
+    started: float,
+    quality: str,
+    resolution: tuple[int, int],
+    still: StillFrame | None,
+    thumbnail: str | None,
+    timeout: int,
+    request_id: str,
+) -> PipelineResult:
+    """Etapas após o render (ou acerto de cache): miniatura, tempos e métricas."""
+    if render_result.transcode_seconds:
+        timings["transcode"] = render_result.transcode_seconds
+    if thumbnail and render_result.success and still is None:
+        stage_start = time.perf_counter()
+        with span("thumbnail", format=thumbnail):
+            await asyncio.to_thread(attach_thumbnail, render_result, thumbnail, timeout, request_id)
+        timings["thumbnail"] = time.perf_counter() - stage_start
+    timings["total"] = time.perf_counter() - started
+    if still is None:
+        # Um quadro não é comparável aos renders de vídeo nos histogramas por resolução
+        _record_render_metrics(render_result, timings["render"], *resolution)
+    return PipelineResult(
+        code_result=code_result,
+        render_result=render_result,
+        timings=timings,
+        quality=quality,
+    )
+
+
+async def _render_variant(
+    description: str,
+    width: int,
+    height: int,
+    request_id: str,
+    quality: str,
+    code_result: CodeResponse,
+    encoding: str | None,
+    thumbnail: str | None,
+) -> PipelineResult:
+    try:
+        return await run_video_pipeline(
+            description=description,
+            width=width,
+            height=height,
+            request_id=request_id,
+            reject_when_full=False,
+            quality=quality,
+            code_result=code_result,
+            encoding=encoding,
+            thumbnail=thumbnail,
+        )
+    except RenderCostExceeded as exc:
+        # Um formato caro demais não derruba os demais
+        return PipelineResult(code_result=code_result, render_result=RenderResult(success=False, error=str(exc)))
+
+
+async def run_multi_format_pipeline(
+    description: str,
+    targets: list[tuple[int, int]],
+    request_id: str,
+    reject_when_full: bool = True,
+    quality: str = "final",
+    encoding: str | None = None,
+    thumbnail: str | None = None,
+) -> MultiFormatResult:
+    """Gera o código uma única vez, com layout derivado do tamanho do quadro, e renderiza cada formato em paralelo.
+
+    Cada render disputa o próprio slot do scheduler: o paralelismo efetivo é o que a capacidade permitir.
+    """
+    started = time.perf_counter()
+    timings: dict[str, float] = {}
+    width, height = targets[0]
+
+    # A reserva cobre a geração de código; cada formato depois entra na fila do scheduler por conta própria
+    with render_scheduler.reserve(request_id) if reject_when_full else nullcontext():
+        progress_hub.publish(request_id, {"event": "stage", "stage": "generating_code", "targets": len(targets)})
+        with collect_stage_timings(timings), span("code_generation", targets=len(targets)):
+            code_result = await generate_manim_code(
+                description=description,
+                width=width,
+                height=height,
+                request_id=request_id,
+                targets=targets,
+            )
+    timings["code_generation"] = time.perf_counter() - started
+    if not code_result.is_valid:
+        timings["total"] = time.perf_counter() - started
+        return MultiFormatResult(code_result=code_result, timings=timings)
+
+    logger.info(
+        "[%s] Code generated once for %s formats (scene=%s): %s",
+        request_id,
+        len(targets),
+        code_result.scene_name,
+        ", ".join(f"{target_width}x{target_height}" for target_width, target_height in targets),
+    )
+    stage_start = time.perf_counter()
+    variants = await asyncio.gather(
+        *(
+            _render_variant(
+                description, target_width, target_height, request_id, quality, code_result, encoding, thumbnail
+            )
+            for target_width, target_height in targets
+        )
+    )
+    timings["renders"] = time.perf_counter() - stage_start
+    timings["total"] = time.perf_counter() - started
+    return MultiFormatResult(code_result=code_result, variants=list(variants), timings=timings)
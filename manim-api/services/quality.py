@@ -0,0 +1,35 @@
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True)
+class QualityTier:
+    scale: float
+    fps: int
+
+
+# O código é sempre gerado para a resolução pedida; os tiers só reduzem pixels e fps do render,
+# então um rascunho aprovado pode ser promovido para "final" reaproveitando o mesmo código.
+QUALITY_TIERS = {
+    "draft": QualityTier(scale=0.5, fps=15),
+    "standard": QualityTier(scale=0.75, fps=30),
+    "final": QualityTier(scale=1.0, fps=60),
+}
+
+
+def _even(value: float) -> int:
+    # libx264 exige dimensões pares
+    return max(2, int(round(value / 2)) * 2)
+
+
+def resolve_render_params(width: int, height: int, quality: str) -> tuple[int, int, int]:
+    tier = QUALITY_TIERS[quality]
+    if tier.scale == 1.0:
+        return width, height, tier.fps
+    return _even(width * tier.scale), _even(height * tier.scale), tier.fps
+
+
+def lower_tier(quality: str) -> str | None:
+    """Tier imediatamente inferior (QUALITY_TIERS está em ordem crescente)."""
+    names = list(QUALITY_TIERS)
+    index = names.index(quality)
+    return names[index - 1] if index > 0 else None
@@ -0,0 +1,145 @@
+import ast
+import hashlib
+import logging
+import os
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from config import get_settings
+from services.code_analyzer import parse_code
+from services.video_store import link_or_copy
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.render_cache")
+
+
+@dataclass
+class RenderCacheStats:
+    hits: int
+    misses: int
+    stores: int
+    evictions: int
+    entries: int
+    size_bytes: int
+
+
+def canonicalize_code(code: str) -> str:
+    """Normaliza o código via AST para que diferenças de espaços/comentários gerem a mesma chave."""
+    try:
+        return ast.dump(parse_code(code))
+    except SyntaxError:
+        return code.strip()
+
+
+class RenderCache:
+    """Cache em disco de vídeos renderizados, endereçado pelo conteúdo da cena."""
+
+    def __init__(self, root: Path, max_bytes: int, max_age_seconds: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(code: str, scene_name: str, width: int, height: int, fps: int, *extra: str) -> str:
+        digest = hashlib.sha256()
+        for part in (canonicalize_code(code), scene_name, str(width), str(height), str(fps), *extra):
+            digest.update(part.encode("utf-8"))
+            digest.update(b"\0")
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str, suffix: str) -> Path:
+        return self.root / f"{key}{suffix}"
+
+    def get(self, key: str, suffix: str = ".mp4") -> Optional[Path]:
+        path = self._entry_path(key, suffix)
+        with self._lock:
+            try:
+                stat = path.stat()
+            except FileNotFoundError:
+                self.misses += 1
+                return None
+            if time.time() - stat.st_mtime > self.max_age_seconds:
+                path.unlink(missing_ok=True)
+                self.evictions += 1
+                self.misses += 1
+                return None
+            # mtime funciona como marcador de último acesso para o LRU
+            os.utime(path)
+            self.hits += 1
+            return path
+
+    def put(self, key: str, video_path: Path) -> Optional[Path]:
+        target = self._entry_path(key, video_path.suffix or ".mp4")
+        try:
+            link_or_copy(video_path, target)
+        except OSError as exc:
+            logger.warning("Could not store render %s in cache: %s", key[:12], exc)
+            return None
+        with self._lock:
+            self.stores += 1
+        self.evict()
+        return target
+
+    def _entries(self) -> list[tuple[Path, os.stat_result]]:
+        entries = []
+        for path in self.root.iterdir():
+            # Ignora os temporários de link_or_copy ainda não publicados
+            if path.name.startswith("."):
+                continue
+            try:
+                entries.append((path, path.stat()))
+            except FileNotFoundError:
+                continue
+        return entries
+
+    def evict(self) -> int:
+        """Remove entradas expiradas e, depois, as menos usadas até caber no limite de tamanho."""
+        if not self.root.exists():
+            return 0
+        removed = 0
+        now = time.time()
+        with self._lock:
+            entries = sorted(self._entries(), key=lambda item: item[1].st_mtime)
+            total = sum(stat.st_size for _, stat in entries)
+            for path, stat in entries:
+                expired = now - stat.st_mtime > self.max_age_seconds
+                if not expired and total <= self.max_bytes:
+                    continue
+                path.unlink(missing_ok=True)
+                total -= stat.st_size
+                removed += 1
+            self.evictions += removed
+        if removed:
+            logger.info("Evicted %s render cache entries", removed)
+        return removed
+
+    def stats(self) -> RenderCacheStats:
+        with self._lock:
+            entries = self._entries() if self.root.exists() else []
+            return RenderCacheStats(
+                hits=self.hits,
+                misses=self.misses,
+                stores=self.stores,
+                evictions=self.evictions,
+                entries=len(entries),
+                size_bytes=sum(stat.st_size for _, stat in entries),
+            )
+
+
+render_cache: Optional[RenderCache] = (
+    RenderCache(
+        root=Path(settings.render_cache_dir),
+        max_bytes=settings.render_cache_max_mb * 1024 * 1024,
+        max_age_seconds=settings.render_cache_max_age_hours * 3600,
+    )
+    if settings.render_cache_enabled
+    else None
+)
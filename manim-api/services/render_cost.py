@@ -0,0 +1,99 @@
+from dataclasses import dataclass
+
+from config import get_settings
+from services.code_analyzer import CodeAnalysis
+
+settings = get_settings()
+
+TEX_CALLS = {
+    "Tex",
+    "MathTex",
+    "SingleStringMathTex",
+    "Title",
+    "BulletedList",
+    "Matrix",
+    "DecimalNumber",
+    "Integer",
+    "Variable",
+}
+TEXT_CALLS = {"Text", "MarkupText", "Paragraph", "Code"}
+UPDATER_CALLS = {"add_updater", "always_redraw", "always", "f_always", "turn_animation_into_updater"}
+
+# Constantes calibradas para Cairo em um núcleo; RENDER_COST_SCALE ajusta para o hardware real
+STARTUP_SECONDS = 2.0
+TEX_COMPILE_SECONDS = 0.4
+PLAY_OVERHEAD_SECONDS = 0.15
+SECONDS_PER_MEGAPIXEL_FRAME = 0.012
+THREE_D_FACTOR = 2.5
+UPDATER_FACTOR = 0.25
+TEXT_OBJECT_FACTOR = 0.02
+
+
+class RenderCostExceeded(Exception):
+    def __init__(self, estimated_seconds: float, limit_seconds: float):
+        super().__init__(
+            f"Estimated render time {estimated_seconds:.0f}s exceeds the {limit_seconds:.0f}s limit; "
+            "reduce resolution, quality or scene length"
+        )
+        self.estimated_seconds = estimated_seconds
+        self.limit_seconds = limit_seconds
+
+
+@dataclass
+class RenderCostEstimate:
+    animation_seconds: float
+    play_calls: int
+    tex_objects: int
+    text_objects: int
+    updaters: int
+    three_d: bool
+    complexity: float
+    estimated_render_seconds: float
+
+
+def estimate_render_cost(analysis: CodeAnalysis, width: int, height: int, fps: int) -> RenderCostEstimate:
+    """Modelo estático: custo fixo + LaTeX + overhead por play + frames × megapixels × complexidade."""
+    calls = analysis.weighted_calls
+    tex_objects = int(sum(calls[name] for name in TEX_CALLS))
+    text_objects = int(sum(calls[name] for name in TEXT_CALLS))
+    updaters = int(sum(calls[name] for name in UPDATER_CALLS))
+    play_calls = int(calls["play"])
+    three_d = analysis.is_three_d
+
+    complexity = (1 + UPDATER_FACTOR * updaters + TEXT_OBJECT_FACTOR * (tex_objects + text_objects)) * (
+        THREE_D_FACTOR if three_d else 1.0
+    )
+    animation_seconds = analysis.estimated_duration_seconds
+    frames = max(1.0, animation_seconds) * fps
+    megapixels = width * height / 1_000_000
+    seconds = (
+        STARTUP_SECONDS
+        + tex_objects * TEX_COMPILE_SECONDS
+        + play_calls * PLAY_OVERHEAD_SECONDS
+        + frames * megapixels * SECONDS_PER_MEGAPIXEL_FRAME * complexity
+    ) * settings.render_cost_scale
+    return RenderCostEstimate(
+        animation_seconds=round(animation_seconds, 2),
+        play_calls=play_calls,
+        tex_objects=tex_objects,
+        text_objects=text_objects,
+        updaters=updaters,
+        three_d=three_d,
+        complexity=round(complexity, 3),
+        estimated_render_seconds=round(seconds, 2),
+    )
+
+
+def render_cost_limit() -> float:
+    """Estimativa a partir da qual a cena é rejeitada: RENDER_COST_MAX_SECONDS, nunca acima de RENDER_TIMEOUT_MAX.
+
+    Uma cena estimada no teto do timeout já entraria condenada a estourá-lo (segurando um slot pesado até lá).
+    """
+    limit = settings.render_cost_max_seconds
+    return min(limit, settings.render_timeout_max) if limit else settings.render_timeout_max
+
+
+def render_timeout_for(estimate: RenderCostEstimate) -> int:
+    """Nunca abaixo de RENDER_TIMEOUT; cenas pesadas ganham folga proporcional até RENDER_TIMEOUT_MAX."""
+    scaled = estimate.estimated_render_seconds * settings.render_cost_timeout_factor
+    return int(min(settings.render_timeout_max, max(settings.render_timeout, scaled)))
@@ -0,0 +1,341 @@
+import asyncio
+import codecs
+import itertools
+import os
+import re
+import subprocess
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterable, Iterator, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+# Barra do tqdm emitida pelo Manim: "Animation 3: Create(Circle):  45%|████▌     | 27/60 [...]"
+PROGRESS_PATTERN = re.compile(r"Animation (\d+): (.*?):\s+(\d+)%\|[^|]*\|\s*(\d+)/(\d+)")
+_LINE_BREAK = re.compile(r"(\r\n|\r|\n)")
+
+
+class OutputBuffer:
+    """Guarda apenas o final da saída (até `max_chars`); o começo descartado vira um aviso."""
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self.dropped = 0
+        self._chunks: deque[str] = deque()
+        self._size = 0
+
+    def append(self, text: str) -> None:
+        if len(text) > self.max_chars:
+            self.dropped += len(text) - self.max_chars
+            text = text[-self.max_chars :]
+        self._chunks.append(text)
+        self._size += len(text)
+        while self._size > self.max_chars:
+            oldest = self._chunks.popleft()
+            self._size -= len(oldest)
+            self.dropped += len(oldest)
+
+    def text(self) -> str:
+        body = "".join(self._chunks)
+        if self.dropped:
+            return f"[... {self.dropped} earlier characters dropped ...]\n{body}"
+        return body
+
+
+@dataclass
+class StreamedProcess:
+    returncode: Optional[int]
+    stdout: str
+    stderr: str
+    timed_out: bool = False
+
+
+def _pump(stream: Any, buffer: OutputBuffer, on_line: Optional[Callable[[str], None]]) -> None:
+    """Lê o pipe em blocos; redesenhos com '\\r' (barras de progresso) são analisados mas não guardados."""
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    pending = ""
+    fd = stream.fileno()
+    while True:
+        chunk = os.read(fd, 65536)
+        pending += decoder.decode(chunk, final=not chunk)
+        # split com grupo alterna [texto, separador, texto, ...]; o último texto pode estar incompleto
+        parts = _LINE_BREAK.split(pending)
+        pending = parts.pop()
+        if chunk and not pending and parts and parts[-1] == "\r":
+            # O '\n' de um '\r\n' pode chegar no próximo bloco
+            pending = parts.pop(-2) + parts.pop()
+        for text, separator in zip(parts[0::2], parts[1::2]):
+            if on_line is not None and text:
+                on_line(text)
+            if separator != "\r":
+                buffer.append(text + "\n")
+        if not chunk:
+            break
+    if pending:
+        if on_line is not None:
+            on_line(pending)
+        buffer.append(pending)
+    stream.close()
+
+
+def read_logs(paths: Iterable[Path], max_chars: int) -> str:
+    """Concatena arquivos de log com o mesmo limite de `run_streaming`: só o final fica em memória."""
+    buffer = OutputBuffer(max_chars)
+    for path in paths:
+        try:
+            stream = open(path, "rb")
+        except OSError:
+            continue
+        _pump(stream, buffer, None)
+    return buffer.text()
+
+
+def run_streaming(
+    cmd: list[str],
+    timeout: float,
+    cwd: str,
+    env: dict[str, str],
+    on_line: Optional[Callable[[str], None]] = None,
+) -> StreamedProcess:
+    """Como `subprocess.run(capture_output=True)`, mas com memória limitada e linhas entregues ao vivo."""
+    max_chars = settings.render_log_max_chars
+    stdout, stderr = OutputBuffer(max_chars), OutputBuffer(max_chars)
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, cwd=cwd, env=env)
+    with cancellable_process(process):
+        readers = [
+            threading.Thread(target=_pump, args=(process.stdout, stdout, on_line), daemon=True),
+            threading.Thread(target=_pump, args=(process.stderr, stderr, on_line), daemon=True),
+        ]
+        for reader in readers:
+            reader.start()
+        timed_out = False
+        try:
+            process.wait(timeout=timeout)
+        except subprocess.TimeoutExpired:
+            timed_out = True
+            process.kill()
+            process.wait()
+        finally:
+            for reader in readers:
+                reader.join()
+        return StreamedProcess(process.returncode, stdout.text(), stderr.text(), timed_out)
+
+
+def parse_progress(line: str) -> Optional[dict[str, Any]]:
+    match = PROGRESS_PATTERN.search(line)
+    if match is None:
+        return None
+    index, title, percent, frames, total = match.groups()
+    return {
+        "animation": int(index),
+        "title": title.strip()[:120],
+        "percent": int(percent),
+        "frames": int(frames),
+        "total_frames": int(total),
+    }
+
+
+class _Channel:
+    def __init__(self, history_size: int):
+        self.events: deque[dict[str, Any]] = deque(maxlen=history_size)
+        self.subscribers: list[tuple[asyncio.AbstractEventLoop, asyncio.Queue]] = []
+        self.closed = False
+
+
+class ProgressHub:
+    """Canais de eventos por request id: histórico curto para quem chega tarde e filas para quem assina.
+
+    `publish` pode ser chamado de threads (render em `asyncio.to_thread`); a entrega usa o loop do assinante.
+    """
+
+    def __init__(self, max_channels: int, history_size: int):
+        self.max_channels = max_channels
+        self.history_size = history_size
+        self._channels: "OrderedDict[str, _Channel]" = OrderedDict()
+        self._sequence = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def _channel(self, key: str) -> _Channel:
+        channel = self._channels.get(key)
+        if channel is None:
+            channel = self._channels[key] = _Channel(self.history_size)
+            while len(self._channels) > self.max_channels:
+                self._channels.popitem(last=False)
+        return channel
+
+    def publish(self, key: str, event: dict[str, Any]) -> None:
+        event = {"id": next(self._sequence), "time": round(time.time(), 3), **event}
+        with self._lock:
+            channel = self._channel(key)
+            if channel.closed:
+                return
+            channel.events.append(event)
+            if event["event"] == "end":
+                channel.closed = True
+            subscribers = list(channel.subscribers)
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(queue.put_nowait, event)
+            except RuntimeError:
+                # Loop do assinante já encerrado
+                continue
+
+    def close(self, key: str, **details: Any) -> None:
+        """Encerra o canal, se alguém o usou; canais nunca abertos não são criados."""
+        with self._lock:
+            if key not in self._channels:
+                return
+        self.publish(key, {"event": "end", **details})
+
+    def subscribe(self, key: str, after: int = 0) -> tuple[list[dict[str, Any]], asyncio.Queue]:
+        """Retorna (histórico posterior a `after`, fila de novos eventos). Deve rodar dentro do event loop."""
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            channel = self._channel(key)
+            history = [event for event in channel.events if event["id"] > after]
+            if not channel.closed:
+                channel.subscribers.append((asyncio.get_running_loop(), queue))
+        return history, queue
+
+    def unsubscribe(self, key: str, queue: asyncio.Queue) -> None:
+        with self._lock:
+            channel = self._channels.get(key)
+            if channel is not None:
+                channel.subscribers = [entry for entry in channel.subscribers if entry[1] is not queue]
+
+
+progress_hub = ProgressHub(max_channels=settings.progress_channels, history_size=settings.progress_history_size)
+
+
+@dataclass
+class ProgressScope:
+    """Destinatários dos eventos da execução corrente (vários quando chamadas idênticas são agrupadas)."""
+
+    channels: list[str] = field(default_factory=list)
+    expected_animations: Optional[int] = None
+
+    def publish(self, event: dict[str, Any]) -> None:
+        for channel in list(self.channels):
+            progress_hub.publish(channel, event)
+
+
+_current: ContextVar[Optional[ProgressScope]] = ContextVar("manim_api_progress", default=None)
+
+
+@contextmanager
+def progress_scope(scope: ProgressScope) -> Iterator[ProgressScope]:
+    token = _current.set(scope)
+    try:
+        yield scope
+    finally:
+        _current.reset(token)
+
+
+def current_scope() -> Optional[ProgressScope]:
+    return _current.get()
+
+
+class RenderCancellation:
+    """Processos de render iniciados por uma execução; `cancel` mata os que ainda rodam.
+
+    A thread de `asyncio.to_thread` não pode ser interrompida: matar o processo é o que a faz voltar.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._processes: set[Any] = set()
+        self.cancelled = False
+
+    def register(self, process: Any) -> None:
+        with self._lock:
+            if not self.cancelled:
+                self._processes.add(process)
+                return
+        # Cancelada antes de o processo subir
+        process.kill()
+
+    def unregister(self, process: Any) -> None:
+        with self._lock:
+            self._processes.discard(process)
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            processes = list(self._processes)
+        for process in processes:
+            try:
+                process.kill()
+            except OSError:
+                pass
+
+
+_cancellation: ContextVar[Optional[RenderCancellation]] = ContextVar("manim_api_render_cancellation", default=None)
+
+
+@contextmanager
+def cancellable_process(process: Any) -> Iterator[Any]:
+    """Deixa `process` (qualquer objeto com `kill()`) ser morto se a execução corrente for cancelada."""
+    cancellation = _cancellation.get()
+    if cancellation is None:
+        yield process
+        return
+    cancellation.register(process)
+    try:
+        yield process
+    finally:
+        cancellation.unregister(process)
+
+
+async def run_render_thread(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """`asyncio.to_thread` para renders: se a requisição for cancelada, mata os processos Manim
+    iniciados pela thread e espera ela voltar antes de propagar o cancelamento (e devolver o slot)."""
+    cancellation = RenderCancellation()
+    token = _cancellation.set(cancellation)
+    try:
+        # A task copia o contexto na criação; a thread herda o contexto da task
+        task = asyncio.ensure_future(asyncio.to_thread(func, *args, **kwargs))
+    finally:
+        _cancellation.reset(token)
+    try:
+        return await asyncio.shield(task)
+    except asyncio.CancelledError:
+        cancellation.cancel()
+        await asyncio.wait([task])
+        raise
+
+
+def publish(event: dict[str, Any]) -> None:
+    scope = _current.get()
+    if scope is not None:
+        scope.publish(event)
+
+
+def render_progress_reporter() -> Optional[Callable[[str], None]]:
+    """Callback de linha para `run_streaming` que publica o progresso por animação (só quando muda)."""
+    scope = _current.get()
+    if scope is None or not scope.channels:
+        return None
+    last: list[tuple[int, int]] = []
+
+    def on_line(line: str) -> None:
+        progress = parse_progress(line)
+        if progress is None:
+            return
+        marker = (progress["animation"], progress["percent"])
+        if last and last[0] == marker:
+            return
+        last[:] = [marker]
+        expected = scope.expected_animations
+        if expected:
+            done = progress["animation"] + progress["percent"] / 100
+            progress["overall_percent"] = round(min(99.0, 100 * done / max(expected, progress["animation"] + 1)), 1)
+        scope.publish({"event": "progress", **progress})
+
+    return on_line
@@ -0,0 +1,234 @@
+import asyncio
+import logging
+import math
+import os
+import time
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Iterator, Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.render_scheduler")
+
+
+class RenderQueueFull(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"Render queue is full, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+@dataclass
+class RenderSlot:
+    threads: int
+    waited_seconds: float
+
+
+@dataclass
+class RenderReservation:
+    """Vaga na fila garantida na admissão; passa a contar como espera ao entrar em `slot()`."""
+
+    request_id: str
+    consumed: bool = False
+
+
+@dataclass
+class RenderSchedulerStats:
+    slots: int
+    active: int
+    heavy_slots: int
+    heavy_active: int
+    waiting: int
+    reserved: int
+    max_queue: int
+    cpu_count: int
+    admitted: int
+    rejected: int
+    avg_wait_seconds: float
+    last_wait_seconds: float
+    avg_render_seconds: float
+
+
+class RenderScheduler:
+    """Limita renders simultâneos ao orçamento de CPU, com fila de espera limitada.
+
+    Renders marcados como pesados (pelo estimador de custo) só ocupam até `heavy_slots`
+    slots, para que cenas longas/4K não monopolizem todos os slots.
+
+    A admissão acontece antes da geração de código, que leva minutos: requisições admitidas
+    ficam reservadas até pedirem o slot, para que uma rajada não passe inteira pela checagem
+    enquanto a fila ainda está vazia.
+    """
+
+    def __init__(self, slots: int, max_queue: int, cpu_count: int, heavy_slots: int | None = None):
+        self.slots = slots
+        self.max_queue = max_queue
+        self.cpu_count = cpu_count
+        self.heavy_slots = min(slots, heavy_slots or max(1, slots // 2))
+        self._active = 0
+        self._heavy_active = 0
+        self._waiting = 0
+        self._reserved = 0
+        self._condition = asyncio.Condition()
+        self.admitted = 0
+        self.rejected = 0
+        self._total_wait = 0.0
+        self._last_wait = 0.0
+        # Média móvel usada para estimar o Retry-After
+        self._avg_render = float(settings.render_timeout) / 4
+
+    def retry_after(self) -> int:
+        backlog = self._waiting + self._reserved + 1
+        return max(1, math.ceil(backlog / self.slots * self._avg_render))
+
+    def ensure_capacity(self) -> None:
+        """Rejeita de imediato quando slots, fila e reservas já somam `slots + max_queue`."""
+        if self._active + self._waiting + self._reserved >= self.slots + self.max_queue:
+            self.rejected += 1
+            retry_after = self.retry_after()
+            logger.warning(
+                "Render queue full (active=%s, waiting=%s, reserved=%s), rejecting with Retry-After=%ss",
+                self._active,
+                self._waiting,
+                self._reserved,
+                retry_after,
+            )
+            raise RenderQueueFull(retry_after)
+
+    @contextmanager
+    def reserve(self, request_id: str) -> Iterator[RenderReservation]:
+        """Admite a requisição (ou levanta RenderQueueFull) e guarda sua vaga até ela pedir o slot.
+
+        Sair do bloco sem ter usado a reserva (código inválido, custo rejeitado, erro) a devolve.
+        """
+        self.ensure_capacity()
+        reservation = RenderReservation(request_id)
+        self._reserved += 1
+        try:
+            yield reservation
+        finally:
+            if not reservation.consumed:
+                reservation.consumed = True
+                self._reserved -= 1
+
+    @asynccontextmanager
+    async def slot(
+        self,
+        request_id: str,
+        reject_when_full: bool = True,
+        heavy: bool = False,
+        reservation: Optional[RenderReservation] = None,
+    ) -> AsyncIterator[RenderSlot]:
+        if reservation is not None and not reservation.consumed:
+            # A vaga reservada na admissão vira espera pelo slot, sem nova checagem
+            reservation.consumed = True
+            self._reserved -= 1
+        elif reject_when_full:
+            self.ensure_capacity()
+
+        wait_start = time.perf_counter()
+        self._waiting += 1
+        try:
+            async with self._condition:
+                await self._condition.wait_for(
+                    lambda: self._active < self.slots and (not heavy or self._heavy_active < self.heavy_slots)
+                )
+                self._active += 1
+                if heavy:
+                    self._heavy_active += 1
+        finally:
+            self._waiting -= 1
+
+        waited = time.perf_counter() - wait_start
+        self.admitted += 1
+        self._total_wait += waited
+        self._last_wait = waited
+        threads = max(1, self.cpu_count // self._active)
+        logger.info(
+            "[%s] Render slot acquired after %.2fs (active=%s/%s, heavy=%s, waiting=%s, threads=%s)",
+            request_id,
+            waited,
+            self._active,
+            self.slots,
+            heavy,
+            self._waiting,
+            threads,
+        )
+
+        render_start = time.perf_counter()
+        try:
+            yield RenderSlot(threads=threads, waited_seconds=waited)
+        finally:
+            self._avg_render = 0.8 * self._avg_render + 0.2 * (time.perf_counter() - render_start)
+            async with self._condition:
+                self._active -= 1
+                if heavy:
+                    self._heavy_active -= 1
+                # notify_all: um pesado no início da fila não pode bloquear os leves atrás dele
+                self._condition.notify_all()
+
+    @asynccontextmanager
+    async def extra_slots(self, request_id: str, wanted: int, heavy: bool = False) -> AsyncIterator[int]:
+        """Ocupa, sem esperar, até `wanted` slots livres além do já obtido (render segmentado).
+
+        Cada segmento é um processo Manim inteiro; sem isso N segmentos rodariam sob um único slot.
+        Com alguém na fila nada é cedido: os slots livres são de quem espera.
+        """
+        granted = 0
+        if wanted > 0 and not self._waiting:
+            granted = min(wanted, self.slots - self._active)
+            if heavy:
+                granted = min(granted, self.heavy_slots - self._heavy_active)
+            granted = max(0, granted)
+        self._active += granted
+        if heavy:
+            self._heavy_active += granted
+        if granted:
+            logger.info(
+                "[%s] Took %s extra render slots for segments (active=%s/%s)",
+                request_id,
+                granted,
+                self._active,
+                self.slots,
+            )
+        try:
+            yield granted
+        finally:
+            if granted:
+                async with self._condition:
+                    self._active -= granted
+                    if heavy:
+                        self._heavy_active -= granted
+                    self._condition.notify_all()
+
+    def stats(self) -> RenderSchedulerStats:
+        return RenderSchedulerStats(
+            slots=self.slots,
+            active=self._active,
+            heavy_slots=self.heavy_slots,
+            heavy_active=self._heavy_active,
+            waiting=self._waiting,
+            reserved=self._reserved,
+            max_queue=self.max_queue,
+            cpu_count=self.cpu_count,
+            admitted=self.admitted,
+            rejected=self.rejected,
+            avg_wait_seconds=self._total_wait / self.admitted if self.admitted else 0.0,
+            last_wait_seconds=self._last_wait,
+            avg_render_seconds=self._avg_render,
+        )
+
+
+def _default_slots(cpu_count: int) -> int:
+    # Cada render ocupa ~1 núcleo rasterizando e outro(s) no encoder
+    return max(1, cpu_count // 2)
+
+
+_cpu_count = os.cpu_count() or 1
+render_scheduler = RenderScheduler(
+    slots=settings.render_slots or _default_slots(_cpu_count),
+    max_queue=settings.render_queue_size,
+    cpu_count=_cpu_count,
+    heavy_slots=settings.render_heavy_slots or None,
+)
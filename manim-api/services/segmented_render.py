@@ -0,0 +1,258 @@
+import logging
+import re
+import shutil
+import subprocess
+import time
+from contextlib import ExitStack
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from config import get_settings
+from services.render_progress import cancellable_process, read_logs
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.segmented_render")
+
+ANIMATION_COUNT_PATCH = """
+def _manim_api_report_animation_count():
+    from manim.scene.scene import Scene
+
+    original = Scene.render
+    if getattr(original, "_manim_api_patched", False):
+        return
+
+    def render(self, *args, **kwargs):
+        try:
+            return original(self, *args, **kwargs)
+        finally:
+            print(f"MANIM_API_ANIMATION_COUNT={self.renderer.num_plays}", flush=True)
+
+    render._manim_api_patched = True
+    Scene.render = render
+
+
+_manim_api_report_animation_count()
+del _manim_api_report_animation_count
+"""
+
+_COUNT_PATTERN = re.compile(r"MANIM_API_ANIMATION_COUNT=(\d+)")
+# Pula todas as animações na contagem: o construct roda, mas nenhum frame é rasterizado
+SKIP_ALL_ANIMATIONS = "1000000000"
+
+
+@dataclass
+class Segment:
+    start: int
+    end: int
+    media_dir: Path
+    process: Optional[subprocess.Popen] = None
+
+
+@dataclass
+class SegmentedOutcome:
+    success: bool
+    video_path: Optional[Path] = None
+    stdout: str = ""
+    stderr: str = ""
+    error: Optional[str] = None
+    timed_out: bool = False
+    encode_seconds: float = 0.0
+
+
+def split_ranges(total: int, segments: int) -> list[tuple[int, int]]:
+    """Divide os índices de animação [0, total) em intervalos contíguos e inclusivos."""
+    size, remainder = divmod(total, segments)
+    ranges = []
+    start = 0
+    for index in range(segments):
+        end = start + size + (1 if index < remainder else 0) - 1
+        ranges.append((start, end))
+        start = end + 1
+    return ranges
+
+
+def count_animations(script_path: Path, scene_name: str, env: dict, timeout: float) -> Optional[int]:
+    count_script = script_path.with_name("count_scene.py")
+    count_script.write_text(f"{ANIMATION_COUNT_PATCH}\n{script_path.read_text()}")
+    cmd = [
+        "manim",
+        "render",
+        "--dry_run",
+        "-ql",
+        "-n",
+        SKIP_ALL_ANIMATIONS,
+        "--media_dir",
+        str(script_path.parent / "count_media"),
+        "--disable_caching",
+        str(count_script),
+        scene_name,
+    ]
+    try:
+        result = subprocess.run(
+            cmd,
+            capture_output=True,
+            text=True,
+            timeout=timeout,
+            cwd=str(script_path.parent),
+            env=env,
+        )
+    except (subprocess.TimeoutExpired, OSError):
+        return None
+    match = _COUNT_PATTERN.search(result.stdout)
+    if result.returncode != 0 or not match:
+        return None
+    return int(match.group(1))
+
+
+def _concat(videos: list[Path], output: Path, timeout: float) -> Optional[str]:
+    list_file = output.with_suffix(".txt")
+    list_file.write_text("".join(f"file '{video}'\n" for video in videos))
+    cmd = [
+        "ffmpeg",
+        "-y",
+        "-loglevel",
+        "error",
+        "-f",
+        "concat",
+        "-safe",
+        "0",
+        "-i",
+        str(list_file),
+        "-c",
+        "copy",
+        "-movflags",
+        "+faststart",
+        str(output),
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return "Concatenation timeout"
+    if result.returncode != 0:
+        return result.stderr or "ffmpeg concat failed"
+    return None
+
+
+def render_segmented(
+    script_path: Path,
+    scene_name: str,
+    width: int,
+    height: int,
+    fps: int,
+    timeout: int,
+    threads: int | None,
+    build_env: Callable[[int | None], dict],
+    locate_video: Callable[[Path, str], Optional[Path]],
+    rid: str,
+    max_segments: Optional[int] = None,
+) -> Optional[SegmentedOutcome]:
+    """Renderiza a cena em intervalos de animações em paralelo e concatena os MP4s parciais.
+
+    Retorna None quando a cena não vale a divisão (poucas animações, ffmpeg ausente,
+    contagem falhou) para que o chamador siga com o render único. Animações anteriores
+    ao intervalo são puladas pelo Manim (`-n início,fim`), que ainda executa o estado
+    delas; updaters dependentes de `dt` podem divergir levemente nas emendas.
+    """
+    if shutil.which("ffmpeg") is None:
+        return None
+
+    deadline = time.monotonic() + timeout
+    total = count_animations(script_path, scene_name, build_env(threads), timeout)
+    if total is None:
+        logger.info("[%s] Could not count animations, falling back to single render", rid)
+        return None
+
+    max_segments = settings.render_segments if max_segments is None else max_segments
+    segments_count = min(max_segments, total // max(1, settings.render_segment_min_animations))
+    if segments_count < 2:
+        return None
+
+    work_dir = script_path.parent
+    segments = [
+        Segment(start=start, end=end, media_dir=work_dir / f"segment_{index}")
+        for index, (start, end) in enumerate(split_ranges(total, segments_count))
+    ]
+    env = build_env(max(1, threads // segments_count) if threads else None)
+    logger.info(
+        "[%s] Rendering %s animations in %s parallel segments: %s",
+        rid,
+        total,
+        segments_count,
+        ", ".join(f"{segment.start}-{segment.end}" for segment in segments),
+    )
+
+    failure: Optional[str] = None
+    cancellables = ExitStack()
+    try:
+        for segment in segments:
+            cmd = [
+                "manim",
+                "render",
+                "-r",
+                f"{width},{height}",
+                "--fps",
+                str(fps),
+                "-n",
+                f"{segment.start},{segment.end}",
+                "--media_dir",
+                str(segment.media_dir),
+                "--disable_caching",
+                str(script_path),
+                scene_name,
+            ]
+            segment.media_dir.mkdir(parents=True, exist_ok=True)
+            # Saída vai para arquivos: pipes cheios travariam os segmentos que ainda não foram lidos
+            stdout_log, stderr_log = segment.media_dir / "stdout.log", segment.media_dir / "stderr.log"
+            with open(stdout_log, "w") as out, open(stderr_log, "w") as err:
+                segment.process = subprocess.Popen(cmd, stdout=out, stderr=err, cwd=str(work_dir), env=env)
+            cancellables.enter_context(cancellable_process(segment.process))
+
+        for segment in segments:
+            try:
+                segment.process.wait(timeout=max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                failure = f"Render timeout after {timeout} seconds"
+            if failure is None and segment.process.returncode != 0:
+                failure = "Manim render failed"
+            if failure:
+                break
+    except Exception as exc:
+        logger.exception("[%s] Failed to start render segments", rid)
+        failure = f"Subprocess error: {exc}"
+    finally:
+        # Inclusive quando um Popen falha no meio: os segmentos já iniciados não podem ficar órfãos
+        for segment in segments:
+            if segment.process is not None and segment.process.poll() is None:
+                segment.process.kill()
+                segment.process.wait()
+        cancellables.close()
+
+    started = [segment for segment in segments if segment.process is not None]
+    stdout = read_logs((segment.media_dir / "stdout.log" for segment in started), settings.render_log_max_chars)
+    stderr = read_logs((segment.media_dir / "stderr.log" for segment in started), settings.render_log_max_chars)
+    if failure:
+        return SegmentedOutcome(
+            success=False,
+            error=failure,
+            stdout=stdout,
+            stderr=stderr,
+            timed_out=failure.startswith("Render timeout"),
+        )
+
+    videos = [locate_video(segment.media_dir, scene_name) for segment in segments]
+    if not all(videos):
+        return SegmentedOutcome(success=False, error="Video file not found after render", stdout=stdout, stderr=stderr)
+
+    output = work_dir / f"{scene_name}.mp4"
+    concat_start = time.perf_counter()
+    concat_error = _concat(videos, output, max(1.0, deadline - time.monotonic()))
+    if concat_error:
+        return SegmentedOutcome(success=False, error=f"Segment concatenation failed: {concat_error}", stdout=stdout, stderr=stderr)
+    return SegmentedOutcome(
+        success=True,
+        video_path=output,
+        stdout=stdout,
+        stderr=stderr,
+        encode_seconds=time.perf_counter() - concat_start,
+    )
@@ -0,0 +1,105 @@
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, TypeVar
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(Exception):
+    """A mesma chave foi reutilizada com uma requisição diferente."""
+
+
+@dataclass
+class _Flight:
+    fingerprint: str
+    future: asyncio.Future
+    waiters: int = 0
+
+
+class SingleFlight:
+    """Compartilha uma execução em andamento entre chamadas com a mesma chave.
+
+    Com `ttl_seconds` > 0 o resultado também fica guardado após terminar, para que
+    retentativas com a mesma chave de idempotência recebam a resposta original.
+    A execução só é cancelada quando todos que a aguardam foram cancelados.
+    """
+
+    def __init__(self, ttl_seconds: float = 0.0, max_entries: int = 0):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._inflight: dict[str, _Flight] = {}
+        # Em ordem de inserção, que com TTL fixo é também a ordem de expiração
+        self._completed: dict[str, tuple[str, float, Any]] = {}
+        self.shared = 0
+
+    def _purge(self, now: float) -> None:
+        while self._completed:
+            oldest = next(iter(self._completed))
+            if self._completed[oldest][1] > now:
+                break
+            del self._completed[oldest]
+
+    def _remember(self, key: str, fingerprint: str, result: Any) -> None:
+        self._completed.pop(key, None)
+        self._completed[key] = (fingerprint, time.monotonic() + self.ttl_seconds, result)
+        # Resultados guardados incluem código e logs: com `max_entries`, os mais antigos saem primeiro
+        while self.max_entries and len(self._completed) > self.max_entries:
+            del self._completed[next(iter(self._completed))]
+
+    @staticmethod
+    def _check(key: str, stored: str, fingerprint: str) -> None:
+        if stored != fingerprint:
+            raise IdempotencyConflict(f"Key {key!r} was already used with a different request")
+
+    def in_flight(self, key: str) -> bool:
+        return key in self._inflight
+
+    async def run(
+        self,
+        key: str,
+        factory: Callable[[], Awaitable[T]],
+        fingerprint: str = "",
+        remember: Callable[[T], bool] = lambda _: True,
+    ) -> tuple[T, bool]:
+        """Retorna (resultado, compartilhado). Quem chega depois aguarda a execução do primeiro."""
+        self._purge(time.monotonic())
+        completed = self._completed.get(key)
+        if completed is not None:
+            self._check(key, completed[0], fingerprint)
+            self.shared += 1
+            return completed[2], True
+
+        flight = self._inflight.get(key)
+        if flight is not None:
+            self._check(key, flight.fingerprint, fingerprint)
+            self.shared += 1
+            return await self._wait(key, flight), True
+
+        flight = _Flight(fingerprint, asyncio.ensure_future(factory()))
+        self._inflight[key] = flight
+
+        def _finish(done: asyncio.Future) -> None:
+            if self._inflight.get(key) is flight:
+                del self._inflight[key]
+            if done.cancelled() or done.exception() is not None or not self.ttl_seconds:
+                return
+            if remember(done.result()):
+                self._remember(key, fingerprint, done.result())
+
+        flight.future.add_done_callback(_finish)
+        return await self._wait(key, flight), False
+
+    async def _wait(self, key: str, flight: _Flight) -> Any:
+        flight.waiters += 1
+        try:
+            # shield: cancelar um chamador não cancela a execução enquanto outros a aguardam
+            return await asyncio.shield(flight.future)
+        finally:
+            flight.waiters -= 1
+            if not flight.waiters and not flight.future.done():
+                # O último interessado foi cancelado (cliente desconectou, timeout): ninguém mais quer o resultado
+                flight.future.cancel()
+                if self._inflight.get(key) is flight:
+                    # Quem chegar agora começa uma execução nova, em vez de herdar uma cancelada
+                    del self._inflight[key]
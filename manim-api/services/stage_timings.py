@@ -0,0 +1,35 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+from services.tracing import record_span
+
+# Dicionário de tempos da execução corrente; tasks e threads (to_thread) herdam a mesma referência
+_current: ContextVar[Optional[dict[str, float]]] = ContextVar("manim_api_stage_timings", default=None)
+
+
+def record_stage(name: str, seconds: float, started: Optional[float] = None) -> None:
+    """Soma o tempo da etapa ao coletor ativo (tentativas repetidas acumulam) e ao trace da requisição."""
+    record_span(name, seconds, started)
+    timings = _current.get()
+    if timings is not None:
+        timings[name] = timings.get(name, 0.0) + seconds
+
+
+@contextmanager
+def collect_stage_timings(timings: dict[str, float]) -> Iterator[dict[str, float]]:
+    token = _current.set(timings)
+    try:
+        yield timings
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def timed_stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(name, time.perf_counter() - started, started)
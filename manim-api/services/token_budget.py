@@ -0,0 +1,68 @@
+import logging
+from functools import lru_cache
+from typing import Any, Optional
+
+from services.metrics import PROMPT_TOKENS
+
+logger = logging.getLogger("manim_api.token_budget")
+
+try:  # tiktoken é opcional; sem ele usamos a heurística de ~4 caracteres por token
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+_CHARS_PER_TOKEN = 4
+_MESSAGE_OVERHEAD_TOKENS = 4
+
+
+@lru_cache(maxsize=1)
+def _encoding() -> Optional[Any]:
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as exc:  # download do vocabulário pode falhar offline
+        logger.warning("tiktoken unavailable, falling back to character estimate: %s", exc)
+        return None
+
+
+@lru_cache(maxsize=256)
+def count_tokens(text: str) -> int:
+    encoding = _encoding()
+    if encoding is not None:
+        return len(encoding.encode(text))
+    return -(-len(text) // _CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int, keep_end: bool = False) -> str:
+    """Corta o texto em `max_tokens`; com `keep_end` descarta o início e preserva o final."""
+    if max_tokens <= 0:
+        return ""
+    if count_tokens(text) <= max_tokens:
+        return text
+    encoding = _encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        return encoding.decode(tokens[-max_tokens:] if keep_end else tokens[:max_tokens])
+    max_chars = max_tokens * _CHARS_PER_TOKEN
+    return text[-max_chars:] if keep_end else text[:max_chars]
+
+
+def count_message_tokens(messages: list[dict]) -> int:
+    return sum(count_tokens(message["content"]) + _MESSAGE_OVERHEAD_TOKENS for message in messages)
+
+
+def record_prompt_tokens(stage: str, messages: list[dict], static_messages: int, request_id: str) -> int:
+    """Mede o prefixo estático (cacheável pelo provedor) e a parte variável do prompt de uma etapa."""
+    static_tokens = count_message_tokens(messages[:static_messages])
+    variable_tokens = count_message_tokens(messages[static_messages:])
+    PROMPT_TOKENS.observe(static_tokens, stage=stage, part="static")
+    PROMPT_TOKENS.observe(variable_tokens, stage=stage, part="variable")
+    logger.debug(
+        "[%s] Prompt tokens for %s: static=%s variable=%s",
+        request_id,
+        stage,
+        static_tokens,
+        variable_tokens,
+    )
+    return static_tokens + variable_tokens
@@ -0,0 +1,114 @@
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+from config import get_settings
+
+settings = get_settings()
+
+
+@dataclass
+class Span:
+    name: str
+    start: float  # segundos desde o início da requisição
+    duration: float
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+
+@dataclass
+class RequestTrace:
+    request_id: str
+    method: str
+    path: str
+    started_at: float
+    duration: Optional[float] = None
+    status_code: Optional[int] = None
+    spans: list[Span] = field(default_factory=list)
+    origin: float = field(default_factory=time.perf_counter, repr=False)
+
+    def add(self, name: str, started: float, duration: float, **attributes: Any) -> None:
+        # list.append é atômico: spans chegam de tasks e de threads (asyncio.to_thread) ao mesmo tempo
+        self.spans.append(Span(name, round(started - self.origin, 6), round(duration, 6), attributes))
+
+    def server_timing(self) -> str:
+        """Soma os spans por nome no formato do header Server-Timing (milissegundos)."""
+        totals: dict[str, list[float]] = {}
+        for span in self.spans:
+            entry = totals.setdefault(span.name, [0.0, 0])
+            entry[0] += span.duration
+            entry[1] += 1
+        parts = [
+            f'{name};dur={seconds * 1000:.1f}' + (f';desc="x{count}"' if count > 1 else "")
+            for name, (seconds, count) in totals.items()
+        ]
+        if self.duration is not None:
+            parts.append(f"total;dur={self.duration * 1000:.1f}")
+        return ", ".join(parts)
+
+
+class TraceStore:
+    """Buffer circular das últimas requisições; entradas entram ao iniciar, então as em andamento aparecem."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._traces: "OrderedDict[str, RequestTrace]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, trace: RequestTrace) -> None:
+        with self._lock:
+            self._traces.pop(trace.request_id, None)
+            self._traces[trace.request_id] = trace
+            while len(self._traces) > self.max_entries:
+                self._traces.popitem(last=False)
+
+    def get(self, request_id: str) -> Optional[RequestTrace]:
+        with self._lock:
+            return self._traces.get(request_id)
+
+    def recent(self, limit: int) -> list[RequestTrace]:
+        with self._lock:
+            return list(self._traces.values())[-limit:][::-1]
+
+
+trace_store = TraceStore(max_entries=settings.trace_buffer_size)
+_current: ContextVar[Optional[RequestTrace]] = ContextVar("manim_api_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current.get()
+
+
+@contextmanager
+def trace_request(request_id: str, method: str, path: str) -> Iterator[Optional[RequestTrace]]:
+    if not settings.tracing_enabled:
+        yield None
+        return
+    trace = RequestTrace(request_id=request_id, method=method, path=path, started_at=time.time())
+    trace_store.add(trace)
+    token = _current.set(trace)
+    try:
+        yield trace
+    finally:
+        trace.duration = round(time.perf_counter() - trace.origin, 6)
+        _current.reset(token)
+
+
+def record_span(name: str, duration: float, started: Optional[float] = None, **attributes: Any) -> None:
+    """Registra um trecho já medido; sem `started`, assume que terminou agora."""
+    trace = _current.get()
+    if trace is not None:
+        trace.add(name, started if started is not None else time.perf_counter() - duration, duration, **attributes)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[dict[str, Any]]:
+    """Mede o bloco; o dicionário devolvido aceita atributos definidos durante a execução."""
+    started = time.perf_counter()
+    try:
+        yield attributes
+    finally:
+        record_span(name, time.perf_counter() - started, started, **attributes)
@@ -0,0 +1,75 @@
+import logging
+import os
+import re
+import shutil
+import time
+import uuid
+from pathlib import Path
+from typing import Optional
+
+from config import get_settings
+
+settings = get_settings()
+logger = logging.getLogger("manim_api.video_store")
+
+_VIDEO_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+def link_or_copy(source: Path, target: Path) -> Path:
+    """Cria um hardlink (sem cópia de bytes) e cai para cópia se o sistema de arquivos não suportar."""
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex}.tmp")
+    try:
+        os.link(source, tmp_path)
+    except OSError:
+        shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, target)
+    return target
+
+
+class VideoStore:
+    """Guarda vídeos prontos em disco para entrega via streaming/download por referência."""
+
+    def __init__(self, root: Path, ttl_seconds: int):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+
+    def save(self, source: Path, move: bool = False) -> tuple[str, Path]:
+        video_id = uuid.uuid4().hex
+        target = self.root / f"{video_id}{source.suffix or '.mp4'}"
+        self.root.mkdir(parents=True, exist_ok=True)
+        if move:
+            shutil.move(str(source), target)
+        else:
+            link_or_copy(source, target)
+        self.cleanup()
+        return video_id, target
+
+    def path(self, video_id: str) -> Optional[Path]:
+        if not _VIDEO_ID_PATTERN.match(video_id):
+            return None
+        for candidate in self.root.glob(f"{video_id}.*"):
+            return candidate
+        return None
+
+    def cleanup(self) -> int:
+        if not self.root.exists():
+            return 0
+        removed = 0
+        cutoff = time.time() - self.ttl_seconds
+        for path in self.root.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                continue
+        if removed:
+            logger.info("Removed %s expired videos from store", removed)
+        return removed
+
+
+video_store = VideoStore(
+    root=Path(settings.video_store_dir),
+    ttl_seconds=settings.video_store_ttl_hours * 3600,
+)
@@ -0,0 +1,19 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Os módulos leem as configurações na importação: o ambiente de teste precisa vir antes
+_cache_dir = Path(tempfile.mkdtemp(prefix="manim_api_tests_"))
+for name, value in {
+    "OPENAI_API_KEY": "test-key",
+    "LLM_CACHE_ENABLED": "false",
+    "RENDER_CACHE_ENABLED": "false",
+    "ASSET_CACHE_ENABLED": "false",
+    "JOB_STORE_PATH": str(_cache_dir / "jobs.sqlite3"),
+    "JOB_OUTPUT_DIR": str(_cache_dir / "jobs"),
+    "VIDEO_STORE_DIR": str(_cache_dir / "videos"),
+}.items():
+    os.environ.setdefault(name, value)
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
@@ -0,0 +1,54 @@
+import threading
+import time
+
+from services import manim_worker_pool
+from services.manim_worker_pool import ManimWorkerPool
+
+
+class FakeWorker:
+    def __init__(self, context, extra_path):
+        self.process = FakeProcess()
+        self.renders = 0
+        self.rss_mb = 0.0
+
+    def render(self, task, timeout):
+        time.sleep(task["seconds"])
+        self.renders += 1
+        return {"ok": True, "output": ""}
+
+    def stop(self):
+        pass
+
+    def kill(self):
+        pass
+
+
+class FakeProcess:
+    pid = 0
+
+    def kill(self):
+        pass
+
+
+def test_recycled_worker_wakes_a_blocked_caller(monkeypatch):
+    monkeypatch.setattr(manim_worker_pool, "_Worker", FakeWorker)
+    # max_renders=1: o primeiro worker é reciclado assim que termina
+    pool = ManimWorkerPool(size=1, max_renders=1, max_rss_mb=0)
+    outcomes = {}
+
+    def render(name, seconds):
+        started = time.perf_counter()
+        outcomes[name] = (pool.render({"seconds": seconds}, timeout=5), time.perf_counter() - started)
+
+    first = threading.Thread(target=render, args=("first", 0.3))
+    first.start()
+    time.sleep(0.1)
+    second = threading.Thread(target=render, args=("second", 0))
+    second.start()
+    first.join()
+    second.join()
+
+    outcome, elapsed = outcomes["second"]
+    assert outcome.ok and not outcome.unavailable
+    assert elapsed < 2
+    assert pool.recycled == 2
@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from schemas import CodeResponse
+from services import pipeline
+from services.manim_executor import RenderResult
+from services.render_cost import RenderCostEstimate, RenderCostExceeded
+from services.render_scheduler import RenderScheduler
+
+CODE = CodeResponse(
+    code="from manim import *\n\nclass Cached(Scene):\n    def construct(self):\n        self.play(Create(Circle()))\n",
+    scene_name="Cached",
+    is_valid=True,
+    validation_message="ok",
+)
+
+
+def test_render_cache_hit_skips_cost_limit_and_render_queue(monkeypatch):
+    scheduler = RenderScheduler(slots=1, max_queue=1, cpu_count=1)
+    monkeypatch.setattr(pipeline, "render_scheduler", scheduler)
+    monkeypatch.setattr(pipeline.settings, "pipeline_coalescing", False)
+    # Qualquer cena estoura este limite: sem o cache, o pipeline rejeitaria com RenderCostExceeded
+    monkeypatch.setattr(pipeline.settings, "render_cost_enabled", True)
+    monkeypatch.setattr(pipeline.settings, "render_cost_max_seconds", 0.001)
+    monkeypatch.setattr(
+        pipeline,
+        "cached_render",
+        lambda *args: RenderResult(success=True, video_path="hit.mp4", video_id="0" * 32, video_size=1, cached=True),
+    )
+
+    async def scenario() -> RenderResult:
+        # O único slot fica ocupado por um render longo
+        async with scheduler.slot("busy", reject_when_full=False):
+            result = await asyncio.wait_for(
+                pipeline.run_video_pipeline("cached", 1280, 720, "hit", reject_when_full=False, code_result=CODE),
+                timeout=1,
+            )
+        return result.render_result
+
+    render_result = asyncio.run(scenario())
+    assert render_result.success and render_result.cached
+
+
+def test_estimate_past_the_timeout_cap_is_rejected_even_under_the_cost_limit(monkeypatch):
+    monkeypatch.setattr(pipeline.settings, "render_cost_max_seconds", 900)
+    monkeypatch.setattr(pipeline.settings, "render_timeout_max", 600)
+    monkeypatch.setattr(pipeline.settings, "render_cost_auto_downgrade", False)
+    estimate = RenderCostEstimate(
+        animation_seconds=60,
+        play_calls=1,
+        tex_objects=0,
+        text_objects=0,
+        updaters=0,
+        three_d=False,
+        complexity=1.0,
+        estimated_render_seconds=700,
+    )
+    monkeypatch.setattr(pipeline, "estimate_render_cost", lambda *args: estimate)
+
+    # Com timeout máximo de 600 s, a cena estimada em 700 s estouraria com certeza
+    with pytest.raises(RenderCostExceeded) as exc_info:
+        pipeline._plan_render(CODE, 1920, 1080, "final", "capped")
+    assert exc_info.value.limit_seconds == 600
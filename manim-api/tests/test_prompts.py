@@ -0,0 +1,28 @@
+from prompts import build_code_generation_messages
+from services.token_budget import count_tokens
+
+
+def test_tight_budget_drops_optimizer_notes_before_retry_feedback():
+    improved_prompt = "Descrição longa da cena. " * 200 + "\n\n[RETRY #2]\n[PREVIOUS ATTEMPT RUNTIME ERROR]\nNameError: x"
+    notes = "Nota do otimizador sobre recursos. " * 100
+    spec = "# VIDEO SPEC\n1920x1080"
+    budget = count_tokens(spec) + 300
+
+    content = build_code_generation_messages(improved_prompt, notes, spec, max_variable_tokens=budget)[-1]["content"]
+
+    assert content.endswith(spec)
+    assert "NameError: x" in content
+    assert "# PROMPT OPTIMIZER NOTES" not in content
+    assert count_tokens(content) <= budget + 10
+
+
+def test_optimizer_notes_use_the_budget_left_by_the_prompt():
+    spec = "# VIDEO SPEC\n1920x1080"
+    budget = count_tokens(spec) + count_tokens("Pedido curto.") + 50
+
+    content = build_code_generation_messages(
+        "Pedido curto.", "Nota do otimizador. " * 100, spec, max_variable_tokens=budget
+    )[-1]["content"]
+
+    assert content.startswith("Pedido curto.")
+    assert "# PROMPT OPTIMIZER NOTES\nNota do otimizador." in content
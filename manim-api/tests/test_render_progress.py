@@ -0,0 +1,24 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from services.render_progress import run_render_thread, run_streaming
+
+
+def test_cancelling_a_render_thread_kills_its_process():
+    async def scenario() -> float:
+        cmd = [sys.executable, "-c", "import time; time.sleep(30)"]
+        render = asyncio.create_task(run_render_thread(run_streaming, cmd, 60, os.getcwd(), dict(os.environ)))
+        await asyncio.sleep(0.5)
+        started = time.perf_counter()
+        render.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await render
+        return time.perf_counter() - started
+
+    elapsed = asyncio.run(scenario())
+    # A thread só volta depois que o processo morre; sem o kill esperaria os 30 s
+    assert elapsed < 5
@@ -0,0 +1,75 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import main
+from schemas import CodeResponse
+from services import pipeline
+from services.manim_executor import RenderResult
+from services.render_scheduler import RenderQueueFull, RenderScheduler
+
+
+@pytest.fixture
+def scheduler(monkeypatch):
+    scheduler = RenderScheduler(slots=1, max_queue=1, cpu_count=2)
+    monkeypatch.setattr(pipeline, "render_scheduler", scheduler)
+    monkeypatch.setattr(pipeline.settings, "render_cost_enabled", False)
+    monkeypatch.setattr(pipeline.settings, "pipeline_coalescing", False)
+
+    async def slow_code_generation(description, width, height, request_id, **_):
+        await asyncio.sleep(0.2)
+        return CodeResponse(code="from manim import *\n", scene_name="Burst", is_valid=True, validation_message="ok")
+
+    def render(*args, **kwargs):
+        time.sleep(0.05)
+        return RenderResult(success=True, video_path="burst.mp4", video_id="0" * 32, video_size=1)
+
+    monkeypatch.setattr(pipeline, "generate_manim_code", slow_code_generation)
+    monkeypatch.setattr(pipeline, "execute_manim", render)
+    return scheduler
+
+
+def test_burst_during_code_generation_is_rejected_with_429(scheduler):
+    async def burst() -> list[httpx.Response]:
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(
+                    client.post(
+                        "/generate-video",
+                        json={"description": f"burst scene number {index}", "delivery": "reference"},
+                    )
+                    for index in range(scheduler.slots + scheduler.max_queue + 4)
+                )
+            )
+
+    responses = asyncio.run(burst())
+
+    statuses = [response.status_code for response in responses]
+    assert statuses.count(200) == scheduler.slots + scheduler.max_queue
+    assert statuses.count(429) == 4
+    assert all(response.headers.get("retry-after") for response in responses if response.status_code == 429)
+    stats = scheduler.stats()
+    assert (stats.active, stats.waiting, stats.reserved) == (0, 0, 0)
+
+
+def test_reservation_is_returned_when_render_never_starts(scheduler):
+    with scheduler.reserve("a"):
+        with scheduler.reserve("b"):
+            with pytest.raises(RenderQueueFull):
+                scheduler.ensure_capacity()
+    assert scheduler.stats().reserved == 0
+    scheduler.ensure_capacity()
+
+
+def test_reservation_becomes_a_slot_without_a_second_check(scheduler):
+    async def run() -> None:
+        with scheduler.reserve("a") as first, scheduler.reserve("b"):
+            # Fila cheia, mas quem já foi admitido entra no slot
+            async with scheduler.slot("a", heavy=False, reservation=first):
+                assert (scheduler.stats().active, scheduler.stats().reserved) == (1, 1)
+
+    asyncio.run(run())
+    assert scheduler.stats().reserved == 0
@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services.single_flight import SingleFlight
+
+
+def test_cancelling_the_only_waiter_cancels_the_execution():
+    async def scenario() -> bool:
+        flights = SingleFlight()
+        started, cancelled = asyncio.Event(), asyncio.Event()
+
+        async def work() -> str:
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "done"
+
+        caller = asyncio.create_task(flights.run("key", work))
+        await started.wait()
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.wait_for(cancelled.wait(), 1)
+        return flights.in_flight("key")
+
+    assert asyncio.run(scenario()) is False
+
+
+def test_execution_survives_while_another_waiter_remains():
+    async def scenario() -> tuple[str, bool]:
+        flights = SingleFlight()
+        started = asyncio.Event()
+
+        async def work() -> str:
+            started.set()
+            await asyncio.sleep(0.1)
+            return "done"
+
+        leader = asyncio.create_task(flights.run("key", work))
+        await started.wait()
+        follower = asyncio.create_task(flights.run("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        return await follower
+
+    assert asyncio.run(scenario()) == ("done", True)
+
+
+def test_remembered_results_are_capped_oldest_first():
+    async def scenario() -> tuple[bool, bool]:
+        flights = SingleFlight(ttl_seconds=60, max_entries=2)
+
+        async def work() -> str:
+            return "done"
+
+        for key in ("a", "b", "c"):
+            await flights.run(key, work)
+        # "a" foi descartada pelo limite e executa de novo; "c" ainda vem do resultado guardado
+        _, a_shared = await flights.run("a", work)
+        _, c_shared = await flights.run("c", work)
+        return a_shared, c_shared
+
+    assert asyncio.run(scenario()) == (False, True)
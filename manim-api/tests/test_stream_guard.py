@@ -0,0 +1,47 @@
+import pytest
+
+from services.code_analyzer import analyze_code
+from services.openai_service import StreamAborted, check_partial_code
+
+CONSTRUCT = "    def construct(self):\n        self.play(Create(Circle()))\n"
+
+ACCEPTED = {
+    "zoomed_scene": "from manim import *\n\nclass Main(ZoomedScene):\n" + CONSTRUCT,
+    "keyword_base": "from manim import *\n\nclass Main(Scene, metaclass=type):\n" + CONSTRUCT,
+    "attribute_base": "import manim\nfrom manim import *\n\nclass Main(manim.Scene):\n" + CONSTRUCT,
+    "indirect_subclass": "from manim import *\n\nclass Base(MovingCameraScene):\n    pass\n\nclass Main(Base):\n" + CONSTRUCT,
+    "forward_reference": "from manim import *\n\nclass Main(Base):\n" + CONSTRUCT + "\nclass Base(Scene):\n    pass\n",
+    "multiline_header": "from manim import *\n\nclass Main(\n    Scene,\n):\n" + CONSTRUCT,
+    "import_in_triple_quoted_text": (
+        "from manim import *\n\nclass Main(Scene):\n    def construct(self):\n"
+        "        snippet = Text('''\nimport os\nfrom subprocess import run\n''')\n"
+        '        code = Code(code_string="""\nimport sys  # \'\n""", language="python")\n'
+        "        self.play(Write(snippet), Write(code))\n"
+    ),
+    "submodule_import": "from manim.scene.scene import Scene\nfrom manim import *\n\nclass Main(Scene):\n" + CONSTRUCT,
+}
+
+
+def _check_every_prefix(code: str) -> None:
+    lines = code.splitlines(keepends=True)
+    for end in range(1, len(lines) + 1):
+        check_partial_code("".join(lines[:end]))
+
+
+@pytest.mark.parametrize("code", ACCEPTED.values(), ids=ACCEPTED.keys())
+def test_guard_never_aborts_code_the_analyzer_accepts(code):
+    assert analyze_code(code).validation()[0]
+    _check_every_prefix(code)
+
+
+def test_guard_aborts_construct_outside_any_scene():
+    code = "from manim import *\n\nclass Main:\n" + CONSTRUCT
+    assert not analyze_code(code).validation()[0]
+    with pytest.raises(StreamAborted, match="Missing Scene class"):
+        _check_every_prefix(code)
+
+
+def test_guard_aborts_forbidden_import_after_a_closed_string():
+    code = 'from manim import *\ndoc = """\nimport os\n"""\nimport os\n'
+    with pytest.raises(StreamAborted, match="Forbidden import: os"):
+        _check_every_prefix(code)